@@ -7,13 +7,19 @@ Powered by OpenAI Assistants API
 import streamlit as st
 import os
 import json
+import functools
 from dotenv import load_dotenv
-from assistant import PlaidLibsAssistant
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from assistant import PlaidLibsAssistant, build_openai_client, get_thread_pool, uses_local_backend
+from compaction import new_summary, update_summary, build_context
+from scheduler import get_scheduler, BACKGROUND, DEFAULT_SESSION
+from metrics import set_labels, start_exporters
+from jobs import get_job_manager, Job, QUEUED, CANCELLED, FAILED, WAITING_LANE
+from session_store import get_session_store, new_token, SessionConflictError, SessionStoreError
 from config import (
     LITERARY_FORMS, ALL_GENRES, ABSURDITY_LEVELS, 
     QUIP_PERSONAS, WORKFLOW_MODES, PROMPT_TYPES,
-    CORE_GENRES, FLEXIBLE_GENRES, PLAIDVERSE_GENRES,
-    get_system_prompt, get_stage_prompt
+    CORE_GENRES, FLEXIBLE_GENRES, PLAIDVERSE_GENRES
 )
 
 # Load environment variables
@@ -361,7 +367,9 @@ def init_session_state():
         "thread_id": None,
         "assistant": None,
         "enable_image_generation": True,  # Enable DALL-E image generation
-        "generated_images": []  # Store generated images
+        "generated_images": [],  # Store generated images
+        "jobs": {},  # Job slot -> ID of this session's background job (see JOB_SLOTS)
+        "job_errors": {}  # Job slot -> error of its last failed job
     }
     
     for key, value in defaults.items():
@@ -390,136 +398,511 @@ def reset_workflow():
         if key in st.session_state:
             del st.session_state[key]
     
+    # Their results would land in the state just cleared
+    discard_jobs("lib_ate_template", "lib_ate_reveal")
+    
     # Reset assistant thread
     if st.session_state.assistant:
         st.session_state.assistant.reset_conversation()
         st.session_state.thread_id = st.session_state.assistant.thread_id
 
 
+@st.cache_resource
+def get_openai_client():
+    """Pooled OpenAI client shared by every session in this process."""
+    client = build_openai_client()
+    get_thread_pool(client)  # start pre-creating threads before the first session needs one
+    start_exporters()  # /metrics endpoint and/or metrics file, if configured
+    return client
+
+
+def current_session_id() -> str:
+    """Streamlit session ID, used to queue this browser tab's API calls fairly."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else DEFAULT_SESSION
+
+
 def get_assistant():
     """Get or create the PlaidLibs assistant instance."""
     if st.session_state.assistant is None:
-        st.session_state.assistant = PlaidLibsAssistant()
+        st.session_state.assistant = PlaidLibsAssistant(
+            client=get_openai_client(),
+            session_id=current_session_id()
+        )
+        st.session_state.assistant.set_persona(st.session_state.current_quip)
         if st.session_state.thread_id:
             st.session_state.assistant.set_thread(st.session_state.thread_id)
     return st.session_state.assistant
 
 
+def rerun_current():
+    """
+    Rerun only the enclosing fragment when it is running on its own, else the whole app.
+    
+    Streamlit rejects st.rerun(scope="fragment") while a fragment is running as
+    part of a full-app run, so those runs fall back to a full rerun.
+    """
+    ctx = get_script_run_ctx()
+    if ctx and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    else:
+        st.rerun()
+
+
+# =============================================================================
+# SESSION RESUME
+# =============================================================================
+# Query parameter holding the tab's session token
+SESSION_PARAM = "session"
+
+# Session state saved for a refreshed tab: these keys plus every key starting
+# with one of DURABLE_PREFIXES. The assistant is rebuilt from thread_id.
+DURABLE_KEYS = {
+    "messages", "current_mode", "current_quip", "current_stage",
+    "selected_style", "selected_genre", "selected_absurdity",
+    "collected_prompts", "prompt_index", "total_prompts", "story_generated",
+    "thread_id", "enable_image_generation", "generated_images", "jobs", "job_errors",
+}
+DURABLE_PREFIXES = ("lib_ate_", "create_direct_", "storyline_", "plaidpic_", "maggen_", "plaidplay_")
+
+# Widget keys under those prefixes; Streamlit owns their values
+WIDGET_KEYS = {
+    "lib_ate_chat", "create_direct_topic_input", "storyline_premise_input",
+    "plaidpic_story_input", "plaidplay_choice_input",
+}
+
+
+def session_token() -> str:
+    """Token naming this tab's session in the URL, the session store and the job manager."""
+    return st.session_state.get("session_token") or current_session_id()
+
+
+def restore_session():
+    """
+    Resume the session saved under the URL's token, once per browser session.
+    
+    A refresh or reconnect starts a new Streamlit session with empty state;
+    the token in the URL finds its snapshot, including the IDs of background
+    jobs still running, which collect_jobs() then picks up as usual.
+    """
+    if "session_token" in st.session_state:
+        return
+    token = st.query_params.get(SESSION_PARAM)
+    try:
+        loaded = get_session_store().load(token) if token else None
+    except SessionStoreError as e:
+        st.toast(f"⚠️ Could not resume your session: {e}")
+        loaded = None
+    if loaded:
+        snapshot, version = loaded
+        for key, value in snapshot.items():
+            st.session_state[key] = value
+    else:
+        token, version = new_token(), 0
+    st.session_state.session_token = token
+    st.session_state.session_version = version
+    st.query_params[SESSION_PARAM] = token
+
+
+def save_session():
+    """
+    Save this session's durable state under its token.
+    
+    If another tab saved under the same token since this one last loaded or
+    saved (the link was opened twice), this tab moves to a new token with its
+    own copy of the state rather than overwriting the other tab's.
+    """
+    token = st.session_state.get("session_token")
+    if not token:
+        return
+    state = {
+        key: value for key, value in st.session_state.to_dict().items()
+        if (key in DURABLE_KEYS or key.startswith(DURABLE_PREFIXES)) and key not in WIDGET_KEYS
+    }
+    store = get_session_store()
+    try:
+        try:
+            st.session_state.session_version = store.save(token, state, st.session_state.session_version)
+        except SessionConflictError:
+            token = new_token()
+            st.session_state.session_version = store.save(token, state)
+            st.session_state.session_token = token
+            st.query_params[SESSION_PARAM] = token
+            st.toast("🔗 This session is open in another tab, so this tab now has its own link.")
+    except SessionStoreError:
+        pass  # counted in metrics; the next run saves again
+    except TypeError as e:
+        # A value JSON cannot encode; say so once rather than on every run
+        if not st.session_state.get("session_unsaved"):
+            st.session_state.session_unsaved = True
+            st.toast(f"⚠️ Your session could not be saved for resuming: {e}")
+
+
+def saves_session(fn):
+    """
+    Save the session after fn when it runs as a fragment on its own.
+    
+    Full-app runs save once at the end of main(); fragment reruns never reach
+    it. The save also runs when fn ends in st.rerun().
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            ctx = get_script_run_ctx()
+            if ctx and ctx.fragment_ids_this_run:
+                save_session()
+    return wrapper
+
+
+def label_metrics():
+    """Label this run's API calls, and the jobs it starts, with the current mode and stage."""
+    mode = st.session_state.current_mode
+    stage_key = MODE_STAGE_KEYS.get(mode)
+    set_labels(mode=mode, stage=st.session_state.get(stage_key, "none") if stage_key else "chat")
+
+
+def labels_metrics(fn):
+    """
+    Label API calls made by fn when it runs as a fragment on its own.
+    
+    Labels live in context variables of the script thread. A fragment rerun
+    does not pass through main(), so without this its calls would carry no
+    labels or those of an earlier run.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if ctx and ctx.fragment_ids_this_run:
+            label_metrics()
+        return fn(*args, **kwargs)
+    return wrapper
+
+
 # =============================================================================
 # UI COMPONENTS
 # =============================================================================
+def message_html(role: str, content: str) -> str:
+    """HTML for one chat bubble."""
+    role_class = "user-message" if role == "user" else "assistant-message"
+    return f'<div class="{role_class}">{content}</div>'
+
+
+def show_image(url: str, caption: str):
+    """
+    Render a generated image, tolerating cache eviction.
+    
+    Local paths come from the image store, which may evict a file while a
+    session (or a restored snapshot) still points at it. Touching the file on
+    each render keeps on-screen images at the recent end of the store's LRU
+    order; a file that is already gone is replaced by a note instead of
+    letting st.image raise.
+    """
+    if url and not url.startswith(("http://", "https://", "data:")):
+        try:
+            os.utime(url)
+        except OSError:
+            st.caption(f"⚠️ {caption} is no longer cached; generate it again to see it")
+            return
+    st.image(url, caption=caption, use_container_width=True)
+
+
+def render_transcript(messages: list):
+    """
+    Render chat messages as a single markdown element.
+    
+    Emitting one element per transcript rather than one per message keeps the
+    element count of a rerun flat however long the conversation grows.
+    """
+    if messages:
+        st.markdown("\n\n".join(message_html(m["role"], m["content"]) for m in messages), unsafe_allow_html=True)
+
+
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+# Seconds between checks on a job while its progress is on screen
+JOB_POLL_INTERVAL = float(os.getenv("PLAIDLIBS_JOB_POLL_INTERVAL", "1"))
+
+
+def thread_lane() -> str:
+    """
+    Job lane for this session's Assistants thread, which takes one run at a time.
+    
+    Keyed by the thread itself once known, so tabs that split from one link
+    (see save_session) still queue their runs on it one behind the other.
+    """
+    return f"{st.session_state.thread_id or session_token()}:thread"
+
+
+def session_job(slot: str):
+    """This session's job in slot, or None."""
+    job_id = st.session_state.jobs.get(slot)
+    return get_job_manager().get(job_id) if job_id else None
+
+
+def start_job(slot: str, label: str, fn, lane: str = None) -> Job:
+    """
+    Queue fn as this session's job in slot.
+    
+    Args:
+        slot: Key of JOB_SLOTS; its apply function receives the job's result
+        label: Short description shown while the job is pending
+        fn: Called with the Job on a worker thread (see jobs.Job)
+        lane: Jobs sharing a lane run one at a time (see thread_lane)
+    """
+    job = get_job_manager().submit(session_token(), label, fn, lane=lane)
+    st.session_state.jobs[slot] = job.id
+    st.session_state.job_errors.pop(slot, None)
+    return job
+
+
+def discard_jobs(*slots):
+    """Cancel the jobs in slots without applying or rolling back anything."""
+    for slot in slots:
+        job_id = st.session_state.jobs.pop(slot, None)
+        if job_id:
+            get_job_manager().cancel(job_id)
+        st.session_state.job_errors.pop(slot, None)
+
+
+def job_needed(slot: str) -> bool:
+    """
+    Whether a generating stage should start its job now.
+    
+    False while the slot's job is pending, or when its last job failed; the
+    error is then shown with a retry button rather than retried on every rerun.
+    """
+    error = st.session_state.job_errors.get(slot)
+    if error:
+        st.error(f"Oops! Something went wrong: {error}")
+        if st.button("🔁 Try Again", key=f"retry_{slot}"):
+            del st.session_state.job_errors[slot]
+            rerun_current()
+        return False
+    return session_job(slot) is None
+
+
+def collect_jobs():
+    """
+    Apply this session's finished jobs to session state.
+    
+    Called at the top of every run, so results land even while the user is
+    in another mode.
+    """
+    for slot, job_id in list(st.session_state.jobs.items()):
+        job = get_job_manager().get(job_id)
+        if job is not None and not job.finished:
+            continue
+        del st.session_state.jobs[slot]
+        mode, apply, rollback = JOB_SLOTS[slot]
+        if job is None or job.status == CANCELLED:
+            rollback()
+        elif job.status == FAILED:
+            st.session_state.job_errors[slot] = job.error
+        else:
+            apply(job.result)
+            if mode != st.session_state.current_mode and slot not in MEMORY_SLOTS:
+                st.toast(f"✅ {job.label} is ready")
+
+
+def queue_note(job: Job) -> str:
+    """Why a queued job has not started, and how many jobs are ahead of it."""
+    position = get_job_manager().queue_position(job)
+    if position is None:
+        return "starting"
+    reason, ahead = position
+    if reason == WAITING_LANE:
+        return f"waiting for {ahead} earlier request{'s' if ahead != 1 else ''} in this conversation to finish"
+    if ahead:
+        return f"every generator is busy; {ahead} request{'s are' if ahead != 1 else ' is'} ahead of it"
+    return "every generator is busy; it is next in line"
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_progress(slot: str, caption: str):
+    """
+    Live progress of the session's job in slot, refreshed while it runs.
+    
+    When the job finishes the whole app reruns, so collect_jobs() applies its result.
+    """
+    job = session_job(slot)
+    if job is None:
+        return
+    if job.finished:
+        st.rerun()
+    
+    progress = job.snapshot()
+    if progress["status"] == QUEUED:
+        st.caption(f"⏳ {caption} ({queue_note(job)})")
+    else:
+        st.caption(progress["step"] or caption)
+    if progress["text"]:
+        st.markdown(f'<div class="assistant-message">{progress["text"]}</div>', unsafe_allow_html=True)
+    
+    # Images drawn so far, each in its own grid slot
+    images, image_caption = progress["images"], progress["image_caption"]
+    if images:
+        cols = st.columns(2)
+        for i, url in enumerate(images):
+            with cols[i % 2]:
+                if url:
+                    show_image(url, f"{image_caption} {i+1}")
+                elif url is None:
+                    st.caption(f"🎨 Drawing {image_caption.lower()} {i+1} of {len(images)}...")
+                else:
+                    st.caption(f"⚠️ {image_caption} {i+1} could not be drawn")
+    
+    if st.button("✖ Cancel", key=f"cancel_{slot}"):
+        discard_jobs(slot)
+        JOB_SLOTS[slot][2]()
+        st.rerun()
+
+
+def other_mode_jobs() -> list:
+    """(slot, job) for this session's jobs that belong to a mode other than the current one."""
+    return [
+        (slot, session_job(slot)) for slot in st.session_state.jobs
+        if JOB_SLOTS[slot][0] != st.session_state.current_mode and slot not in MEMORY_SLOTS
+    ]
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_tray():
+    """Jobs still running in other modes; reruns the app as each one finishes."""
+    jobs = [(slot, job) for slot, job in other_mode_jobs() if job is not None]
+    if any(job.finished for _, job in jobs):
+        st.rerun()
+    for slot, job in jobs:
+        mode = WORKFLOW_MODES[JOB_SLOTS[slot][0]]
+        progress = job.snapshot()
+        state = f"queued, {queue_note(job)}" if progress["status"] == QUEUED else (progress["step"] or "in progress")
+        st.caption(f"{mode['icon']} {job.label} ({mode['name']}): {state}")
+
+
+@st.fragment
+@saves_session
+@labels_metrics
 def render_sidebar():
-    """Render the sidebar with workflow selection and settings."""
-    with st.sidebar:
-        st.markdown("### 🧵 PlaidLibs™")
-        st.markdown("---")
-        
-        # Workflow selector
-        st.markdown("#### Choose Workflow")
-        mode_options = {k: f"{v['icon']} {v['name']}" for k, v in WORKFLOW_MODES.items()}
-        selected_mode = st.selectbox(
-            "Workflow Mode",
-            options=list(mode_options.keys()),
-            format_func=lambda x: mode_options[x],
-            index=list(mode_options.keys()).index(st.session_state.current_mode) if st.session_state.current_mode in mode_options else 0,
-            key="mode_selector",
-            label_visibility="collapsed"
-        )
-        
-        if selected_mode != st.session_state.current_mode:
-            st.session_state.current_mode = selected_mode
-            reset_workflow()
-            st.rerun()
-        
-        st.markdown("---")
-        
-        # Quip selector
-        st.markdown("#### Narrator / Host (Quip)")
-        quip_options = {k: f"{v['icon']} {v['name']}" for k, v in QUIP_PERSONAS.items()}
-        selected_quip = st.selectbox(
-            "Select Quip",
-            options=list(quip_options.keys()),
-            format_func=lambda x: quip_options[x],
-            key="quip_selector",
-            label_visibility="collapsed"
-        )
-        
-        if selected_quip != st.session_state.current_quip:
-            st.session_state.current_quip = selected_quip
-            # Note: In production, you'd update the assistant instructions here
-        
-        # Show current Quip info
-        current_quip = QUIP_PERSONAS[selected_quip]
-        st.markdown(f"""
-        <div style="background: rgba(124, 58, 237, 0.1); border-radius: 12px; padding: 1rem; margin-top: 0.5rem;">
-            <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">{current_quip['icon']}</div>
-            <div style="font-size: 0.75rem; color: #A78BFA;">{current_quip['epithet']}</div>
-            <div style="font-size: 0.8rem; color: #A1A1AA; margin-top: 0.5rem;">{current_quip['description']}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # Image Generation Toggle
-        st.markdown("#### 🎨 Image Generation")
-        enable_images = st.toggle(
-            "Enable DALL-E Images",
-            value=st.session_state.get("enable_image_generation", True),
-            key="image_gen_toggle",
-            help="Generate AI images for your stories using DALL-E 3"
-        )
-        if enable_images != st.session_state.get("enable_image_generation", True):
-            st.session_state.enable_image_generation = enable_images
-        
-        if enable_images:
-            st.markdown('<div style="background: rgba(16, 185, 129, 0.1); border-radius: 8px; padding: 0.5rem; font-size: 0.8rem; color: #10B981;">✨ Images will be generated with your stories</div>', unsafe_allow_html=True)
-        
+    """
+    Render the sidebar with workflow selection and settings.
+    
+    Runs as a fragment (call it inside `with st.sidebar`), so settings that only
+    affect the sidebar rerun just the sidebar; workflow and persona changes rerun the app.
+    """
+    st.markdown("### 🧵 PlaidLibs™")
+    st.markdown("---")
+    
+    # Workflow selector
+    st.markdown("#### Choose Workflow")
+    mode_options = {k: f"{v['icon']} {v['name']}" for k, v in WORKFLOW_MODES.items()}
+    selected_mode = st.selectbox(
+        "Workflow Mode",
+        options=list(mode_options.keys()),
+        format_func=lambda x: mode_options[x],
+        index=list(mode_options.keys()).index(st.session_state.current_mode) if st.session_state.current_mode in mode_options else 0,
+        key="mode_selector",
+        label_visibility="collapsed"
+    )
+    
+    if selected_mode != st.session_state.current_mode:
+        st.session_state.current_mode = selected_mode
+        reset_workflow()
+        st.rerun()
+    
+    st.markdown("---")
+    
+    # Quip selector
+    st.markdown("#### Narrator / Host (Quip)")
+    quip_options = {k: f"{v['icon']} {v['name']}" for k, v in QUIP_PERSONAS.items()}
+    selected_quip = st.selectbox(
+        "Select Quip",
+        options=list(quip_options.keys()),
+        format_func=lambda x: quip_options[x],
+        index=list(quip_options.keys()).index(st.session_state.current_quip) if st.session_state.current_quip in quip_options else 0,
+        key="quip_selector",
+        label_visibility="collapsed"
+    )
+    
+    if selected_quip != st.session_state.current_quip:
+        st.session_state.current_quip = selected_quip
+        if st.session_state.assistant:
+            st.session_state.assistant.set_persona(selected_quip)
+        st.rerun()
+    
+    # Show current Quip info
+    current_quip = QUIP_PERSONAS[selected_quip]
+    st.markdown(f"""
+    <div style="background: rgba(124, 58, 237, 0.1); border-radius: 12px; padding: 1rem; margin-top: 0.5rem;">
+        <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">{current_quip['icon']}</div>
+        <div style="font-size: 0.75rem; color: #A78BFA;">{current_quip['epithet']}</div>
+        <div style="font-size: 0.8rem; color: #A1A1AA; margin-top: 0.5rem;">{current_quip['description']}</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.markdown("---")
+    
+    # Image Generation Toggle
+    st.markdown("#### 🎨 Image Generation")
+    enable_images = st.toggle(
+        "Enable DALL-E Images",
+        value=st.session_state.get("enable_image_generation", True),
+        key="image_gen_toggle",
+        help="Generate AI images for your stories using DALL-E 3"
+    )
+    if enable_images != st.session_state.get("enable_image_generation", True):
+        st.session_state.enable_image_generation = enable_images
+    
+    if enable_images:
+        st.markdown('<div style="background: rgba(16, 185, 129, 0.1); border-radius: 8px; padding: 0.5rem; font-size: 0.8rem; color: #10B981;">✨ Images will be generated with your stories</div>', unsafe_allow_html=True)
+    
+    st.markdown("---")
+    
+    # Reset button
+    if st.button("🔄 Reset This Mode", use_container_width=True):
+        reset_workflow()
+        st.rerun()
+    
+    # Progress indicator (for Lib-Ate mode)
+    if st.session_state.current_mode == "lib_ate" and st.session_state.get("lib_ate_state") is None:
+        # Only show this legacy progress bar if we aren't in the new chat mode
         st.markdown("---")
-        
-        # Reset button
-        if st.button("🔄 Reset This Mode", use_container_width=True):
-            reset_workflow()
-            st.rerun()
-        
-        # Progress indicator (for Lib-Ate mode)
-        if st.session_state.current_mode == "lib_ate" and st.session_state.get("lib_ate_state") is None:
-            # Only show this legacy progress bar if we aren't in the new chat mode
-            st.markdown("---")
-            st.markdown("#### Progress")
-            stages = ["Style", "Genre", "Absurdity", "Prompts", "Story"]
-            current_idx = {
-                "welcome": -1,
-                "style": 0,
-                "genre": 1,
-                "absurdity": 2,
-                "prompts": 3,
-                "story": 4
-            }.get(st.session_state.current_stage, -1)
-            
-            progress_html = '<div style="display: flex; justify-content: center; flex-wrap: wrap; gap: 4px;">'
-            for i, stage in enumerate(stages):
-                if i < current_idx:
-                    cls = "completed"
-                    icon = "✓"
-                elif i == current_idx:
-                    cls = "active"
-                    icon = str(i + 1)
-                else:
-                    cls = ""
-                    icon = str(i + 1)
-                progress_html += f'<div class="progress-step {cls}">{icon}</div>'
-            progress_html += '</div>'
-            st.markdown(progress_html, unsafe_allow_html=True)
-            
-            # Show current selections
-            if st.session_state.selected_style:
-                st.markdown(f"✅ **Style:** {st.session_state.selected_style}")
-            if st.session_state.selected_genre:
-                st.markdown(f"✅ **Genre:** {st.session_state.selected_genre}")
-            if st.session_state.selected_absurdity:
-                st.markdown(f"✅ **Absurdity:** {st.session_state.selected_absurdity}")
-            if st.session_state.collected_prompts:
-                st.markdown(f"📝 **Words:** {len(st.session_state.collected_prompts)}/{st.session_state.total_prompts}")
+        st.markdown("#### Progress")
+        stages = ["Style", "Genre", "Absurdity", "Prompts", "Story"]
+        current_idx = {
+            "welcome": -1,
+            "style": 0,
+            "genre": 1,
+            "absurdity": 2,
+            "prompts": 3,
+            "story": 4
+        }.get(st.session_state.current_stage, -1)
+        
+        progress_html = '<div style="display: flex; justify-content: center; flex-wrap: wrap; gap: 4px;">'
+        for i, stage in enumerate(stages):
+            if i < current_idx:
+                cls = "completed"
+                icon = "✓"
+            elif i == current_idx:
+                cls = "active"
+                icon = str(i + 1)
+            else:
+                cls = ""
+                icon = str(i + 1)
+            progress_html += f'<div class="progress-step {cls}">{icon}</div>'
+        progress_html += '</div>'
+        st.markdown(progress_html, unsafe_allow_html=True)
+        
+        # Show current selections
+        if st.session_state.selected_style:
+            st.markdown(f"✅ **Style:** {st.session_state.selected_style}")
+        if st.session_state.selected_genre:
+            st.markdown(f"✅ **Genre:** {st.session_state.selected_genre}")
+        if st.session_state.selected_absurdity:
+            st.markdown(f"✅ **Absurdity:** {st.session_state.selected_absurdity}")
+        if st.session_state.collected_prompts:
+            st.markdown(f"📝 **Words:** {len(st.session_state.collected_prompts)}/{st.session_state.total_prompts}")
 
 
 def render_welcome():
@@ -807,49 +1190,44 @@ Remember to:
 """
     
     if not st.session_state.story_generated:
-        with st.spinner("🪄 Weaving your story..."):
-            try:
-                assistant = get_assistant()
-                
-                # Send the initial context with system prompt
-                if not st.session_state.thread_id:
-                    assistant.get_or_create_thread()
-                    st.session_state.thread_id = assistant.thread_id
-                    
-                    # Send system context
-                    system_context = get_system_prompt(st.session_state.current_quip)
-                    assistant.send_message(f"[SYSTEM CONTEXT]\n{system_context}\n\nPlease acknowledge you understand and are ready to generate stories.")
-                
-                # Generate the story
-                response = assistant.send_message(generation_prompt)
-                st.session_state.generated_story = response
-                st.session_state.story_generated = True
-                
-                # Generate image if enabled
-                if st.session_state.get("enable_image_generation", True):
-                    with st.spinner("🎨 Creating illustration..."):
-                        # Create an image prompt based on the story
-                        # Extract the first ~300 chars of the generated text to ground the image prompt in the narrative
-                        story_snippet = st.session_state.generated_story[:300].replace('\n', ' ')
-                        image_prompt = f"A vivid, artistic illustration for a {st.session_state.selected_genre} {st.session_state.selected_style}. Setting and Action Context: '{story_snippet}'. Style: colorful, {st.session_state.selected_absurdity.lower()} whimsy, cinematic lighting, storybook quality. Theme incorporates: {', '.join(st.session_state.collected_prompts)}. No text or words in the image."
-                        image_result = assistant.generate_image(image_prompt, style="vivid")
-                        if "url" in image_result:
-                            st.session_state.story_image = image_result["url"]
-                        else:
-                            st.session_state.story_image = None
-                
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Oops! Something went wrong: {str(e)}")
-                st.info("Please check your OpenAI API key and Assistant ID in the .env file.")
-                return
+        try:
+            assistant = get_assistant()
+            
+            # The persona's system prompt lives on its assistant, so no priming run is needed
+            if not st.session_state.thread_id:
+                assistant.get_or_create_thread()
+                st.session_state.thread_id = assistant.thread_id
+            
+            # Generate the story, rendering tokens as they arrive
+            response = st.write_stream(assistant.stream_message(generation_prompt))
+            st.session_state.generated_story = response
+            st.session_state.story_generated = True
+            
+            # Generate image if enabled
+            if st.session_state.get("enable_image_generation", True):
+                with st.spinner("🎨 Creating illustration..."):
+                    # Create an image prompt based on the story
+                    # Extract the first ~300 chars of the generated text to ground the image prompt in the narrative
+                    story_snippet = st.session_state.generated_story[:300].replace('\n', ' ')
+                    image_prompt = f"A vivid, artistic illustration for a {st.session_state.selected_genre} {st.session_state.selected_style}. Setting and Action Context: '{story_snippet}'. Style: colorful, {st.session_state.selected_absurdity.lower()} whimsy, cinematic lighting, storybook quality. Theme incorporates: {', '.join(st.session_state.collected_prompts)}. No text or words in the image."
+                    image_result = assistant.generate_image(image_prompt, style="vivid")
+                    if "url" in image_result:
+                        st.session_state.story_image = image_result["url"]
+                    else:
+                        st.session_state.story_image = None
+            
+            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Oops! Something went wrong: {str(e)}")
+            st.info("Please check your OpenAI API key and Assistant ID in the .env file.")
+            return
     
     # Display the generated story
     if hasattr(st.session_state, 'generated_story'):
         # Display image if available
         if hasattr(st.session_state, 'story_image') and st.session_state.story_image:
-            st.image(st.session_state.story_image, caption="🎨 AI-Generated Illustration", use_container_width=True)
+            show_image(st.session_state.story_image, "🎨 AI-Generated Illustration")
         
         st.markdown(f"""
         <div class="story-output animate-in">
@@ -882,6 +1260,75 @@ Remember to:
             )
 
 
+def lib_ate_template_job(assistant, prompt: str, persona: str):
+    """Job function drafting the hidden Lib-Ate template (parsed from the model's JSON)."""
+    def run(job):
+        response = assistant.complete(prompt, persona=persona)
+        clean_response = response.replace("```json", "").replace("```", "").strip()
+        return json.loads(clean_response)
+    return run
+
+
+def apply_lib_ate_template(data: dict):
+    if st.session_state.get("lib_ate_state") != "generating_template":
+        return
+    selections = st.session_state.lib_ate_selections
+    st.session_state.lib_ate_data = data
+    st.session_state.lib_ate_inputs = []
+    st.session_state.lib_ate_current_input_idx = 0
+    st.session_state.lib_ate_state = "collecting"
+    
+    # Initial prompt msg
+    first_req = data["required_inputs"][0]
+    msg = f"""✅ **Absurdity set to:** {selections['absurdity']}
+                
+🤫 **Teaser:** *{data['teaser']}*
+                
+I need {len(data['required_inputs'])} inputs to reveal the truth.
+                
+**Prompt 1 of {len(data['required_inputs'])}**
+Give me a: **{first_req}**"""
+    st.session_state.lib_ate_messages.append({"role": "assistant", "content": msg})
+
+
+def rollback_lib_ate_template():
+    if st.session_state.get("lib_ate_state") == "generating_template":
+        st.session_state.lib_ate_state = "select_absurdity"
+        st.session_state.lib_ate_messages.append({"role": "assistant", "content": "Cancelled! Pick an absurdity level (1-6) to try again."})
+
+
+def lib_ate_reveal_job(assistant, prompt: str, persona: str, image_genre: str, inputs: list):
+    """Job function filling in the Lib-Ate story and illustrating it."""
+    def run(job):
+        story = job.stream(assistant.stream_complete(prompt, persona=persona))
+        
+        # Generate Image
+        image = None
+        if image_genre:
+            job.set_step("🎨 Creating illustration...")
+            # Include variables in the image prompt and a snippet of the story to fix Visual-Narrative Misalignment
+            story_snippet = story[:300].replace('\n', ' ')
+            image_context = ", ".join(inputs)
+            image = assistant.generate_image(f"Artistic illustration for {image_genre} genre story. Visual Context: '{story_snippet}'. Key elements to include: {image_context}. Style: vivid, cinematic. No text or words.").get("url")
+        return {"story": story, "image": image}
+    return run
+
+
+def apply_lib_ate_reveal(result: dict):
+    if st.session_state.get("lib_ate_state") != "reveal":
+        return
+    st.session_state.lib_ate_final_story = result["story"]
+    st.session_state.lib_ate_story_revealed = True
+    st.session_state.lib_ate_messages.append({"role": "assistant", "content": f"🎉 **HERE IT IS!**\n\n{result['story']}"})
+    if result["image"]:
+        st.session_state.lib_ate_image = result["image"]
+
+
+def rollback_lib_ate_reveal():
+    if st.session_state.get("lib_ate_state") == "reveal":
+        st.session_state.lib_ate_state = "review"
+
+
 def render_lib_ate():
     """Render the Lib-Ate mode - Chat-based Hidden Story Game."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -919,11 +1366,17 @@ First, **choose your literary style**:
     st.markdown(f"""
     <div class="mode-badge">{quip['icon']} {quip['name']} - Lib-Ate</div>
     """, unsafe_allow_html=True)
+    
+    render_lib_ate_chat()
 
+
+@st.fragment
+@saves_session
+@labels_metrics
+def render_lib_ate_chat():
+    """Lib-Ate transcript, input and generation; a fragment, so each answer reruns only the chat."""
     # Display chat history
-    for msg in st.session_state.lib_ate_messages:
-        role_class = "user-message" if msg["role"] == "user" else "assistant-message"
-        st.markdown(f'<div class="{role_class}">{msg["content"]}</div>', unsafe_allow_html=True)
+    render_transcript(st.session_state.lib_ate_messages)
     
     # Handle user input
     user_input = st.chat_input("Your choice...", key="lib_ate_chat")
@@ -1044,7 +1497,7 @@ Type your choice (1-6 or text)."""
             if selection:
                 st.session_state.lib_ate_selections["absurdity"] = selection['name']
                 st.session_state.lib_ate_state = "generating_template"
-                st.rerun() # Force rerun to start generation immediately
+                rerun_current() # Force rerun to start generation immediately
             else:
                 st.session_state.lib_ate_messages.append({"role": "assistant", "content": "Please pick a valid absurdity level (1-6)."})
 
@@ -1098,21 +1551,21 @@ Type **YES** to reveal the story, or **NO** to restart."""
         elif state == "review":
             if "yes" in user_input.lower() or "reveal" in user_input.lower():
                 st.session_state.lib_ate_state = "reveal"
-                st.rerun()
+                rerun_current()
             else:
                 # Restart logic
                 st.session_state.lib_ate_state = "select_style"
                 st.session_state.lib_ate_messages = []
-                st.rerun()
+                rerun_current()
 
         elif state == "reveal":
              pass # Handled below
 
-        st.rerun()
+        rerun_current()
 
     # Handle "generating_template" state (Automatic transition)
     if st.session_state.lib_ate_state == "generating_template":
-        with st.spinner("🤫 Cooking up a secret story template..."):
+        if job_needed("lib_ate_template"):
             assistant = get_assistant()
             selections = st.session_state.lib_ate_selections
             
@@ -1169,36 +1622,14 @@ Type **YES** to reveal the story, or **NO** to restart."""
                 "required_inputs": ["Adjective", "Plural Noun", "Verb (Past Tense)", "Place", "Emotion", "Animal", "Food", ...]
             }
             """
-            try:
-                response = assistant.send_message(prompt)
-                clean_response = response.replace("```json", "").replace("```", "").strip()
-                data = json.loads(clean_response)
-                
-                st.session_state.lib_ate_data = data
-                st.session_state.lib_ate_inputs = []
-                st.session_state.lib_ate_current_input_idx = 0
-                st.session_state.lib_ate_state = "collecting"
-                
-                # Initial prompt msg
-                first_req = data["required_inputs"][0]
-                msg = f"""✅ **Absurdity set to:** {selections['absurdity']}
-                
-🤫 **Teaser:** *{data['teaser']}*
-                
-I need {len(data['required_inputs'])} inputs to reveal the truth.
-                
-**Prompt 1 of {len(data['required_inputs'])}**
-Give me a: **{first_req}**"""
-                st.session_state.lib_ate_messages.append({"role": "assistant", "content": msg})
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Generation failed: {e}")
-                st.session_state.lib_ate_state = "select_style" # Reset on error
-
+            start_job("lib_ate_template", "Secret story template", lib_ate_template_job(
+                assistant, prompt, st.session_state.current_quip
+            ))
+        render_job_progress("lib_ate_template", "🤫 Cooking up a secret story template...")
+    
     # Handle "reveal" state (Automatic generation part)
     if st.session_state.lib_ate_state == "reveal" and not st.session_state.get("lib_ate_story_revealed"):
-         with st.spinner("✨ Revealing the masterpiece..."):
+        if job_needed("lib_ate_reveal"):
             assistant = get_assistant()
             template = st.session_state.lib_ate_data['hidden_story_template']
             inputs = st.session_state.lib_ate_inputs
@@ -1218,29 +1649,20 @@ Give me a: **{first_req}**"""
             If any input is "Wild Card" or "Surprise Me", generate a fitting funny word for it.
             Output ONLY the final story.
             """
-            final_story = assistant.send_message(prompt)
-            st.session_state.lib_ate_final_story = final_story
-            st.session_state.lib_ate_story_revealed = True
-            
-            st.session_state.lib_ate_messages.append({"role": "assistant", "content": f"🎉 **HERE IT IS!**\n\n{final_story}"})
             
-            # Generate Image
-            if st.session_state.get("enable_image_generation", True):
-                 # Include variables in the image prompt and a snippet of the story to fix Visual-Narrative Misalignment
-                 story_snippet = final_story[:300].replace('\n', ' ')
-                 image_context = ", ".join(inputs)
-                 img_res = assistant.generate_image(f"Artistic illustration for {selections['genre']} genre story. Visual Context: '{story_snippet}'. Key elements to include: {image_context}. Style: vivid, cinematic. No text or words.")
-                 if "url" in img_res:
-                     st.session_state.lib_ate_image = img_res["url"]
-            st.rerun()
-
+            image_genre = selections['genre'] if st.session_state.get("enable_image_generation", True) else None
+            start_job("lib_ate_reveal", "Story reveal", lib_ate_reveal_job(
+                assistant, prompt, st.session_state.current_quip, image_genre, list(inputs)
+            ))
+        render_job_progress("lib_ate_reveal", "✨ Revealing the masterpiece...")
+    
     # Post-Reveal Controls
     if st.session_state.lib_ate_state == "reveal" and st.session_state.get("lib_ate_story_revealed"):
         st.markdown("---")
         st.markdown("### 🎬 Post-Story Options")
         
         if hasattr(st.session_state, "lib_ate_image"):
-             st.image(st.session_state.lib_ate_image, caption="Generated Illustration", use_container_width=True)
+             show_image(st.session_state.lib_ate_image, "Generated Illustration")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -1258,7 +1680,7 @@ Give me a: **{first_req}**"""
                  st.session_state.lib_ate_story_revealed = False
                  if hasattr(st.session_state, "lib_ate_image"):
                     del st.session_state.lib_ate_image
-                 st.rerun()
+                 rerun_current()
 
 
 def render_chat_mode():
@@ -1276,34 +1698,83 @@ def render_chat_mode():
     </div>
     """, unsafe_allow_html=True)
     
+    render_chat_panel()
+
+
+@st.fragment
+@saves_session
+@labels_metrics
+def render_chat_panel():
+    """PlaidChat transcript and input; a fragment, so each message reruns only the chat."""
     # Display message history
-    for msg in st.session_state.messages:
-        if msg["role"] == "user":
-            st.markdown(f'<div class="user-message">{msg["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="assistant-message">{msg["content"]}</div>', unsafe_allow_html=True)
+    render_transcript(st.session_state.messages)
     
-    # Chat input
-    user_input = st.chat_input("Type your message...", key="plaid_chat_input")
+    # Transcript export, built from the messages on screen (no API call per rerun)
+    if st.session_state.messages:
+        st.download_button(
+            "💾 Download Transcript",
+            "\n\n".join(f"{m['role'].title()}: {m['content']}" for m in st.session_state.messages),
+            file_name="plaidlibs_chat.txt",
+            mime="text/plain"
+        )
+    
+    # Chat input (held while a background story is using this session's thread)
+    thread_busy = get_job_manager().lane_busy(thread_lane())
+    if thread_busy:
+        st.caption("⏳ Finishing a story in the background; chat resumes when it is done.")
+    user_input = st.chat_input("Type your message...", key="plaid_chat_input", disabled=thread_busy)
     
     if user_input:
         # Add user message
         st.session_state.messages.append({"role": "user", "content": user_input})
         
-        # Get assistant response
+        # Get assistant response, rendering tokens as they arrive
         try:
             assistant = get_assistant()
-            response = assistant.send_message(user_input)
+            st.markdown(f'<div class="user-message">{user_input}</div>', unsafe_allow_html=True)
+            response = st.write_stream(assistant.stream_message(user_input))
             st.session_state.messages.append({"role": "assistant", "content": response})
         except Exception as e:
             st.session_state.messages.append({"role": "assistant", "content": f"Oops! I encountered an issue: {str(e)}"})
         
-        st.rerun()
+        rerun_current()
 
 
 # =============================================================================
 # CREATE DIRECT MODE
 # =============================================================================
+def create_direct_job(assistant, prompt: str, image_prompt: str = None):
+    """Job function writing a Create Direct story and its illustration."""
+    thread_id = assistant.get_or_create_thread()  # now, not when the job runs (see stream_message)
+    
+    def run(job):
+        # The illustration only depends on the topic, so start it alongside the text
+        image_future = assistant.submit_image(image_prompt, style="vivid") if image_prompt else None
+        story = job.stream(assistant.stream_message(prompt, thread_id=thread_id))
+        
+        # Collect the illustration started above
+        image = None
+        if image_future is not None:
+            job.set_step("🎨 Finishing illustration...")
+            image = image_future.result().get("url")
+        return {"story": story, "image": image}
+    return run
+
+
+def apply_create_direct(result: dict):
+    st.session_state.create_direct_result = result["story"]
+    st.session_state.create_direct_image = result["image"]
+    st.session_state.create_direct_stage = "result"
+
+
+def rollback_create_direct():
+    if "create_direct_result" in st.session_state:
+        st.session_state.create_direct_stage = "result"
+    else:
+        st.session_state.create_direct_stage = "topic"
+        st.session_state.create_direct_topic_input = st.session_state.create_direct_topic
+
+
 def render_create_direct():
     """Render the Create Direct mode - free-form story creation with AI guidance."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -1373,13 +1844,17 @@ def render_create_direct():
                 st.warning("Please enter a story idea!")
     
     elif st.session_state.create_direct_stage == "generating":
-        with st.spinner("🪄 Crafting your story..."):
-            try:
-                assistant = get_assistant()
-                
-                genre_text = f" in the {st.session_state.create_direct_genre} genre" if st.session_state.create_direct_genre and st.session_state.create_direct_genre != "Any" else ""
-                
-                prompt = f"""
+        if job_needed("create_direct"):
+            assistant = get_assistant()
+            
+            genre_text = f" in the {st.session_state.create_direct_genre} genre" if st.session_state.create_direct_genre and st.session_state.create_direct_genre != "Any" else ""
+            
+            image_prompt = None
+            if st.session_state.get("enable_image_generation", True):
+                genre_style = st.session_state.create_direct_genre if st.session_state.create_direct_genre and st.session_state.create_direct_genre != "Any" else "creative"
+                image_prompt = f"A vivid, artistic illustration depicting: {st.session_state.create_direct_topic[:200]}. Style: {genre_style}, cinematic lighting, detailed, storybook quality. No text or words in the image."
+            
+            prompt = f"""
 Create a story based on this concept{genre_text}:
 
 **Concept:** {st.session_state.create_direct_topic}
@@ -1388,29 +1863,13 @@ Create a story based on this concept{genre_text}:
 
 Write an engaging, creative story that brings this idea to life. Be vivid, entertaining, and surprising!
 """
-                response = assistant.send_message(prompt)
-                st.session_state.create_direct_result = response
-                
-                # Generate image if enabled
-                if st.session_state.get("enable_image_generation", True):
-                    with st.spinner("🎨 Creating illustration..."):
-                        genre_style = st.session_state.create_direct_genre if st.session_state.create_direct_genre and st.session_state.create_direct_genre != "Any" else "creative"
-                        image_prompt = f"A vivid, artistic illustration depicting: {st.session_state.create_direct_topic[:200]}. Style: {genre_style}, cinematic lighting, detailed, storybook quality. No text or words in the image."
-                        image_result = assistant.generate_image(image_prompt, style="vivid")
-                        if "url" in image_result:
-                            st.session_state.create_direct_image = image_result["url"]
-                        else:
-                            st.session_state.create_direct_image = None
-                
-                st.session_state.create_direct_stage = "result"
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+            start_job("create_direct", "Story", create_direct_job(assistant, prompt, image_prompt), lane=thread_lane())
+        render_job_progress("create_direct", "🪄 Crafting your story...")
     
     elif st.session_state.create_direct_stage == "result":
         # Display image if available
         if hasattr(st.session_state, 'create_direct_image') and st.session_state.create_direct_image:
-            st.image(st.session_state.create_direct_image, caption="🎨 AI-Generated Illustration", use_container_width=True)
+            show_image(st.session_state.create_direct_image, "🎨 AI-Generated Illustration")
         
         st.markdown(f"""
         <div class="story-output animate-in">
@@ -1449,6 +1908,49 @@ Write an engaging, creative story that brings this idea to life. Be vivid, enter
 # =============================================================================
 # STORYLINE MODE
 # =============================================================================
+def storyline_entries() -> list:
+    """Storyline episodes as compaction entries, oldest first."""
+    return [f"Episode {i+1}:\n{ep['text']}" for i, ep in enumerate(st.session_state.storyline_episodes)]
+
+
+def storyline_episode_job(assistant, prompt: str, ep_num: int, with_image: bool):
+    """
+    Job function writing one Storyline episode and its illustration.
+    
+    The episode is a stateless completion: prompt already carries the rolling
+    summary and the latest episode (build_context), so nothing else is sent
+    and the request stays the same size however long the story runs.
+    """
+    def run(job):
+        text = job.stream(assistant.stream_complete(prompt))
+        
+        # Generate episode image if enabled
+        image = None
+        if with_image:
+            job.set_step(f"🎨 Creating Episode {ep_num} illustration...")
+            # Use the generated episode text to drive the image prompt
+            image_prompt = f"A dramatic cinematic illustration for Episode {ep_num}. Scene Description: {text[:300]}... Style: epic, detailed, storybook fantasy art, dramatic lighting. No text or words in the image."
+            image = assistant.generate_image(image_prompt, style="vivid").get("url")
+        
+        return {"text": text, "image": image}
+    return run
+
+
+def apply_storyline_episode(result: dict):
+    st.session_state.storyline_episodes.append({"text": result["text"], "image": result["image"]})
+    st.session_state.storyline_stage = "episode"
+    refresh_memory("storyline_memory")
+
+
+def rollback_storyline_episode():
+    if st.session_state.storyline_episodes:
+        st.session_state.storyline_current_ep = len(st.session_state.storyline_episodes)
+        st.session_state.storyline_stage = "episode"
+    else:
+        st.session_state.storyline_stage = "setup"
+        st.session_state.storyline_premise_input = st.session_state.storyline_premise
+
+
 def render_storyline():
     """Render the Storyline mode - multi-part episodic storytelling."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -1462,6 +1964,8 @@ def render_storyline():
         st.session_state.storyline_episodes = []
     if "storyline_current_ep" not in st.session_state:
         st.session_state.storyline_current_ep = 0
+    if "storyline_summary" not in st.session_state:
+        st.session_state.storyline_summary = new_summary()
     
     st.markdown(f"""
     <div class="mode-badge">{quip['icon']} {quip['name']} - 📚 Storyline</div>
@@ -1498,16 +2002,16 @@ def render_storyline():
         ep_num = st.session_state.storyline_current_ep
         total_eps = st.session_state.storyline_num_episodes
         
-        with st.spinner(f"📖 Writing Episode {ep_num} of {total_eps}..."):
-            try:
-                assistant = get_assistant()
-                
-                previous_context = ""
-                if st.session_state.storyline_episodes:
-                    previous_context = f"\n\nPrevious episodes summary:\n" + "\n---\n".join([f"Episode {i+1}: {ep['text'][:200]}..." for i, ep in enumerate(st.session_state.storyline_episodes)])
-                
-                if ep_num == 1:
-                    prompt = f"""
+        if job_needed("storyline_episode"):
+            assistant = get_assistant()
+            
+            # Rolling summary of older episodes plus the latest one verbatim
+            previous_context = ""
+            if st.session_state.storyline_episodes:
+                previous_context = "\n\n" + build_context(st.session_state.storyline_summary, storyline_entries())
+            
+            if ep_num == 1:
+                prompt = f"""
 Create Episode 1 of a {total_eps}-part story series.
 
 **Premise:** {st.session_state.storyline_premise}
@@ -1519,8 +2023,8 @@ Write an engaging opening episode that:
 
 Keep it around 300-400 words. End with "TO BE CONTINUED..."
 """
-                elif ep_num == total_eps:
-                    prompt = f"""
+            elif ep_num == total_eps:
+                prompt = f"""
 Create the FINAL Episode ({ep_num}) of a {total_eps}-part story series.
 
 **Original Premise:** {st.session_state.storyline_premise}
@@ -1533,8 +2037,8 @@ Write a satisfying conclusion that:
 
 Keep it around 400-500 words.
 """
-                else:
-                    prompt = f"""
+            else:
+                prompt = f"""
 Create Episode {ep_num} of a {total_eps}-part story series.
 
 **Original Premise:** {st.session_state.storyline_premise}
@@ -1547,24 +2051,14 @@ Write this middle episode that:
 
 Keep it around 300-400 words. End with "TO BE CONTINUED..."
 """
-                
-                response = assistant.send_message(prompt)
-                
-                # Generate episode image if enabled
-                episode_image = None
-                if st.session_state.get("enable_image_generation", True):
-                    with st.spinner(f"🎨 Creating Episode {ep_num} illustration..."):
-                        # Use the generated episode text (response) to drive the image prompt
-                        image_prompt = f"A dramatic cinematic illustration for Episode {ep_num}. Scene Description: {response[:300]}... Style: epic, detailed, storybook fantasy art, dramatic lighting. No text or words in the image."
-                        image_result = assistant.generate_image(image_prompt, style="vivid")
-                        if "url" in image_result:
-                            episode_image = image_result["url"]
-                
-                st.session_state.storyline_episodes.append({"text": response, "image": episode_image})
-                st.session_state.storyline_stage = "episode"
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+            
+            start_job(
+                "storyline_episode", f"Episode {ep_num}",
+                storyline_episode_job(
+                    assistant, prompt, ep_num, st.session_state.get("enable_image_generation", True)
+                )
+            )
+        render_job_progress("storyline_episode", f"📖 Writing Episode {ep_num} of {total_eps}...")
     
     elif st.session_state.storyline_stage == "episode":
         ep_num = st.session_state.storyline_current_ep
@@ -1578,7 +2072,7 @@ Keep it around 300-400 words. End with "TO BE CONTINUED..."
                     episode = st.session_state.storyline_episodes[i]
                     # Display episode image if available
                     if episode.get("image"):
-                        st.image(episode["image"], caption=f"🎨 Episode {i+1} Illustration", use_container_width=True)
+                        show_image(episode["image"], f"🎨 Episode {i+1} Illustration")
                     st.markdown(f"""
                     <div class="story-output">
                         <div style="font-size: 1.2rem; margin-bottom: 1rem; text-align: center;">
@@ -1591,7 +2085,7 @@ Keep it around 300-400 words. End with "TO BE CONTINUED..."
             episode = st.session_state.storyline_episodes[-1]
             # Display episode image if available
             if episode.get("image"):
-                st.image(episode["image"], caption=f"🎨 Episode {ep_num} Illustration", use_container_width=True)
+                show_image(episode["image"], f"🎨 Episode {ep_num} Illustration")
             st.markdown(f"""
             <div class="story-output animate-in">
                 <div style="font-size: 1.2rem; margin-bottom: 1rem; text-align: center;">
@@ -1614,6 +2108,8 @@ Keep it around 300-400 words. End with "TO BE CONTINUED..."
                 st.session_state.storyline_stage = "setup"
                 st.session_state.storyline_episodes = []
                 st.session_state.storyline_current_ep = 0
+                st.session_state.storyline_summary = new_summary()
+                discard_jobs("storyline_memory")
                 st.session_state.storyline_premise = ""
                 st.rerun()
         with col3:
@@ -1630,6 +2126,35 @@ Keep it around 300-400 words. End with "TO BE CONTINUED..."
 # =============================================================================
 # PLAIDPIC MODE
 # =============================================================================
+def script_and_images_job(assistant, prompt: str, persona: str, image_prompts: list, caption: str):
+    """Job function streaming a completion, then drawing its images concurrently (each shown as it lands)."""
+    def run(job):
+        text = job.stream(assistant.stream_complete(prompt, persona=persona))
+        
+        urls = [None] * len(image_prompts)
+        job.expect_images(len(image_prompts), caption)
+        for drawn, (i, image_result) in enumerate(assistant.iter_images(image_prompts, style="vivid")):
+            job.set_step(f"🎨 Drawing {caption.lower()}s ({drawn + 1} of {len(image_prompts)} done)...")
+            urls[i] = image_result.get("url")
+            job.add_image(i, urls[i])
+        return {"text": text, "images": [url for url in urls if url]}
+    return run
+
+
+def apply_plaidpic(result: dict):
+    st.session_state.plaidpic_result = result["text"]
+    st.session_state.plaidpic_images = result["images"]
+    st.session_state.plaidpic_stage = "result"
+
+
+def rollback_plaidpic():
+    if "plaidpic_result" in st.session_state:
+        st.session_state.plaidpic_stage = "result"
+    else:
+        st.session_state.plaidpic_stage = "input"
+        st.session_state.plaidpic_story_input = st.session_state.plaidpic_story
+
+
 def render_plaidpic():
     """Render the PlaidPic mode - story to visual description/prompts."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -1682,13 +2207,12 @@ def render_plaidpic():
                 st.warning("Please enter a story!")
     
     elif st.session_state.plaidpic_stage == "generating":
-        with st.spinner("🎨 Creating visual prompts..."):
-            try:
-                assistant = get_assistant()
-                style = st.session_state.get("plaidpic_style", "Cinematic/Realistic")
-                num_panels = st.session_state.plaidpic_panels
-                
-                prompt = f"""
+        if job_needed("plaidpic"):
+            assistant = get_assistant()
+            style = st.session_state.get("plaidpic_style", "Cinematic/Realistic")
+            num_panels = st.session_state.plaidpic_panels
+            
+            prompt = f"""
 Analyze this story and create {num_panels} detailed image generation prompts for key visual moments.
 
 **Story:**
@@ -1707,25 +2231,19 @@ For each scene, provide:
 
 Format each as a clear, numbered panel. Make prompts vivid and specific!
 """
-                
-                response = assistant.send_message(prompt)
-                st.session_state.plaidpic_result = response
-                
-                # Generate actual images if enabled
-                if st.session_state.get("enable_image_generation", True):
-                    st.session_state.plaidpic_images = []
-                    for i in range(min(num_panels, 4)):  # Limit to 4 images max for cost
-                        with st.spinner(f"🎨 Generating image {i+1} of {min(num_panels, 4)}..."):
-                            # Create a simple image prompt based on the story
-                            image_prompt = f"Scene {i+1} from a {style.lower()} visual story: {st.session_state.plaidpic_story[:150]}. Style: {style}, detailed, artistic composition. No text or words in the image."
-                            image_result = assistant.generate_image(image_prompt, style="vivid")
-                            if "url" in image_result:
-                                st.session_state.plaidpic_images.append(image_result["url"])
-                
-                st.session_state.plaidpic_stage = "result"
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+            
+            # Generate actual images if enabled: a simple image prompt per scene, drawn all at once
+            image_prompts = []
+            if st.session_state.get("enable_image_generation", True):
+                image_prompts = [
+                    f"Scene {i+1} from a {style.lower()} visual story: {st.session_state.plaidpic_story[:150]}. Style: {style}, detailed, artistic composition. No text or words in the image."
+                    for i in range(min(num_panels, 4))  # Limit to 4 images max for cost
+                ]
+            
+            start_job("plaidpic", "Visual prompts", script_and_images_job(
+                assistant, prompt, st.session_state.current_quip, image_prompts, "Scene"
+            ))
+        render_job_progress("plaidpic", "🎨 Creating visual prompts...")
     
     elif st.session_state.plaidpic_stage == "result":
         # Display generated images if available
@@ -1734,7 +2252,7 @@ Format each as a clear, numbered panel. Make prompts vivid and specific!
             cols = st.columns(min(len(st.session_state.plaidpic_images), 2))
             for i, img_url in enumerate(st.session_state.plaidpic_images):
                 with cols[i % 2]:
-                    st.image(img_url, caption=f"Scene {i+1}", use_container_width=True)
+                    show_image(img_url, f"Scene {i+1}")
             st.markdown("---")
         
         st.markdown(f"""
@@ -1773,6 +2291,16 @@ Format each as a clear, numbered panel. Make prompts vivid and specific!
 # =============================================================================
 # PLAIDMAGGEN MODE (Comic Generation)
 # =============================================================================
+def apply_maggen(result: dict):
+    st.session_state.maggen_result = result["text"]
+    st.session_state.maggen_images = result["images"]
+    st.session_state.maggen_stage = "result"
+
+
+def rollback_maggen():
+    st.session_state.maggen_stage = "result" if "maggen_result" in st.session_state else "input"
+
+
 def render_plaidmaggen():
     """Render PlaidMagGen mode - comic/magazine style story panels."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -1820,11 +2348,10 @@ def render_plaidmaggen():
                 st.warning("Please enter a concept!")
     
     elif st.session_state.maggen_stage == "generating":
-        with st.spinner("📰 Creating your comic..."):
-            try:
-                assistant = get_assistant()
-                
-                prompt = f"""
+        if job_needed("maggen"):
+            assistant = get_assistant()
+            
+            prompt = f"""
 Create a {st.session_state.maggen_panels}-panel comic story in {st.session_state.maggen_style} style.
 
 **Concept:** {st.session_state.maggen_concept}
@@ -1837,33 +2364,28 @@ For each panel, provide:
 
 Make it dynamic, expressive, and tell a complete mini-story with a satisfying ending or punchline!
 """
-                
-                response = assistant.send_message(prompt)
-                st.session_state.maggen_result = response
-                
-                # Generate comic panel images if enabled
-                if st.session_state.get("enable_image_generation", True):
-                    st.session_state.maggen_images = []
-                    num_panels = min(st.session_state.maggen_panels, 4)  # Limit for cost
-                    for i in range(num_panels):
-                        with st.spinner(f"🎨 Drawing panel {i+1} of {num_panels}..."):
-                            style_map = {
-                                "Classic Superhero": "classic superhero comic book art, bold colors, dynamic action poses",
-                                "Manga/Anime": "manga anime style, expressive eyes, dynamic lines",
-                                "Indie/Alternative": "indie comic art style, unique artistic flair",
-                                "Newspaper Strip": "newspaper comic strip style, clean lines, humorous",
-                                "Graphic Novel": "graphic novel art, cinematic, detailed"
-                            }
-                            art_style = style_map.get(st.session_state.maggen_style, "comic book art")
-                            image_prompt = f"Comic panel {i+1}: {st.session_state.maggen_concept[:100]}. Style: {art_style}, sequential art, no text or speech bubbles. High quality illustration."
-                            image_result = assistant.generate_image(image_prompt, style="vivid")
-                            if "url" in image_result:
-                                st.session_state.maggen_images.append(image_result["url"])
-                
-                st.session_state.maggen_stage = "result"
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+            
+            # Generate comic panel images if enabled
+            image_prompts = []
+            if st.session_state.get("enable_image_generation", True):
+                num_panels = min(st.session_state.maggen_panels, 4)  # Limit for cost
+                style_map = {
+                    "Classic Superhero": "classic superhero comic book art, bold colors, dynamic action poses",
+                    "Manga/Anime": "manga anime style, expressive eyes, dynamic lines",
+                    "Indie/Alternative": "indie comic art style, unique artistic flair",
+                    "Newspaper Strip": "newspaper comic strip style, clean lines, humorous",
+                    "Graphic Novel": "graphic novel art, cinematic, detailed"
+                }
+                art_style = style_map.get(st.session_state.maggen_style, "comic book art")
+                image_prompts = [
+                    f"Comic panel {i+1}: {st.session_state.maggen_concept[:100]}. Style: {art_style}, sequential art, no text or speech bubbles. High quality illustration."
+                    for i in range(num_panels)
+                ]
+            
+            start_job("maggen", "Comic", script_and_images_job(
+                assistant, prompt, st.session_state.current_quip, image_prompts, "Panel"
+            ))
+        render_job_progress("maggen", "📰 Creating your comic...")
     
     elif st.session_state.maggen_stage == "result":
         # Display generated comic panels if available
@@ -1872,7 +2394,7 @@ Make it dynamic, expressive, and tell a complete mini-story with a satisfying en
             cols = st.columns(2)
             for i, img_url in enumerate(st.session_state.maggen_images):
                 with cols[i % 2]:
-                    st.image(img_url, caption=f"Panel {i+1}", use_container_width=True)
+                    show_image(img_url, f"Panel {i+1}")
             st.markdown("---")
         
         st.markdown(f"""
@@ -1902,6 +2424,51 @@ Make it dynamic, expressive, and tell a complete mini-story with a satisfying en
 # =============================================================================
 # PLAIDPLAY MODE (Interactive Story)
 # =============================================================================
+def plaidplay_entries() -> list:
+    """PlaidPlay history as compaction entries, oldest first."""
+    return [
+        f"{'Story:' if e['type'] == 'story' else 'Player chose:'} {e['content']}"
+        for e in st.session_state.plaidplay_history
+    ]
+
+
+def plaidplay_beat_job(assistant, prompt: str, image_prompt: str):
+    """
+    Job function writing the next PlaidPlay scene and its illustration.
+    
+    Like the Storyline episodes, the scene is a stateless completion whose
+    prompt carries only the rolling summary and the recent beats.
+    """
+    def run(job):
+        # The scene illustration only depends on the setting, so start it alongside the text
+        image_future = assistant.submit_image(image_prompt, style="vivid") if image_prompt else None
+        text = job.stream(assistant.stream_complete(prompt))
+        
+        # Collect the scene illustration started above
+        image = None
+        if image_future is not None:
+            job.set_step("🎨 Illustrating scene...")
+            image = image_future.result().get("url")
+        
+        return {"text": text, "image": image}
+    return run
+
+
+def apply_plaidplay_beat(result: dict):
+    st.session_state.plaidplay_history.append({"type": "story", "content": result["text"], "image": result["image"]})
+    st.session_state.plaidplay_needs_story = False
+    refresh_memory("plaidplay_memory")
+
+
+def rollback_plaidplay_beat():
+    history = st.session_state.plaidplay_history
+    if history and history[-1]["type"] == "choice":
+        history.pop()
+    st.session_state.plaidplay_needs_story = False
+    if not history:
+        st.session_state.plaidplay_stage = "setup"
+
+
 def render_plaidplay():
     """Render PlaidPlay mode - interactive choose-your-own-adventure."""
     quip = QUIP_PERSONAS[st.session_state.current_quip]
@@ -1910,6 +2477,8 @@ def render_plaidplay():
         st.session_state.plaidplay_stage = "setup"
     if "plaidplay_history" not in st.session_state:
         st.session_state.plaidplay_history = []
+    if "plaidplay_summary" not in st.session_state:
+        st.session_state.plaidplay_summary = new_summary()
     
     st.markdown(f"""
     <div class="mode-badge">{quip['icon']} {quip['name']} - 🎮 PlaidPlay</div>
@@ -1939,34 +2508,44 @@ def render_plaidplay():
                 st.rerun()
     
     elif st.session_state.plaidplay_stage == "playing":
-        # Display history
-        for entry in st.session_state.plaidplay_history:
-            if entry["type"] == "story":
-                # Display scene image if available
-                if entry.get("image"):
-                    st.image(entry["image"], caption="🎮 Scene Illustration", use_container_width=True)
-                st.markdown(f"""
-                <div class="assistant-message">
-                    {entry["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class="user-message">
-                    ▶ {entry["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-        
-        # Get next story beat or choices
-        if not st.session_state.plaidplay_history or st.session_state.get("plaidplay_needs_story"):
-            with st.spinner("📖 The story unfolds..."):
-                try:
-                    assistant = get_assistant()
-                    
-                    history_context = "\n".join([f"{'Story:' if e['type'] == 'story' else 'Player chose:'} {e['content']}" for e in st.session_state.plaidplay_history[-6:]])
-                    
-                    if not st.session_state.plaidplay_history:
-                        prompt = f"""
+        render_plaidplay_adventure()
+
+
+@st.fragment
+@saves_session
+@labels_metrics
+def render_plaidplay_adventure():
+    """PlaidPlay story so far and the next choice; a fragment, so each turn reruns only the adventure."""
+    # Display history, one transcript element per run of beats between scene images
+    beats = []
+    for entry in st.session_state.plaidplay_history:
+        if entry["type"] == "story":
+            # Display scene image if available
+            if entry.get("image"):
+                render_transcript(beats)
+                beats = []
+                show_image(entry["image"], "🎮 Scene Illustration")
+            beats.append({"role": "assistant", "content": entry["content"]})
+        else:
+            beats.append({"role": "user", "content": f"▶ {entry['content']}"})
+    render_transcript(beats)
+    
+    # Get next story beat or choices
+    writing = not st.session_state.plaidplay_history or st.session_state.get("plaidplay_needs_story")
+    if writing:
+        if job_needed("plaidplay_beat"):
+            assistant = get_assistant()
+            
+            # Rolling summary of earlier beats plus the latest beat and choice verbatim
+            history_context = build_context(st.session_state.plaidplay_summary, plaidplay_entries())
+            
+            image_prompt = None
+            if st.session_state.get("enable_image_generation", True):
+                setting_clean = st.session_state.plaidplay_setting.replace("🏰", "").replace("🚀", "").replace("🔍", "").replace("🏝️", "").replace("🌆", "").strip()
+                image_prompt = f"Interactive adventure scene in a {setting_clean} setting. Style: immersive, atmospheric, game art, cinematic lighting, dramatic. No text or words in the image."
+            
+            if not st.session_state.plaidplay_history:
+                prompt = f"""
 Start an interactive adventure story in this setting: {st.session_state.plaidplay_setting}
 
 Write an engaging opening scene (2-3 paragraphs) that:
@@ -1982,9 +2561,9 @@ What do you do?
 2. [Second choice]
 3. [Third choice]
 """
-                    else:
-                        last_choice = [e for e in st.session_state.plaidplay_history if e["type"] == "choice"][-1]["content"]
-                        prompt = f"""
+            else:
+                last_choice = [e for e in st.session_state.plaidplay_history if e["type"] == "choice"][-1]["content"]
+                prompt = f"""
 Continue the interactive adventure:
 
 Previous context:
@@ -2005,58 +2584,131 @@ What do you do?
 2. [Second choice]
 3. [Third choice]
 """
-                    
-                    response = assistant.send_message(prompt)
-                    
-                    # Generate scene image if enabled
-                    scene_image = None
-                    if st.session_state.get("enable_image_generation", True):
-                        with st.spinner("🎨 Illustrating scene..."):
-                            setting_clean = st.session_state.plaidplay_setting.replace("🏰", "").replace("🚀", "").replace("🔍", "").replace("🏝️", "").replace("🌆", "").strip()
-                            image_prompt = f"Interactive adventure scene in a {setting_clean} setting. Style: immersive, atmospheric, game art, cinematic lighting, dramatic. No text or words in the image."
-                            image_result = assistant.generate_image(image_prompt, style="vivid")
-                            if "url" in image_result:
-                                scene_image = image_result["url"]
-                    
-                    st.session_state.plaidplay_history.append({"type": "story", "content": response, "image": scene_image})
-                    st.session_state.plaidplay_needs_story = False
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-        
-        # Show choice buttons
-        st.markdown("---")
-        st.markdown("**Your Choice:**")
-        
-        choice = st.text_input("Type your choice or action:", key="plaidplay_choice_input", placeholder="Enter 1, 2, 3, or describe your own action...")
-        
-        if st.button("▶ Make Choice", use_container_width=True):
-            if choice.strip():
-                st.session_state.plaidplay_history.append({"type": "choice", "content": choice.strip()})
-                st.session_state.plaidplay_needs_story = True
-                st.rerun()
-        
-        st.markdown("---")
-        if st.button("🔄 Start New Adventure", use_container_width=True):
-            st.session_state.plaidplay_stage = "setup"
-            st.session_state.plaidplay_history = []
-            st.rerun()
+            
+            start_job(
+                "plaidplay_beat", "Next scene",
+                plaidplay_beat_job(assistant, prompt, image_prompt)
+            )
+        render_job_progress("plaidplay_beat", "📖 The story unfolds...")
+    
+    # Show choice buttons
+    st.markdown("---")
+    st.markdown("**Your Choice:**")
+    
+    choice = st.text_input("Type your choice or action:", key="plaidplay_choice_input", placeholder="Enter 1, 2, 3, or describe your own action...")
+    
+    if st.button("▶ Make Choice", use_container_width=True, disabled=bool(writing)):
+        if choice.strip():
+            st.session_state.plaidplay_history.append({"type": "choice", "content": choice.strip()})
+            st.session_state.plaidplay_needs_story = True
+            rerun_current()
+    
+    st.markdown("---")
+    if st.button("🔄 Start New Adventure", use_container_width=True):
+        st.session_state.plaidplay_stage = "setup"
+        st.session_state.plaidplay_history = []
+        st.session_state.plaidplay_summary = new_summary()
+        discard_jobs("plaidplay_memory")
+        st.rerun()  # the setup screen lives outside this fragment
+
+
+# =============================================================================
+# STORY MEMORY
+# =============================================================================
+# Memory slot -> (session state key of the rolling summary, entries function).
+# Each summary is updated by its own BACKGROUND job after a scene is shown, so
+# folding old scenes into it never delays the next one.
+MEMORY_SLOTS = {
+    "storyline_memory": ("storyline_summary", storyline_entries),
+    "plaidplay_memory": ("plaidplay_summary", plaidplay_entries),
+}
+
+
+def memory_job(assistant, summary: dict, entries: list):
+    """Job function folding entries that are no longer recent into summary."""
+    def run(job):
+        job.set_step("🧠 Updating story memory...")
+        return update_summary(summary, entries, lambda prompt: assistant.complete(prompt, priority=BACKGROUND))
+    return run
+
+
+def refresh_memory(slot: str):
+    """
+    Start slot's memory job if its summary is behind the story.
+    
+    Only one update runs per story at a time; when it lands, apply_memory
+    calls this again to catch up with scenes written meanwhile.
+    """
+    key, entries_fn = MEMORY_SLOTS[slot]
+    summary, entries = st.session_state.get(key) or new_summary(), entries_fn()
+    if session_job(slot) is None and len(entries) - 1 > summary["covered"]:
+        start_job(slot, "Story memory", memory_job(get_assistant(), summary, entries))
+
+
+def apply_memory(slot: str):
+    """apply function for a memory slot: store the updated summary, then catch up."""
+    def apply(summary: dict):
+        key, entries_fn = MEMORY_SLOTS[slot]
+        # A story restarted meanwhile has fewer entries than the summary covers
+        if summary["covered"] <= len(entries_fn()):
+            st.session_state[key] = summary
+        refresh_memory(slot)
+    return apply
 
 
 # =============================================================================
 # MAIN APPLICATION
 # =============================================================================
+# Session state key holding each mode's current stage (used as a metrics label)
+MODE_STAGE_KEYS = {
+    "lib_ate": "lib_ate_state",
+    "create_direct": "create_direct_stage",
+    "storyline": "storyline_stage",
+    "plaid_pic": "plaidpic_stage",
+    "plaid_mag_gen": "maggen_stage",
+    "plaid_play": "plaidplay_stage",
+}
+
+# Background job slots: slot -> (mode, apply(result), rollback()). apply writes a
+# finished job's result into session state; rollback returns a cancelled job's
+# workflow to the stage before it was started.
+JOB_SLOTS = {
+    "lib_ate_template": ("lib_ate", apply_lib_ate_template, rollback_lib_ate_template),
+    "lib_ate_reveal": ("lib_ate", apply_lib_ate_reveal, rollback_lib_ate_reveal),
+    "create_direct": ("create_direct", apply_create_direct, rollback_create_direct),
+    "storyline_episode": ("storyline", apply_storyline_episode, rollback_storyline_episode),
+    "plaidpic": ("plaid_pic", apply_plaidpic, rollback_plaidpic),
+    "maggen": ("plaid_mag_gen", apply_maggen, rollback_maggen),
+    "plaidplay_beat": ("plaid_play", apply_plaidplay_beat, rollback_plaidplay_beat),
+    "storyline_memory": ("storyline", apply_memory("storyline_memory"), lambda: None),
+    "plaidplay_memory": ("plaid_play", apply_memory("plaidplay_memory"), lambda: None),
+}
+
+
+def render_queue_status():
+    """Show a wait estimate when the shared OpenAI rate limits are queuing calls."""
+    scheduler = get_scheduler()
+    depth = scheduler.queue_depth()
+    if depth:
+        wait = scheduler.estimate_wait(session=current_session_id())
+        st.caption(f"⏳ Busy right now: {depth} request(s) queued, about {wait:.0f}s wait")
+
+
 def main():
     """Main application entry point."""
+    restore_session()
     init_session_state()
-    render_sidebar()
+    collect_jobs()
+    with st.sidebar:
+        render_sidebar()
     
     # Main content area
     st.markdown('<h1 class="main-header">🧵 PlaidLibs™</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Interactive Storytelling Powered by AI</p>', unsafe_allow_html=True)
     
-    # Check for API configuration
-    if not os.getenv("OPENAI_API_KEY") or not os.getenv("OPENAI_ASSISTANT_ID"):
+    # Check for API configuration (the offline fake backend and cassette replay need none)
+    configured = os.getenv("OPENAI_API_KEY") and os.getenv("OPENAI_ASSISTANT_ID")
+    if not configured and not uses_local_backend():
         st.warning("""
         ⚠️ **Configuration Required**
         
@@ -2066,6 +2718,8 @@ def main():
         3. Add your `OPENAI_ASSISTANT_ID`
         
         Need to create an assistant? Use the setup script or OpenAI's Playground.
+        
+        Just exploring? Set `PLAIDLIBS_FAKE_OPENAI=1` to run offline against a local stand-in.
         """)
         
         # Show setup instructions
@@ -2096,10 +2750,16 @@ def main():
             """)
         return
     
+    render_queue_status()
+    if other_mode_jobs():
+        render_job_tray()
+    
     # Render appropriate content based on mode and stage
     current_mode = st.session_state.current_mode
     current_stage = st.session_state.current_stage
     
+    label_metrics()
+    
     if current_mode == "plaid_chat":
         render_chat_mode()
     elif current_mode == "lib_ate":
@@ -2120,4 +2780,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Also when the run ends in st.rerun(), so a refresh never loses the last click
+        save_session()
@@ -3,28 +3,802 @@ PlaidLibs™ OpenAI Assistant Integration Module
 Handles all communication with the OpenAI Assistants API.
 """
 
+import asyncio
+import base64
+import contextvars
+import hashlib
+import importlib.util
 import os
+import random
+import threading
 import time
-from typing import Optional, Generator
-from openai import OpenAI
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Optional, Generator, AsyncGenerator, Iterator, Tuple, List
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from config import QUIP_PERSONAS, get_system_prompt
+from image_store import ImageStore, get_image_store, image_key
+from scheduler import (Scheduler, get_scheduler, estimate_tokens, DEFAULT_SESSION,
+                       INTERACTIVE, IMAGE, BACKGROUND)
+from resilience import (RunFailedError, is_retryable, call_with_retry, async_call_with_retry,
+                        retry_stream, async_retry_stream, hedged_call, async_hedged_call,
+                        get_latency_tracker, HedgeAttempt, HEDGING_ENABLED)
+from singleflight import SingleFlight, get_single_flight, get_async_single_flight, request_key
+from metrics import track, record_usage, record_image
+import fake_openai
+import cassette
 
 # Load environment variables
 load_dotenv()
 
+# Connection pool shared by all requests made through one client
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("PLAIDLIBS_HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("PLAIDLIBS_HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=60.0
+)
 
-class PlaidLibsAssistant:
-    """Manages the OpenAI Assistant for PlaidLibs interactions."""
+# Fail fast on connect, but leave room for long generations and image calls
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0, pool=10.0)
+
+# Model used for the per-persona assistants created by AssistantRegistry
+ASSISTANT_MODEL = os.getenv("OPENAI_ASSISTANT_MODEL", "gpt-4-turbo-preview")
+
+# Seconds before a persona whose assistant could not be resolved is tried again
+REGISTRY_RETRY_INTERVAL = float(os.getenv("PLAIDLIBS_REGISTRY_RETRY_INTERVAL", "60"))
+
+# Model used for stateless one-shot completions (no Assistants thread)
+CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4-turbo-preview")
+
+# Upper bound on simultaneous DALL-E requests issued by one batch
+DEFAULT_IMAGE_CONCURRENCY = int(os.getenv("PLAIDLIBS_IMAGE_CONCURRENCY", "4"))
+
+# HTTP/2 multiplexes concurrent requests over one connection when h2 is installed
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+
+def uses_local_backend() -> bool:
+    """True when API calls are answered locally (fake backend or cassette replay), needing no credentials."""
+    return fake_openai.is_enabled() or cassette.is_replaying()
+
+
+def _api_key() -> Optional[str]:
+    """The API key, or a placeholder when requests are answered locally."""
+    if uses_local_backend():
+        return os.getenv("OPENAI_API_KEY") or "fake"
+    return os.getenv("OPENAI_API_KEY")
+
+
+def build_openai_client() -> OpenAI:
+    """
+    Create an OpenAI client backed by a tuned keep-alive connection pool.
+    
+    PLAIDLIBS_FAKE_OPENAI swaps the network for the local fake backend, and
+    PLAIDLIBS_CASSETTE records or replays the traffic (see cassette.py).
+    """
+    if fake_openai.is_enabled():
+        transport = fake_openai.FakeOpenAITransport()
+    else:
+        transport = httpx.HTTPTransport(limits=HTTP_POOL_LIMITS, http2=HTTP2_ENABLED)
+    http_client = httpx.Client(transport=cassette.wrap_transport(transport), timeout=HTTP_TIMEOUT)
+    # Retries are handled by resilience.py, outside the scheduler admission
+    return OpenAI(api_key=_api_key(), http_client=http_client, max_retries=0)
+
+
+def build_async_openai_client() -> AsyncOpenAI:
+    """Create an AsyncOpenAI client backed by a tuned keep-alive connection pool."""
+    if fake_openai.is_enabled():
+        transport = fake_openai.AsyncFakeOpenAITransport()
+    else:
+        transport = httpx.AsyncHTTPTransport(limits=HTTP_POOL_LIMITS, http2=HTTP2_ENABLED)
+    http_client = httpx.AsyncClient(transport=cassette.wrap_async_transport(transport), timeout=HTTP_TIMEOUT)
+    return AsyncOpenAI(api_key=_api_key(), http_client=http_client, max_retries=0)
+
+
+# Threads kept pre-created per client (0 disables the pool)
+THREAD_POOL_SIZE = int(os.getenv("PLAIDLIBS_THREAD_POOL_SIZE", "4"))
+
+# Worker threads for calls that run alongside the caller (e.g. an image
+# generated while the story text is still streaming)
+_background_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PLAIDLIBS_BACKGROUND_WORKERS", "8")),
+    thread_name_prefix="plaidlibs-bg"
+)
+
+
+class ThreadIdPool:
+    """
+    Pool of pre-created thread IDs, replenished in the background.
+    
+    New conversations take a ready thread instead of calling threads.create
+    on the interactive path; the pool tops itself back up afterwards.
+    """
+    
+    def __init__(self, client: OpenAI, size: int = THREAD_POOL_SIZE):
+        self.client = client
+        self.size = size
+        self._ids: deque = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    def take(self) -> Optional[str]:
+        """Return a pre-created thread ID, or None if the pool is empty."""
+        with self._lock:
+            thread_id = self._ids.popleft() if self._ids else None
+        self.replenish()
+        return thread_id
+    
+    def replenish(self):
+        """Schedule background creation of any missing threads."""
+        with self._lock:
+            missing = self.size - len(self._ids) - self._pending
+            self._pending += max(missing, 0)
+        for _ in range(missing):
+            _background_executor.submit(self._create_one)
+    
+    def _create_one(self):
+        """Create one thread and add it to the pool."""
+        try:
+            with get_scheduler().request(BACKGROUND):
+                thread = self.client.beta.threads.create()
+            with self._lock:
+                self._ids.append(thread.id)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+_thread_pools: dict = {}
+_thread_pools_lock = threading.Lock()
+
+
+def get_thread_pool(client: OpenAI) -> ThreadIdPool:
+    """Return the warm thread pool for a client, creating and filling it on first use."""
+    with _thread_pools_lock:
+        pool = _thread_pools.get(id(client))
+        if pool is None or pool.client is not client:
+            pool = ThreadIdPool(client)
+            _thread_pools[id(client)] = pool
+    pool.replenish()
+    return pool
+
+
+class AssistantRegistry:
+    """
+    Resolves one OpenAI Assistant per Quip persona.
+    
+    Each persona's assistant carries that persona's system prompt as its
+    instructions, so threads never need a priming message. Assistants are
+    found by their metadata, updated when the prompt has changed and created
+    when missing. OPENAI_ASSISTANT_ID_<PERSONA> (e.g. OPENAI_ASSISTANT_ID_SOQUIP)
+    pins a persona to an existing assistant instead.
+    
+    Only resolved IDs are kept. A failed sync is retried once
+    REGISTRY_RETRY_INTERVAL has passed, so an outage at startup does not
+    leave a persona on the fallback assistant for the life of the process.
+    """
+    
+    def __init__(self, client: OpenAI, model: str = ASSISTANT_MODEL):
+        self.client = client
+        self.model = model
+        self._ids: dict = {}
+        self._failed_at: dict = {}  # persona -> monotonic time of its last failed sync
+        self._lock = threading.Lock()
+    
+    def _backing_off(self, persona: str) -> bool:
+        """Whether a recent failed sync means the persona should not be tried yet."""
+        failed_at = self._failed_at.get(persona)
+        return failed_at is not None and time.monotonic() - failed_at < REGISTRY_RETRY_INTERVAL
+    
+    def get(self, persona: str) -> Optional[str]:
+        """
+        Return the assistant ID for a persona, syncing it on first use.
+        
+        Returns:
+            The assistant ID, or None if it could not be resolved
+        """
+        if persona in self._ids:
+            return self._ids[persona]
+        if self._backing_off(persona):
+            return None
+        
+        with self._lock:
+            if persona not in self._ids and not self._backing_off(persona):
+                pinned = os.getenv(f"OPENAI_ASSISTANT_ID_{persona.upper()}")
+                try:
+                    self._ids[persona] = pinned or self._sync(persona)
+                    self._failed_at.pop(persona, None)
+                except Exception:
+                    # Back off so every run doesn't retry the sync while the API is failing
+                    self._failed_at[persona] = time.monotonic()
+        return self._ids.get(persona)
+    
+    def sync_all(self) -> dict:
+        """Resolve every persona in QUIP_PERSONAS; returns persona -> assistant ID."""
+        return {persona: self.get(persona) for persona in QUIP_PERSONAS}
+    
+    def _sync(self, persona: str) -> str:
+        """Find, update or create the assistant for a persona."""
+        instructions = get_system_prompt(persona)
+        metadata = {
+            "plaidlibs_persona": persona,
+            "prompt_hash": hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]
+        }
+        
+        for assistant in self.client.beta.assistants.list(limit=100):
+            existing = assistant.metadata or {}
+            if existing.get("plaidlibs_persona") != persona:
+                continue
+            if existing.get("prompt_hash") != metadata["prompt_hash"]:
+                self.client.beta.assistants.update(
+                    assistant_id=assistant.id,
+                    instructions=instructions,
+                    metadata=metadata
+                )
+            return assistant.id
+        
+        quip = QUIP_PERSONAS.get(persona, QUIP_PERSONAS["macquip"])
+        assistant = self.client.beta.assistants.create(
+            name=f"PlaidLibs™ - {quip['name']}",
+            instructions=instructions,
+            model=self.model,
+            metadata=metadata,
+            tools=[]
+        )
+        return assistant.id
+
+
+_registries: dict = {}
+_registries_lock = threading.Lock()
+
+
+def get_assistant_registry(client: OpenAI) -> AssistantRegistry:
+    """Return the persona registry for a client, creating it on first use."""
+    with _registries_lock:
+        registry = _registries.get(id(client))
+        if registry is None or registry.client is not client:
+            registry = AssistantRegistry(client)
+            _registries[id(client)] = registry
+    return registry
+
+
+_shared_client: Optional[OpenAI] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client() -> OpenAI:
+    """Return the process-wide pooled OpenAI client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = build_openai_client()
+    return _shared_client
+
+
+_shared_async_clients: dict = {}  # event loop (None outside one) -> AsyncOpenAI
+_shared_async_clients_lock = threading.Lock()
+
+
+def get_shared_async_client() -> AsyncOpenAI:
+    """
+    Return the pooled AsyncOpenAI client for the running event loop, creating it on first use.
+    
+    An async connection pool belongs to the loop it was opened on, so there is
+    one shared client per loop rather than one per process.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _shared_async_clients_lock:
+        for key in [k for k in _shared_async_clients if k is not None and k.is_closed()]:
+            del _shared_async_clients[key]
+        client = _shared_async_clients.get(loop)
+        if client is None:
+            client = _shared_async_clients[loop] = build_async_openai_client()
+    return client
+
+
+# Seconds a run may spend queued/in progress before it is cancelled
+DEFAULT_RUN_TIMEOUT = float(os.getenv("PLAIDLIBS_RUN_TIMEOUT", "120"))
+
+# Seconds to wait for a cancelled run to stop before giving up on it
+CANCEL_TIMEOUT = 15.0
+
+# Statuses in which a run is still working and must be polled again
+PENDING_RUN_STATUSES = ("queued", "in_progress", "cancelling")
+
+# Metadata key tagging each user message, so a retried create can tell whether it was stored
+MESSAGE_TAG_KEY = "plaidlibs_message_id"
+
+
+class RunTimeoutError(Exception):
+    """Raised when a run does not reach a terminal status before its deadline."""
+
+
+def poll_intervals(first: float = 0.1, fast_checks: int = 3, factor: float = 1.6,
+                   maximum: float = 2.0, jitter: float = 0.2) -> Iterator[float]:
+    """
+    Yield sleep intervals for polling a run.
+    
+    A few fast checks catch short runs quickly, after which the interval grows
+    exponentially up to `maximum`. Each interval is jittered by +/- `jitter`
+    so that many sessions polling at once do not synchronize.
+    """
+    interval = first
+    checks = 0
+    while True:
+        yield interval * random.uniform(1 - jitter, 1 + jitter)
+        checks += 1
+        if checks >= fast_checks:
+            interval = min(interval * factor, maximum)
+
+
+class RunTimeline:
+    """Records when a run was first observed in each status."""
+    
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started = time.monotonic()
+        self.events: list = []  # (status, seconds since started)
+    
+    def observe(self, status: str):
+        """Record a status if it differs from the last one observed."""
+        if not self.events or self.events[-1][0] != status:
+            self.events.append((status, time.monotonic() - self.started))
+    
+    @property
+    def status(self) -> Optional[str]:
+        """The most recently observed status."""
+        return self.events[-1][0] if self.events else None
+    
+    def durations(self) -> dict:
+        """
+        Time spent in each status.
+        
+        Returns:
+            Dictionary mapping status to seconds (e.g. 'queued', 'in_progress'),
+            plus 'total' seconds until the terminal status was observed
+        """
+        result = {}
+        for (status, at), (_, next_at) in zip(self.events, self.events[1:]):
+            result[status] = result.get(status, 0.0) + (next_at - at)
+        result["total"] = self.events[-1][1] if self.events else 0.0
+        return result
+    
+    def to_dict(self) -> dict:
+        """Serializable summary of the timeline."""
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "events": [{"status": s, "at": round(at, 4)} for s, at in self.events],
+            "durations": {k: round(v, 4) for k, v in self.durations().items()}
+        }
+
+
+def cancel_run(client: OpenAI, thread_id: str, run_id: Optional[str] = None, timeout: float = CANCEL_TIMEOUT,
+               scheduler: Optional[Scheduler] = None):
+    """
+    Cancel a run and wait until it has stopped.
+    
+    A thread rejects new messages and runs while a run on it is active, so a
+    run that its caller abandons (a timeout, a cancelled job, a closed
+    stream) must be stopped before the next message is sent. Best effort:
+    errors, including a run that already finished, are ignored.
+    
+    Args:
+        client: The OpenAI client
+        thread_id: The thread the run belongs to
+        run_id: The run to cancel; None means the thread's latest run (for a
+            stream abandoned before it reported its run)
+        timeout: Seconds to wait for the run to stop
+        scheduler: Charged for each call (the caller still holds the run's
+            admission); defaults to the shared scheduler
+    """
+    scheduler = scheduler or get_scheduler()
+    try:
+        scheduler.charge()
+        if run_id is None:
+            runs = client.beta.threads.runs.list(thread_id=thread_id, order="desc", limit=1)
+            if not runs.data:
+                return
+            run = runs.data[0]
+        else:
+            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        if run.status not in PENDING_RUN_STATUSES + ("requires_action",):
+            return
+        scheduler.charge()
+        run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        deadline = time.monotonic() + timeout
+        intervals = poll_intervals()
+        while run.status in PENDING_RUN_STATUSES and time.monotonic() < deadline:
+            time.sleep(next(intervals))
+            scheduler.charge()
+            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    except Exception:
+        pass
+
+
+async def async_cancel_run(client: AsyncOpenAI, thread_id: str, run_id: Optional[str] = None,
+                           timeout: float = CANCEL_TIMEOUT, scheduler: Optional[Scheduler] = None):
+    """Awaitable variant of cancel_run for AsyncOpenAI clients."""
+    scheduler = scheduler or get_scheduler()
+    try:
+        scheduler.charge()
+        if run_id is None:
+            runs = await client.beta.threads.runs.list(thread_id=thread_id, order="desc", limit=1)
+            if not runs.data:
+                return
+            run = runs.data[0]
+        else:
+            run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        if run.status not in PENDING_RUN_STATUSES + ("requires_action",):
+            return
+        scheduler.charge()
+        run = await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        deadline = time.monotonic() + timeout
+        intervals = poll_intervals()
+        while run.status in PENDING_RUN_STATUSES and time.monotonic() < deadline:
+            await asyncio.sleep(next(intervals))
+            scheduler.charge()
+            run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    except Exception:
+        pass
+
+
+def add_user_message(client: OpenAI, thread_id: str, content: str, scheduler: Optional[Scheduler] = None):
+    """
+    Add a user message to a thread, retrying transient failures without duplicating it.
+    
+    messages.create is not idempotent: after a timeout or a dropped
+    connection the message may have been stored anyway. Each message is
+    tagged with a random ID in its metadata, and every retry first looks at
+    the thread's latest message; if it carries the tag, that message is
+    returned instead of sending another copy.
+    
+    Each call is charged to the scheduler's request budget, like a run's
+    polls: it is a quick step of the run the caller is about to queue.
+    """
+    scheduler = scheduler or get_scheduler()
+    tag = uuid.uuid4().hex
+    sent = False
+    
+    def attempt():
+        nonlocal sent
+        if sent:
+            scheduler.charge()
+            latest = client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=1)
+            if latest.data and (latest.data[0].metadata or {}).get(MESSAGE_TAG_KEY) == tag:
+                return latest.data[0]
+        sent = True
+        scheduler.charge()
+        return client.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=content, metadata={MESSAGE_TAG_KEY: tag}
+        )
+    
+    return call_with_retry(attempt)
+
+
+async def async_add_user_message(client: AsyncOpenAI, thread_id: str, content: str,
+                                 scheduler: Optional[Scheduler] = None):
+    """Awaitable variant of add_user_message for AsyncOpenAI clients."""
+    scheduler = scheduler or get_scheduler()
+    tag = uuid.uuid4().hex
+    sent = False
+    
+    async def attempt():
+        nonlocal sent
+        if sent:
+            scheduler.charge()
+            latest = await client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=1)
+            if latest.data and (latest.data[0].metadata or {}).get(MESSAGE_TAG_KEY) == tag:
+                return latest.data[0]
+        sent = True
+        scheduler.charge()
+        return await client.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=content, metadata={MESSAGE_TAG_KEY: tag}
+        )
+    
+    return await async_call_with_retry(attempt)
+
+
+def wait_for_run(client: OpenAI, thread_id: str, run, timeout: float = DEFAULT_RUN_TIMEOUT,
+                 intervals: Optional[Iterator[float]] = None,
+                 scheduler: Optional[Scheduler] = None) -> Tuple[object, RunTimeline]:
+    """
+    Poll a run until it leaves the pending statuses.
+    
+    The caller holds the run's admission while it waits, so each poll is
+    charged to the scheduler's request budget rather than admitted (which
+    could wait on the very in-flight slot the run is holding).
+    
+    Args:
+        client: The OpenAI client
+        thread_id: The thread the run belongs to
+        run: The run object returned by runs.create
+        timeout: Seconds before the run is cancelled and RunTimeoutError is raised
+        intervals: Sleep schedule (defaults to poll_intervals())
+        scheduler: Scheduler charged for the polls (defaults to the shared one)
+        
+    Returns:
+        Tuple of (final run, RunTimeline)
+    """
+    scheduler = scheduler or get_scheduler()
+    timeline = RunTimeline(run.id)
+    timeline.observe(run.status)
+    intervals = intervals or poll_intervals()
+    deadline = timeline.started + timeout
+    
+    def poll():
+        scheduler.charge()
+        return client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    
+    while run.status in PENDING_RUN_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            cancel_run(client, thread_id, run.id, scheduler=scheduler)
+            raise RunTimeoutError(f"Run {run.id} did not finish within {timeout:.0f}s")
+        time.sleep(min(next(intervals), remaining))
+        run = call_with_retry(poll)
+        timeline.observe(run.status)
+    
+    return run, timeline
+
+
+async def async_wait_for_run(client: AsyncOpenAI, thread_id: str, run, timeout: float = DEFAULT_RUN_TIMEOUT,
+                             intervals: Optional[Iterator[float]] = None,
+                             scheduler: Optional[Scheduler] = None) -> Tuple[object, RunTimeline]:
+    """Awaitable variant of wait_for_run for AsyncOpenAI clients."""
+    scheduler = scheduler or get_scheduler()
+    timeline = RunTimeline(run.id)
+    timeline.observe(run.status)
+    intervals = intervals or poll_intervals()
+    deadline = timeline.started + timeout
+    
+    def poll():
+        scheduler.charge()
+        return client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+    
+    while run.status in PENDING_RUN_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            await async_cancel_run(client, thread_id, run.id, scheduler=scheduler)
+            raise RunTimeoutError(f"Run {run.id} did not finish within {timeout:.0f}s")
+        await asyncio.sleep(min(next(intervals), remaining))
+        run = await async_call_with_retry(poll)
+        timeline.observe(run.status)
+    
+    return run, timeline
+
+
+def _extract_text(message) -> str:
+    """Return the text of the first content block of a thread message, or ''."""
+    if message.content and len(message.content) > 0:
+        text_content = message.content[0]
+        if hasattr(text_content, 'text'):
+            return text_content.text.value
+    return ""
+
+
+def _image_result(stored: dict, cached: bool = False) -> dict:
+    """Shape an image store entry as a generate_image result."""
+    return {
+        "url": stored["path"],
+        "path": stored["path"],
+        "revised_prompt": stored.get("revised_prompt"),
+        "cached": cached
+    }
+
+
+def _usage_tokens(obj) -> Optional[int]:
+    """Total tokens reported on a run or completion, if the API returned usage."""
+    usage = getattr(obj, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _chat_messages(prompt: str, persona: str) -> list:
+    """Build the Chat Completions message list for a one-shot prompt."""
+    return [
+        {"role": "system", "content": get_system_prompt(persona)},
+        {"role": "user", "content": prompt}
+    ]
+
+
+# Page size used when following message list cursors
+MESSAGE_PAGE_SIZE = 100
+
+# Threads whose history is mirrored locally before the oldest are dropped
+MAX_MIRRORED_THREADS = int(os.getenv("PLAIDLIBS_MAX_MIRRORED_THREADS", "256"))
+
+
+def _message_entry(message) -> dict:
+    """Shape a thread message as a history entry."""
+    return {"id": message.id, "role": message.role, "content": _extract_text(message)}
+
+
+def _is_settled(message) -> bool:
+    """True once a message's content will no longer change."""
+    return getattr(message, "status", None) in (None, "completed", "incomplete")
+
+
+class ThreadMirror:
+    """
+    Local, append-only copy of one thread's messages.
+    
+    Messages are stored oldest first along with the ID of the newest one,
+    so a refresh only has to ask the API for messages after that cursor.
+    A message that is still being written stops the refresh, so it is
+    picked up complete on the next one.
+    """
     
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.messages: List[dict] = []
+        self.last_id: Optional[str] = None
+        self.lock = threading.Lock()
+        self._ids: set = set()
+    
+    def extend(self, messages: list) -> bool:
+        """
+        Append settled messages from one page, in order.
+        
+        Args:
+            messages: Thread messages newer than last_id, oldest first
+        
+        Returns:
+            True if the whole page was settled and paging may continue
+        """
+        for message in messages:
+            if not _is_settled(message):
+                return False
+            if message.id in self._ids:
+                continue
+            self._ids.add(message.id)
+            self.messages.append(_message_entry(message))
+            self.last_id = message.id
+        return True
+    
+    def snapshot(self, limit: Optional[int] = None) -> List[dict]:
+        """Copy of the mirrored messages, oldest first, up to limit."""
+        with self.lock:
+            return list(self.messages[:limit] if limit else self.messages)
+
+
+_thread_mirrors: dict = {}
+_thread_mirrors_lock = threading.Lock()
+
+
+def get_thread_mirror(thread_id: str) -> ThreadMirror:
+    """Return the process-wide mirror for a thread, creating it on first use."""
+    with _thread_mirrors_lock:
+        mirror = _thread_mirrors.pop(thread_id, None) or ThreadMirror()
+        _thread_mirrors[thread_id] = mirror
+        while len(_thread_mirrors) > MAX_MIRRORED_THREADS:
+            _thread_mirrors.pop(next(iter(_thread_mirrors)))
+        return mirror
+
+
+def _list_params(after: Optional[str], page_size: int) -> dict:
+    """Message list arguments for the page after a cursor."""
+    params = {"order": "asc", "limit": page_size}
+    if after:
+        params["after"] = after
+    return params
+
+
+def iter_message_pages(client: OpenAI, thread_id: str, after: Optional[str] = None,
+                       page_size: int = MESSAGE_PAGE_SIZE, scheduler: Optional[Scheduler] = None,
+                       session: str = DEFAULT_SESSION) -> Iterator[list]:
+    """
+    Yield a thread's messages one page at a time, oldest first.
+    
+    Args:
+        client: OpenAI client
+        thread_id: Thread to read
+        after: Only messages newer than this message ID
+        page_size: Messages requested per page
+        scheduler: Admits each page request at BACKGROUND priority (defaults to the shared one)
+        session: Key the requests are queued fairly under
+    
+    Yields:
+        Lists of thread messages; each page continues from the last one
+    """
+    scheduler = scheduler or get_scheduler()
+    while True:
+        with scheduler.request(BACKGROUND, session=session):
+            page = client.beta.threads.messages.list(
+                thread_id=thread_id, **_list_params(after, page_size)
+            )
+        if not page.data:
+            return
+        yield page.data
+        if not getattr(page, "has_more", len(page.data) == page_size):
+            return
+        after = page.data[-1].id
+
+
+async def async_iter_message_pages(client: AsyncOpenAI, thread_id: str, after: Optional[str] = None,
+                                   page_size: int = MESSAGE_PAGE_SIZE, scheduler: Optional[Scheduler] = None,
+                                   session: str = DEFAULT_SESSION) -> AsyncGenerator[list, None]:
+    """Async twin of iter_message_pages."""
+    scheduler = scheduler or get_scheduler()
+    while True:
+        async with scheduler.async_request(BACKGROUND, session=session):
+            page = await client.beta.threads.messages.list(
+                thread_id=thread_id, **_list_params(after, page_size)
+            )
+        if not page.data:
+            return
+        yield page.data
+        if not getattr(page, "has_more", len(page.data) == page_size):
+            return
+        after = page.data[-1].id
+
+
+def sync_thread_mirror(client: OpenAI, thread_id: str, scheduler: Optional[Scheduler] = None,
+                       session: str = DEFAULT_SESSION) -> ThreadMirror:
+    """
+    Bring a thread's mirror up to date, fetching only messages it has not seen.
+    
+    Args:
+        client: OpenAI client
+        thread_id: Thread to refresh
+        scheduler: Admits the page requests (see iter_message_pages)
+        session: Key the requests are queued fairly under
+    
+    Returns:
+        The refreshed mirror
+    """
+    mirror = get_thread_mirror(thread_id)
+    with mirror.lock:
+        for page in iter_message_pages(client, thread_id, after=mirror.last_id,
+                                       scheduler=scheduler, session=session):
+            if not mirror.extend(page):
+                break
+    return mirror
+
+
+class PlaidLibsAssistant:
+    """
+    Manages the OpenAI Assistant for PlaidLibs interactions.
+    
+    The OpenAI client (and its connection pool) is shared process-wide by
+    default; each instance only holds per-conversation thread state.
+    """
+    
+    def __init__(self, client: Optional[OpenAI] = None, run_timeout: float = DEFAULT_RUN_TIMEOUT,
+                 image_store: Optional[ImageStore] = None, scheduler: Optional[Scheduler] = None,
+                 session_id: str = DEFAULT_SESSION, flights: Optional[SingleFlight] = None):
+        self.client = client or get_shared_client()
+        self.image_store = image_store or get_image_store()
+        self.scheduler = scheduler or get_scheduler()
+        self.session_id = session_id
+        self.flights = flights or get_single_flight()
+        self.thread_pool = get_thread_pool(self.client)
+        self.registry = get_assistant_registry(self.client)
         self.assistant_id = os.getenv("OPENAI_ASSISTANT_ID")
+        self.persona = "macquip"
         self.thread_id: Optional[str] = None
+        self.run_timeout = run_timeout
+        self.run_timelines: deque = deque(maxlen=50)
+    
+    @property
+    def last_run_timeline(self) -> Optional[RunTimeline]:
+        """Timeline of the most recent run, if any."""
+        return self.run_timelines[-1] if self.run_timelines else None
         
     def create_thread(self) -> str:
-        """Create a new conversation thread."""
-        thread = self.client.beta.threads.create()
-        self.thread_id = thread.id
+        """Start a new conversation thread, taking a pre-created one when available."""
+        self.thread_id = self.thread_pool.take()
+        if not self.thread_id:
+            self.scheduler.charge()  # a quick call the user is waiting on, so charged rather than queued
+            thread = self.client.beta.threads.create()
+            self.thread_id = thread.id
         return self.thread_id
     
     def get_or_create_thread(self) -> str:
@@ -37,88 +811,246 @@ class PlaidLibsAssistant:
         """Set an existing thread ID."""
         self.thread_id = thread_id
     
+    def set_persona(self, persona: str):
+        """Switch the Quip persona used for subsequent runs and completions."""
+        self.persona = persona
+    
+    def _admit(self, priority: int, prompt: str = "", images: int = 0):
+        """Scheduler admission for one call from this session (a context manager)."""
+        tokens = estimate_tokens(prompt) if prompt else 0
+        return self.scheduler.request(priority, tokens=tokens, images=images, session=self.session_id)
+    
+    def _no_interactive_queue(self) -> bool:
+        """Whether no interactive call waits for admission; hedges are held back while one does."""
+        return self.scheduler.queue_depth(INTERACTIVE) == 0
+    
+    def _run_params(self) -> dict:
+        """
+        Assistant selection for a run.
+        
+        Uses the persona's own assistant from the registry; if it cannot be
+        resolved, falls back to OPENAI_ASSISTANT_ID with per-run instructions.
+        """
+        assistant_id = self.registry.get(self.persona)
+        if assistant_id:
+            return {"assistant_id": assistant_id}
+        return {"assistant_id": self.assistant_id, "instructions": get_system_prompt(self.persona)}
+    
     def send_message(self, content: str) -> str:
         """
         Send a message to the assistant and get a response.
         
+        Transient failures (rate limits, server errors, runs that fail with
+        rate_limit_exceeded or server_error) are retried with backoff.
+        
         Args:
             content: The user's message content
             
         Returns:
             The assistant's response text
         """
-        thread_id = self.get_or_create_thread()
-        
-        # Add the user message to the thread
-        self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=content
-        )
-        
-        # Run the assistant
-        run = self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=self.assistant_id
-        )
-        
-        # Wait for completion
-        while run.status in ["queued", "in_progress"]:
-            time.sleep(0.5)
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
-        
-        if run.status == "completed":
-            # Get the latest message
-            messages = self.client.beta.threads.messages.list(
-                thread_id=thread_id,
-                order="desc",
-                limit=1
-            )
+        with track("send_message") as record:
+            thread_id = self.get_or_create_thread()
+            
+            # Add the user message to the thread
+            add_user_message(self.client, thread_id, content, scheduler=self.scheduler)
             
-            if messages.data:
-                message = messages.data[0]
-                if message.content and len(message.content) > 0:
-                    text_content = message.content[0]
-                    if hasattr(text_content, 'text'):
-                        return text_content.text.value
+            # Run the assistant, re-running it if it fails for a transient reason
+            try:
+                run = call_with_retry(lambda: self._run_once(thread_id, content))
+            except RunTimeoutError:
+                record.outcome = "timeout"
+                return "That took longer than expected, so I stopped waiting. Please try again."
+            except RunFailedError as e:
+                run = e.run
+            
+            if run.status == "completed":
+                # Get the latest message (the reply the user is waiting on, so INTERACTIVE)
+                def fetch_reply():
+                    with self._admit(INTERACTIVE):
+                        return self.client.beta.threads.messages.list(
+                            thread_id=thread_id,
+                            order="desc",
+                            limit=1
+                        )
+                
+                messages = call_with_retry(fetch_reply)
+                
+                if messages.data:
+                    text = _extract_text(messages.data[0])
+                    if text:
+                        return text
+                
+                record.outcome = "empty"
+                return "I apologize, but I couldn't generate a response. Please try again."
             
-            return "I apologize, but I couldn't generate a response. Please try again."
+            record.outcome = run.status
+            if run.status == "failed":
+                error_msg = run.last_error.message if run.last_error else "Unknown error"
+                return f"I encountered an issue: {error_msg}. Let's try that again!"
+            else:
+                return f"Unexpected status: {run.status}. Please try again."
+    
+    def _run_once(self, thread_id: str, content: str):
+        """
+        Create one run once the shared rate limits admit it, and wait for it.
         
-        elif run.status == "failed":
-            error_msg = run.last_error.message if run.last_error else "Unknown error"
-            return f"I encountered an issue: {error_msg}. Let's try that again!"
+        Raises:
+            RunFailedError: The run failed for a retryable reason
+        """
+        # Resolved first, so a registry sync never runs while holding an admission ticket
+        params = self._run_params()
+        with self._admit(INTERACTIVE, content) as ticket:
+            run = self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                **params
+            )
+            run, timeline = wait_for_run(self.client, thread_id, run, timeout=self.run_timeout,
+                                         scheduler=self.scheduler)
+            ticket.tokens_used = _usage_tokens(run)
+        self.run_timelines.append(timeline)
+        record_usage("send_message", getattr(run, "model", None), getattr(run, "usage", None))
         
-        else:
-            return f"Unexpected status: {run.status}. Please try again."
+        if run.status == "failed" and is_retryable(RunFailedError(run)):
+            raise RunFailedError(run)
+        return run
     
-    def stream_message(self, content: str) -> Generator[str, None, None]:
+    def stream_message(self, content: str, thread_id: Optional[str] = None) -> Generator[str, None, None]:
         """
         Send a message and stream the response.
         
+        A run that fails transiently before producing any text is retried.
+        Closing the generator early cancels the run, and returns once it has
+        stopped, so the thread is free for the next message.
+        
         Args:
             content: The user's message content
+            thread_id: Thread to use, instead of the current one (callers that
+                run later, such as background jobs, pin it when they are queued)
             
         Yields:
             Chunks of the assistant's response
         """
-        thread_id = self.get_or_create_thread()
+        with track("stream_message") as record:
+            thread_id = thread_id or self.get_or_create_thread()
+            
+            # Add the user message to the thread
+            add_user_message(self.client, thread_id, content, scheduler=self.scheduler)
+            
+            chunks = retry_stream(lambda: self._stream_run(thread_id, content))
+            try:
+                for text in chunks:
+                    record.first_token()
+                    yield text
+            except RunFailedError as e:
+                record.outcome = "failed"
+                yield f"I encountered an issue: {e}. Let's try that again!"
+            finally:
+                chunks.close()
+    
+    def _stream_run(self, thread_id: str, content: str) -> Iterator[str]:
+        """Stream one run's text; raises RunFailedError if the run fails, and cancels it if abandoned."""
+        params = self._run_params()  # before admission, as in _run_once
+        with self._admit(INTERACTIVE, content) as ticket, \
+                self.client.beta.threads.runs.stream(thread_id=thread_id, **params) as stream:
+            try:
+                for text in stream.text_deltas:
+                    yield text
+            except BaseException:
+                # Closed early or broken mid-stream: stop the run rather than leave the thread busy
+                run = stream.current_run
+                cancel_run(self.client, thread_id, run.id if run else None, scheduler=self.scheduler)
+                raise
+            
+            run = stream.current_run
+            ticket.tokens_used = _usage_tokens(run)
+        record_usage("stream_message", getattr(run, "model", None), getattr(run, "usage", None))
+        if run and run.status == "failed":
+            raise RunFailedError(run)
+    
+    def complete(self, prompt: str, persona: Optional[str] = None, priority: int = INTERACTIVE,
+                 hedge: Optional[bool] = None) -> str:
+        """
+        Run a self-contained prompt as a single Chat Completions request.
         
-        # Add the user message to the thread
-        self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=content
-        )
+        Unlike send_message this does not touch the conversation thread, so
+        one-shot stages (templates, fills, visual prompts, scripts) cost one
+        round trip and do not grow the thread.
         
-        # Run with streaming
-        with self.client.beta.threads.runs.stream(
-            thread_id=thread_id,
-            assistant_id=self.assistant_id
-        ) as stream:
-            for text in stream.text_deltas:
+        Args:
+            prompt: The complete, self-contained prompt
+            persona: Quip persona whose system prompt frames the request
+                (defaults to the assistant's current persona)
+            priority: Scheduler priority (INTERACTIVE, IMAGE or BACKGROUND)
+            hedge: Send a duplicate request if this one runs past the recent
+                p95 latency (defaults to on for INTERACTIVE, unless PLAIDLIBS_HEDGE=0)
+            
+        Returns:
+            The completion text
+        """
+        def attempt(hedging: Optional[HedgeAttempt] = None) -> str:
+            # Streamed, so a hedged attempt that has lost can stop at its next chunk
+            parts, usage_chunk = [], None
+            with self._admit(priority, prompt) as ticket:
+                if hedging:
+                    hedging.sent()
+                stream = self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=_chat_messages(prompt, persona or self.persona),
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                with stream:
+                    for chunk in stream:
+                        if hedging:
+                            hedging.check()
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                        if getattr(chunk, "usage", None):
+                            usage_chunk = chunk
+                ticket.tokens_used = _usage_tokens(usage_chunk)
+            if usage_chunk is not None:
+                record_usage("complete", usage_chunk.model, usage_chunk.usage)
+            return "".join(parts)
+        
+        if hedge is None:
+            hedge = HEDGING_ENABLED and priority == INTERACTIVE
+        tracker = get_latency_tracker(f"complete:{CHAT_MODEL}")
+        
+        def call():
+            return call_with_retry(lambda: hedged_call(attempt, tracker, self._no_interactive_queue) if hedge else attempt())
+        
+        # Identical prompts already in flight (double clicks, other sessions) share one request
+        key = request_key("complete", prompt, model=CHAT_MODEL,
+                          persona=persona or self.persona, priority=priority)
+        with track("complete"):
+            return self.flights.do(key, call)
+    
+    def stream_complete(self, prompt: str, persona: Optional[str] = None,
+                        priority: int = INTERACTIVE) -> Generator[str, None, None]:
+        """
+        Streaming variant of complete(); retried if it fails before the first chunk.
+        
+        Yields:
+            Chunks of the completion text
+        """
+        def open_stream():
+            with self._admit(priority, prompt):
+                stream = self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=_chat_messages(prompt, persona or self.persona),
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        record_usage("stream_complete", chunk.model, chunk.usage)
+        
+        with track("stream_complete") as record:
+            for text in retry_stream(open_stream):
+                record.first_token()
                 yield text
     
     def get_thread_messages(self, limit: int = 20) -> list:
@@ -126,34 +1058,41 @@ class PlaidLibsAssistant:
         Retrieve messages from the current thread.
         
         Args:
-            limit: Maximum number of messages to retrieve
+            limit: Maximum number of messages to return, served from the local mirror
             
         Returns:
-            List of message dictionaries with role and content
+            List of message dictionaries with id, role and content, oldest first
         """
         if not self.thread_id:
             return []
         
-        messages = self.client.beta.threads.messages.list(
-            thread_id=self.thread_id,
-            order="asc",
-            limit=limit
-        )
+        return sync_thread_mirror(self.client, self.thread_id, self.scheduler, self.session_id).snapshot(limit)
+    
+    def iter_thread_messages(self) -> Iterator[dict]:
+        """
+        Iterate over the whole thread history, oldest first.
         
-        result = []
-        for msg in messages.data:
-            content = ""
-            if msg.content and len(msg.content) > 0:
-                text_content = msg.content[0]
-                if hasattr(text_content, 'text'):
-                    content = text_content.text.value
-            
-            result.append({
-                "role": msg.role,
-                "content": content
-            })
+        The local mirror is refreshed first, so only messages newer than the
+        last one seen are fetched from the API.
         
-        return result
+        Yields:
+            Message dictionaries with id, role and content
+        """
+        if not self.thread_id:
+            return
+        
+        yield from sync_thread_mirror(self.client, self.thread_id, self.scheduler, self.session_id).snapshot()
+    
+    def export_transcript(self) -> str:
+        """
+        Render the thread history as plain text for download.
+        
+        Returns:
+            One "Role: content" block per message
+        """
+        return "\n\n".join(
+            f"{msg['role'].title()}: {msg['content']}" for msg in self.iter_thread_messages()
+        )
     
     def reset_conversation(self):
         """Reset the conversation by creating a new thread."""
@@ -171,29 +1110,515 @@ class PlaidLibsAssistant:
             quality: "standard" or "hd"
             
         Returns:
-            Dictionary with 'url' and 'revised_prompt' keys, or 'error' key if failed
+            Dictionary with 'url' (local file path of the stored image), 'path'
+            and 'revised_prompt' keys, or 'error' key if it still failed after retries
         """
-        try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                style=style,
-                quality=quality,
-                n=1
-            )
+        with track("generate_image") as record:
+            key = image_key(prompt, model="dall-e-3", size=size, style=style, quality=quality)
+            cached = self.image_store.get(key)
+            if cached:
+                record_image("dall-e-3", size, quality, cached=True)
+                return _image_result(cached, cached=True)
             
-            if response.data and len(response.data) > 0:
-                image_data = response.data[0]
-                return {
-                    "url": image_data.url,
-                    "revised_prompt": image_data.revised_prompt
-                }
-            else:
-                return {"error": "No image data returned"}
+            def attempt():
+                with self._admit(IMAGE, images=1):
+                    return self.client.images.generate(
+                        model="dall-e-3",
+                        prompt=prompt,
+                        size=size,
+                        style=style,
+                        quality=quality,
+                        response_format="b64_json",
+                        n=1
+                    )
+            
+            def generate() -> dict:
+                # A call for the same key may have just finished and stored the image
+                cached = self.image_store.get(key)
+                if cached:
+                    return _image_result(cached, cached=True)
+                try:
+                    response = call_with_retry(attempt)
+                    
+                    if response.data and len(response.data) > 0:
+                        image_data = response.data[0]
+                        stored = self.image_store.put(
+                            key,
+                            base64.b64decode(image_data.b64_json),
+                            {"revised_prompt": image_data.revised_prompt}
+                        )
+                        record_image("dall-e-3", size, quality, cached=False)
+                        return _image_result(stored)
+                    else:
+                        return {"error": "No image data returned"}
+                        
+                except Exception as e:
+                    return {"error": str(e)}
+            
+            # Concurrent requests for the same image share one generation
+            result = self.flights.do(key, generate)
+            if "error" in result:
+                record.outcome = "error"
+            return result
+
+    def submit_image(self, prompt: str, **image_kwargs) -> Future:
+        """
+        Start generating an image in the background and return immediately.
+        
+        Use this when the image prompt does not depend on the text being
+        generated, so both requests run at the same time.
+        
+        Returns:
+            A Future resolving to the generate_image result
+        """
+        # Run in a copy of this context so the image is counted under the caller's mode and stage
+        return _background_executor.submit(
+            contextvars.copy_context().run, self.generate_image, prompt, **image_kwargs
+        )
+
+    def iter_images(self, prompts: List[str], max_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+                    **image_kwargs) -> Iterator[Tuple[int, dict]]:
+        """
+        Generate several images concurrently, yielding each as soon as it finishes.
+        
+        Args:
+            prompts: The image generation prompts
+            max_concurrency: Maximum number of requests in flight at once
+            **image_kwargs: size/style/quality, passed to generate_image
+            
+        Yields:
+            (index into prompts, generate_image result) in completion order
+        """
+        if not prompts:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.generate_image, prompt, **image_kwargs): i
+                for i, prompt in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def generate_images(self, prompts: List[str], max_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+                        **image_kwargs) -> List[dict]:
+        """
+        Generate several images concurrently.
+        
+        Returns:
+            generate_image results in the same order as prompts
+        """
+        results: List[dict] = [{} for _ in prompts]
+        for i, result in self.iter_images(prompts, max_concurrency=max_concurrency, **image_kwargs):
+            results[i] = result
+        return results
+
+
+class AsyncPlaidLibsAssistant:
+    """
+    Asynchronous counterpart of PlaidLibsAssistant built on AsyncOpenAI.
+    
+    Exposes the same surface as the synchronous class, but every network call
+    is awaitable so that text runs, image generation and thread bookkeeping
+    for one or many sessions can overlap on a single event loop.
+    
+    The client is shared per event loop by default. Pre-created threads and
+    persona assistants belong to the account rather than a connection, so
+    they come from the same pool and registry as the synchronous class.
+    """
+    
+    def __init__(self, client: Optional[AsyncOpenAI] = None, run_timeout: float = DEFAULT_RUN_TIMEOUT,
+                 image_store: Optional[ImageStore] = None, scheduler: Optional[Scheduler] = None,
+                 session_id: str = DEFAULT_SESSION):
+        self.client = client or get_shared_async_client()
+        self.image_store = image_store or get_image_store()
+        self.scheduler = scheduler or get_scheduler()
+        self.session_id = session_id
+        self.thread_pool = get_thread_pool(get_shared_client())
+        self.registry = get_assistant_registry(get_shared_client())
+        self.assistant_id = os.getenv("OPENAI_ASSISTANT_ID")
+        self.persona = "macquip"
+        self.thread_id: Optional[str] = None
+        self.run_timeout = run_timeout
+        self.run_timelines: deque = deque(maxlen=50)
+    
+    @property
+    def last_run_timeline(self) -> Optional[RunTimeline]:
+        """Timeline of the most recent run, if any."""
+        return self.run_timelines[-1] if self.run_timelines else None
+        
+    async def create_thread(self) -> str:
+        """Start a new conversation thread, taking a pre-created one when available."""
+        self.thread_id = self.thread_pool.take()
+        if not self.thread_id:
+            self.scheduler.charge()  # as in PlaidLibsAssistant.create_thread
+            thread = await self.client.beta.threads.create()
+            self.thread_id = thread.id
+        return self.thread_id
+    
+    async def get_or_create_thread(self) -> str:
+        """Get existing thread or create a new one."""
+        if not self.thread_id:
+            return await self.create_thread()
+        return self.thread_id
+    
+    def set_thread(self, thread_id: str):
+        """Set an existing thread ID."""
+        self.thread_id = thread_id
+    
+    def set_persona(self, persona: str):
+        """Switch the Quip persona used for subsequent runs and completions."""
+        self.persona = persona
+    
+    def _admit(self, priority: int, prompt: str = "", images: int = 0):
+        """Scheduler admission for one call from this session (a context manager)."""
+        tokens = estimate_tokens(prompt) if prompt else 0
+        return self.scheduler.async_request(priority, tokens=tokens, images=images, session=self.session_id)
+    
+    def _no_interactive_queue(self) -> bool:
+        """Whether no interactive call waits for admission, as in PlaidLibsAssistant."""
+        return self.scheduler.queue_depth(INTERACTIVE) == 0
+    
+    async def _run_params(self) -> dict:
+        """
+        Assistant selection for a run, as in PlaidLibsAssistant._run_params.
+        
+        The registry syncs on a worker thread the first time a persona is used,
+        so the event loop is not blocked by its API calls.
+        """
+        assistant_id = await asyncio.to_thread(self.registry.get, self.persona)
+        if assistant_id:
+            return {"assistant_id": assistant_id}
+        return {"assistant_id": self.assistant_id, "instructions": get_system_prompt(self.persona)}
+    
+    async def send_message(self, content: str) -> str:
+        """
+        Send a message to the assistant and get a response.
+        
+        Args:
+            content: The user's message content
+            
+        Returns:
+            The assistant's response text
+        """
+        with track("send_message") as record:
+            thread_id = await self.get_or_create_thread()
+            
+            await async_add_user_message(self.client, thread_id, content, scheduler=self.scheduler)
+            
+            try:
+                run = await async_call_with_retry(lambda: self._run_once(thread_id, content))
+            except RunTimeoutError:
+                record.outcome = "timeout"
+                return "That took longer than expected, so I stopped waiting. Please try again."
+            except RunFailedError as e:
+                run = e.run
+            
+            if run.status == "completed":
+                async def fetch_reply():
+                    async with self._admit(INTERACTIVE):
+                        return await self.client.beta.threads.messages.list(
+                            thread_id=thread_id,
+                            order="desc",
+                            limit=1
+                        )
+                
+                messages = await async_call_with_retry(fetch_reply)
                 
-        except Exception as e:
-            return {"error": str(e)}
+                if messages.data:
+                    text = _extract_text(messages.data[0])
+                    if text:
+                        return text
+                
+                record.outcome = "empty"
+                return "I apologize, but I couldn't generate a response. Please try again."
+            
+            record.outcome = run.status
+            if run.status == "failed":
+                error_msg = run.last_error.message if run.last_error else "Unknown error"
+                return f"I encountered an issue: {error_msg}. Let's try that again!"
+            else:
+                return f"Unexpected status: {run.status}. Please try again."
+    
+    async def _run_once(self, thread_id: str, content: str):
+        """Create one run and wait for it; raises RunFailedError if it failed transiently."""
+        params = await self._run_params()  # before admission, as in the sync class
+        async with self._admit(INTERACTIVE, content) as ticket:
+            run = await self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                **params
+            )
+            run, timeline = await async_wait_for_run(self.client, thread_id, run, timeout=self.run_timeout,
+                                                     scheduler=self.scheduler)
+            ticket.tokens_used = _usage_tokens(run)
+        self.run_timelines.append(timeline)
+        record_usage("send_message", getattr(run, "model", None), getattr(run, "usage", None))
+        
+        if run.status == "failed" and is_retryable(RunFailedError(run)):
+            raise RunFailedError(run)
+        return run
+    
+    async def stream_message(self, content: str, thread_id: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Send a message and stream the response.
+        
+        Closing the generator early (aclose) cancels the run and waits for it to stop.
+        
+        Args:
+            content: The user's message content
+            thread_id: Thread to use, instead of the current one
+            
+        Yields:
+            Chunks of the assistant's response
+        """
+        with track("stream_message") as record:
+            thread_id = thread_id or await self.get_or_create_thread()
+            
+            await async_add_user_message(self.client, thread_id, content, scheduler=self.scheduler)
+            
+            chunks = async_retry_stream(lambda: self._stream_run(thread_id, content))
+            try:
+                async for text in chunks:
+                    record.first_token()
+                    yield text
+            except RunFailedError as e:
+                record.outcome = "failed"
+                yield f"I encountered an issue: {e}. Let's try that again!"
+            finally:
+                await chunks.aclose()
+    
+    async def _stream_run(self, thread_id: str, content: str) -> AsyncGenerator[str, None]:
+        """Stream one run's text; raises RunFailedError if the run fails, and cancels it if abandoned."""
+        params = await self._run_params()  # before admission, as in the sync class
+        async with self._admit(INTERACTIVE, content) as ticket, \
+                self.client.beta.threads.runs.stream(thread_id=thread_id, **params) as stream:
+            try:
+                async for text in stream.text_deltas:
+                    yield text
+            except BaseException:
+                run = stream.current_run
+                await async_cancel_run(self.client, thread_id, run.id if run else None, scheduler=self.scheduler)
+                raise
+            
+            run = stream.current_run
+            ticket.tokens_used = _usage_tokens(run)
+        record_usage("stream_message", getattr(run, "model", None), getattr(run, "usage", None))
+        if run and run.status == "failed":
+            raise RunFailedError(run)
+    
+    async def complete(self, prompt: str, persona: Optional[str] = None, priority: int = INTERACTIVE,
+                       hedge: Optional[bool] = None) -> str:
+        """
+        Run a self-contained prompt as a single Chat Completions request.
+        
+        Args:
+            prompt: The complete, self-contained prompt
+            persona: Quip persona whose system prompt frames the request
+                (defaults to the assistant's current persona)
+            priority: Scheduler priority (INTERACTIVE, IMAGE or BACKGROUND)
+            hedge: Send a duplicate request if this one runs past the recent p95 latency
+                (defaults to on for INTERACTIVE, unless PLAIDLIBS_HEDGE=0)
+            
+        Returns:
+            The completion text
+        """
+        async def attempt(hedging: Optional[HedgeAttempt] = None):
+            async with self._admit(priority, prompt) as ticket:
+                if hedging:
+                    hedging.sent()
+                response = await self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=_chat_messages(prompt, persona or self.persona)
+                )
+                ticket.tokens_used = _usage_tokens(response)
+            record_usage("complete", response.model, response.usage)
+            return response
+        
+        if hedge is None:
+            hedge = HEDGING_ENABLED and priority == INTERACTIVE
+        tracker = get_latency_tracker(f"complete:{CHAT_MODEL}")
+        
+        async def call():
+            return await async_call_with_retry(
+                lambda: async_hedged_call(attempt, tracker, self._no_interactive_queue) if hedge else attempt()
+            )
+        
+        key = request_key("complete", prompt, model=CHAT_MODEL,
+                          persona=persona or self.persona, priority=priority)
+        with track("complete"):
+            response = await get_async_single_flight().do(key, call)
+        return response.choices[0].message.content or ""
+    
+    async def stream_complete(self, prompt: str, persona: Optional[str] = None,
+                              priority: int = INTERACTIVE) -> AsyncGenerator[str, None]:
+        """
+        Streaming variant of complete(); retried if it fails before the first chunk.
+        
+        Yields:
+            Chunks of the completion text
+        """
+        async def open_stream():
+            async with self._admit(priority, prompt):
+                stream = await self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=_chat_messages(prompt, persona or self.persona),
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        record_usage("stream_complete", chunk.model, chunk.usage)
+        
+        with track("stream_complete") as record:
+            async for text in async_retry_stream(open_stream):
+                record.first_token()
+                yield text
+    
+    async def get_thread_messages(self, limit: int = 20) -> list:
+        """
+        Retrieve messages from the current thread.
+        
+        Args:
+            limit: Maximum number of messages to return, served from the local mirror
+            
+        Returns:
+            List of message dictionaries with id, role and content, oldest first
+        """
+        if not self.thread_id:
+            return []
+        
+        mirror = await self._sync_mirror()
+        return mirror.snapshot(limit)
+    
+    async def _sync_mirror(self) -> ThreadMirror:
+        """Fetch messages newer than the mirror's cursor and append them."""
+        mirror = get_thread_mirror(self.thread_id)
+        async for page in async_iter_message_pages(self.client, self.thread_id, after=mirror.last_id,
+                                                   scheduler=self.scheduler, session=self.session_id):
+            with mirror.lock:
+                settled = mirror.extend(page)
+            if not settled:
+                break
+        return mirror
+    
+    async def iter_thread_messages(self) -> AsyncGenerator[dict, None]:
+        """
+        Iterate over the whole thread history, oldest first.
+        
+        Yields:
+            Message dictionaries with id, role and content
+        """
+        if not self.thread_id:
+            return
+        
+        mirror = await self._sync_mirror()
+        for message in mirror.snapshot():
+            yield message
+    
+    async def export_transcript(self) -> str:
+        """
+        Render the thread history as plain text for download.
+        
+        Returns:
+            One "Role: content" block per message
+        """
+        return "\n\n".join(
+            [f"{msg['role'].title()}: {msg['content']}" async for msg in self.iter_thread_messages()]
+        )
+    
+    async def reset_conversation(self):
+        """Reset the conversation by creating a new thread."""
+        self.thread_id = None
+        return await self.create_thread()
+    
+    async def generate_image(self, prompt: str, size: str = "1024x1024", style: str = "vivid", quality: str = "standard") -> dict:
+        """
+        Generate an image using DALL-E 3.
+        
+        Args:
+            prompt: The image generation prompt
+            size: Image size - "1024x1024", "1792x1024", or "1024x1792"
+            style: "vivid" for hyper-real/dramatic, "natural" for natural look
+            quality: "standard" or "hd"
+            
+        Returns:
+            Dictionary with 'url' (local file path of the stored image), 'path'
+            and 'revised_prompt' keys, or 'error' key if it still failed after retries
+        """
+        with track("generate_image") as record:
+            key = image_key(prompt, model="dall-e-3", size=size, style=style, quality=quality)
+            cached = await asyncio.to_thread(self.image_store.get, key)
+            if cached:
+                record_image("dall-e-3", size, quality, cached=True)
+                return _image_result(cached, cached=True)
+            
+            async def attempt():
+                async with self._admit(IMAGE, images=1):
+                    return await self.client.images.generate(
+                        model="dall-e-3",
+                        prompt=prompt,
+                        size=size,
+                        style=style,
+                        quality=quality,
+                        response_format="b64_json",
+                        n=1
+                    )
+            
+            async def generate() -> dict:
+                try:
+                    response = await async_call_with_retry(attempt)
+                    
+                    if response.data and len(response.data) > 0:
+                        image_data = response.data[0]
+                        stored = await asyncio.to_thread(
+                            self.image_store.put,
+                            key,
+                            base64.b64decode(image_data.b64_json),
+                            {"revised_prompt": image_data.revised_prompt}
+                        )
+                        record_image("dall-e-3", size, quality, cached=False)
+                        return _image_result(stored)
+                    else:
+                        return {"error": "No image data returned"}
+                        
+                except Exception as e:
+                    return {"error": str(e)}
+            
+            result = await get_async_single_flight().do(key, generate)
+            if "error" in result:
+                record.outcome = "error"
+            return result
+
+    async def iter_images(self, prompts: List[str], max_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+                          **image_kwargs) -> AsyncGenerator[Tuple[int, dict], None]:
+        """
+        Generate several images concurrently, yielding each as soon as it finishes.
+        
+        Yields:
+            (index into prompts, generate_image result) in completion order
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def generate(i: int, prompt: str) -> Tuple[int, dict]:
+            async with semaphore:
+                return i, await self.generate_image(prompt, **image_kwargs)
+        
+        for next_done in asyncio.as_completed([generate(i, p) for i, p in enumerate(prompts)]):
+            yield await next_done
+    
+    async def generate_images(self, prompts: List[str], max_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+                              **image_kwargs) -> List[dict]:
+        """
+        Generate several images concurrently.
+        
+        Returns:
+            generate_image results in the same order as prompts
+        """
+        results: List[dict] = [{} for _ in prompts]
+        async for i, result in self.iter_images(prompts, max_concurrency=max_concurrency, **image_kwargs):
+            results[i] = result
+        return results
 
 
 def create_assistant(name: str, instructions: str, model: str = "gpt-4-turbo-preview") -> str:
@@ -208,7 +1633,7 @@ def create_assistant(name: str, instructions: str, model: str = "gpt-4-turbo-pre
     Returns:
         The assistant ID
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_shared_client()
     
     assistant = client.beta.assistants.create(
         name=name,
@@ -229,7 +1654,7 @@ def update_assistant(assistant_id: str, instructions: str = None, name: str = No
         instructions: New instructions (optional)
         name: New name (optional)
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_shared_client()
     
     update_params = {}
     if instructions:
@@ -254,7 +1679,7 @@ def get_assistant_info(assistant_id: str) -> dict:
     Returns:
         Dictionary with assistant information
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_shared_client()
     
     assistant = client.beta.assistants.retrieve(assistant_id)
     
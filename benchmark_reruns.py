@@ -0,0 +1,392 @@
+"""
+PlaidLibs™ Rerun Benchmark
+Measures the cost of one Streamlit rerun of app.py per mode and history size.
+
+Every interaction re-executes the whole script, so the time to redraw a long
+chat history is paid on every click. This drives app.py with
+streamlit.testing.v1.AppTest against the local fake backend (fake_openai.py,
+zero latency). Each workflow is seeded with 10, 100 and 1000 history entries
+(chat messages, story beats, or paragraphs of a finished story); the welcome
+screen is measured alongside each of them, and a sidebar toggle once. The
+benchmark records the fastest rerun and its allocations (tracemalloc peak and
+net growth).
+
+Raw numbers depend on the machine, so the comparison with the stored baseline
+uses ratios measured within one run: each case relative to the welcome
+screen, and each workflow's largest history size relative to its smallest.
+
+Usage:
+    python benchmark_reruns.py                    # compare with the baseline
+    python benchmark_reruns.py --update-baseline  # store this run as the baseline
+
+Exits with status 1 when any result regresses past the tolerance.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+# The stand-in backend must be configured before app.py (and fake_openai) is imported
+os.environ.setdefault("PLAIDLIBS_FAKE_OPENAI", "1")
+os.environ.setdefault("PLAIDLIBS_FAKE_LATENCY_MS", "0")
+os.environ.setdefault("PLAIDLIBS_FAKE_TOKENS_PER_SEC", "0")
+os.environ.setdefault("PLAIDLIBS_FAKE_IMAGE_LATENCY_MS", "0")
+os.environ.setdefault("PLAIDLIBS_THREAD_POOL_SIZE", "0")
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+# AppTest touches session state from the main thread, which Streamlit warns about on every rerun
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: "missing ScriptRunContext" not in record.getMessage()
+)
+warnings.filterwarnings("ignore", message="The Assistants API is deprecated")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+HISTORY_SIZES = (10, 100, 1000)
+
+# Screen every case is measured against (see ratios())
+REFERENCE_MODE = "welcome"
+
+# A ratio regresses when it is this much worse than the baseline...
+DEFAULT_TOLERANCE = 0.25
+
+# ...and worse by more than these absolute amounts (timer and allocator noise;
+# rerun times on a busy machine wander by a quarter even taking the fastest)
+MIN_RATIO_DELTAS = {"wall_ms": 0.5, "peak_kb": 0.1, "growth_kb": 0.1}
+
+METRICS = tuple(MIN_RATIO_DELTAS)
+
+SAMPLE_TEXT = (
+    "The tartan llama galloped across the moonlit meadow, clutching a "
+    "marmalade sandwich and whispering secrets to a very dizzy bagpipe."
+)
+
+
+def _chat_history(size: int) -> list:
+    """Alternating user/assistant messages."""
+    return [
+        {"role": "user" if i % 2 else "assistant", "content": f"{i}. {SAMPLE_TEXT}"}
+        for i in range(size)
+    ]
+
+
+def _paragraphs(size: int) -> str:
+    """A finished story of size paragraphs."""
+    return "\n\n".join(f"{i}. {SAMPLE_TEXT}" for i in range(size))
+
+
+def _sample_images(count: int) -> list:
+    """Paths of placeholder images in the image store, as a finished generation leaves them."""
+    from fake_openai import placeholder_png
+    from image_store import get_image_store
+    store = get_image_store()
+    return [store.put(f"benchmark-{i}", placeholder_png(f"benchmark {i}"))["path"] for i in range(count)]
+
+
+def _fake_thread(messages: list) -> str:
+    """Create a thread on the fake backend holding messages; returns its ID."""
+    from assistant import build_openai_client
+    client = build_openai_client()
+    thread = client.beta.threads.create()
+    for message in messages:
+        client.beta.threads.messages.create(thread.id, role=message["role"], content=message["content"])
+    return thread.id
+
+
+def seed_welcome(at: AppTest, size: int):
+    """A fresh session on the Lib-Ate welcome screen (size is ignored)."""
+    at.session_state["current_mode"] = "lib_ate"
+
+
+def seed_lib_ate(at: AppTest, size: int):
+    """Lib-Ate collecting inputs, with size chat messages above the input box."""
+    at.session_state["current_mode"] = "lib_ate"
+    at.session_state["lib_ate_state"] = "collecting"
+    at.session_state["lib_ate_messages"] = _chat_history(size)
+    at.session_state["lib_ate_selections"] = {}
+    at.session_state["lib_ate_style_options"] = {}
+    at.session_state["lib_ate_inputs"] = []
+    at.session_state["lib_ate_current_input_idx"] = 0
+    at.session_state["lib_ate_data"] = {
+        "hidden_story_template": SAMPLE_TEXT,
+        "teaser": SAMPLE_TEXT,
+        "required_inputs": ["Adjective", "Plural Noun", "Animal"],
+    }
+
+
+def seed_plaid_chat(at: AppTest, size: int):
+    """PlaidChat with size messages in the transcript and on its fake-backed thread."""
+    messages = _chat_history(size)
+    at.session_state["current_mode"] = "plaid_chat"
+    at.session_state["messages"] = messages
+    at.session_state["thread_id"] = _fake_thread(messages)
+
+
+def seed_create_direct(at: AppTest, size: int):
+    """Create Direct showing a size-paragraph story and its illustration."""
+    at.session_state["current_mode"] = "create_direct"
+    at.session_state["create_direct_stage"] = "result"
+    at.session_state["create_direct_result"] = _paragraphs(size)
+    at.session_state["create_direct_image"] = _sample_images(1)[0]
+
+
+def seed_plaid_pic(at: AppTest, size: int):
+    """PlaidPic showing size paragraphs of visual prompts and four scenes."""
+    at.session_state["current_mode"] = "plaid_pic"
+    at.session_state["plaidpic_stage"] = "result"
+    at.session_state["plaidpic_story"] = SAMPLE_TEXT
+    at.session_state["plaidpic_result"] = _paragraphs(size)
+    at.session_state["plaidpic_images"] = _sample_images(4)
+
+
+def seed_plaid_mag_gen(at: AppTest, size: int):
+    """PlaidMagGen showing a size-paragraph comic script and four panels."""
+    at.session_state["current_mode"] = "plaid_mag_gen"
+    at.session_state["maggen_stage"] = "result"
+    at.session_state["maggen_result"] = _paragraphs(size)
+    at.session_state["maggen_images"] = _sample_images(4)
+
+
+def seed_plaid_play(at: AppTest, size: int):
+    """PlaidPlay mid-adventure with size story beats and choices (no images)."""
+    at.session_state["current_mode"] = "plaid_play"
+    at.session_state["plaidplay_stage"] = "playing"
+    at.session_state["plaidplay_setting"] = "🏰 Fantasy Kingdom"
+    at.session_state["plaidplay_needs_story"] = False
+    at.session_state["plaidplay_history"] = [
+        {"type": "choice", "content": str(i % 3 + 1)} if i % 2
+        else {"type": "story", "content": f"{i}. {SAMPLE_TEXT}", "image": None}
+        for i in range(size)
+    ]
+
+
+def toggle_images(at: AppTest):
+    """Flip the sidebar's image generation toggle before a rerun."""
+    toggle = at.toggle(key="image_gen_toggle")
+    toggle.set_value(not toggle.value)
+
+
+SEEDS = {
+    "welcome": seed_welcome,
+    "sidebar": seed_welcome,
+    "lib_ate": seed_lib_ate,
+    "plaid_chat": seed_plaid_chat,
+    "create_direct": seed_create_direct,
+    "plaid_pic": seed_plaid_pic,
+    "plaid_mag_gen": seed_plaid_mag_gen,
+    "plaid_play": seed_plaid_play,
+}
+
+# Benchmarked modes; the welcome screen is the reference measured with each of them
+MODES = [mode for mode in SEEDS if mode != REFERENCE_MODE]
+
+# Modes whose page does not grow with history, measured once at size 0
+SIZELESS_MODES = {"sidebar"}
+
+# Interaction applied before every measured rerun of a mode (default: a plain rerun)
+INTERACTIONS = {
+    "sidebar": toggle_images,
+}
+
+
+def _start(mode: str, size: int) -> AppTest:
+    """An AppTest seeded for one case, after its first (warm-up) run."""
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    SEEDS[mode](at, size)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{mode}/{size}: {at.exception[0].message}")
+    return at
+
+
+def _timed_run(at: AppTest, interact) -> float:
+    """Milliseconds taken by one rerun."""
+    interact(at)
+    gc.collect()
+    started = time.perf_counter()
+    at.run()
+    return (time.perf_counter() - started) * 1000
+
+
+def _traced_run(at: AppTest, interact) -> tuple:
+    """(peak, growth) in bytes allocated by one rerun, after a traced warm-up rerun."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        interact(at)
+        at.run()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        interact(at)
+        at.run()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, after - before
+
+
+def _no_interaction(at: AppTest):
+    pass
+
+
+def measure(mode: str, sizes: list, runs: int) -> dict:
+    """
+    Time and trace reruns of app.py for one mode at each history size.
+    
+    The sizes and a welcome-screen reference are rerun in rotation, so load
+    on the machine hits all of them alike, and the fastest rerun of each is
+    kept. Allocations are traced in a separate pass so tracing overhead does
+    not skew the timings.
+    
+    Args:
+        mode: Key of MODES
+        sizes: History entries to seed, one case per size
+        runs: Timed reruns per case (after one warm-up run)
+    
+    Returns:
+        "mode/size" -> {"wall_ms": fastest rerun, "peak_kb": tracemalloc peak,
+        "growth_kb": net growth per rerun, "welcome": the same for the reference}
+    """
+    interact = INTERACTIONS.get(mode, _no_interaction)
+    reference = _start(REFERENCE_MODE, 0)
+    cases = {size: _start(mode, size) for size in sizes}
+    
+    reference_walls, walls = [], {size: [] for size in sizes}
+    for _ in range(runs):
+        reference_walls.append(_timed_run(reference, _no_interaction))
+        for size, at in cases.items():
+            walls[size].append(_timed_run(at, interact))
+    
+    def summary(wall_list: list, at: AppTest, case_interact) -> dict:
+        peak, growth = _traced_run(at, case_interact)
+        return {
+            "wall_ms": round(min(wall_list), 2),
+            "peak_kb": round(peak / 1024, 1),
+            "growth_kb": round(growth / 1024, 1),
+        }
+    
+    welcome = summary(reference_walls, reference, _no_interaction)
+    return {
+        f"{mode}/{size}": {**summary(walls[size], at, interact), "welcome": welcome}
+        for size, at in cases.items()
+    }
+
+
+def run_suite(modes: list, sizes: list, runs: int) -> dict:
+    """Measure every mode at every size; returns "mode/size" -> measurement."""
+    results = {}
+    for mode in modes:
+        measured = measure(mode, [0] if mode in SIZELESS_MODES else sizes, runs)
+        for key, result in measured.items():
+            print(f"  {key:<19} {result['wall_ms']:>8.1f} ms (welcome {result['welcome']['wall_ms']:>6.1f})  "
+                  f"peak {result['peak_kb']:>8.1f} KB  growth {result['growth_kb']:>7.1f} KB")
+        results.update(measured)
+    return results
+
+
+def _ratio(new: float, old: float) -> float:
+    """new / old, with memory figures near zero clamped so the ratio stays finite."""
+    return round(max(new, 1.0) / max(old, 1.0), 3)
+
+
+def ratios(results: dict) -> dict:
+    """
+    Machine-independent figures derived from one run's results.
+    
+    "<case> vs welcome" is every metric of a case relative to the welcome
+    screen measured alongside it; "<mode> <largest> vs <smallest>" is every
+    metric of a mode's largest history size relative to its smallest.
+    
+    Returns:
+        Figure name -> {metric: ratio}
+    """
+    figures = {}
+    by_mode = {}
+    for key, result in results.items():
+        figures[f"{key} vs welcome"] = {m: _ratio(result[m], result["welcome"][m]) for m in METRICS}
+        mode, size = key.rsplit("/", 1)
+        by_mode.setdefault(mode, []).append(int(size))
+    
+    for mode, sizes in by_mode.items():
+        if len(sizes) > 1:
+            small, large = results[f"{mode}/{min(sizes)}"], results[f"{mode}/{max(sizes)}"]
+            figures[f"{mode} {max(sizes)} vs {min(sizes)}"] = {m: _ratio(large[m], small[m]) for m in METRICS}
+    return figures
+
+
+def compare(figures: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Find ratios that regressed against the baseline's ratios.
+    
+    Returns:
+        Human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    for name, current in figures.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        for metric, floor in MIN_RATIO_DELTAS.items():
+            old, new = expected[metric], current[metric]
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{name} {metric}: x{old} -> x{new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def environment() -> dict:
+    """Where the raw numbers were measured (the ratios are what gets compared)."""
+    return {
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def main():
+    """Run the benchmark and compare with (or store) the baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark per-rerun cost of app.py")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=MODES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(HISTORY_SIZES))
+    parser.add_argument("--runs", type=int, default=5, help="timed reruns per case")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    
+    print("\n🧵 PlaidLibs™ Rerun Benchmark\n")
+    results = run_suite(args.modes, args.sizes, args.runs)
+    figures = ratios(results)
+    
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": environment(), "results": results, "ratios": figures},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return
+    
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    
+    regressions = compare(figures, stored.get("ratios", {}), args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+PlaidLibs™ Cassette Module
+Records OpenAI traffic to a cassette file and replays it with original or scaled timing.
+
+Set PLAIDLIBS_CASSETTE to a file path. In record mode every request made
+through build_openai_client() is passed to the real (or fake) backend and the
+response is appended to the cassette, along with when its headers and each
+streamed chunk arrived. In replay mode nothing leaves the process: responses
+come from the cassette, paced by the recorded timing divided by
+PLAIDLIBS_CASSETTE_SPEED (0 replays instantly).
+
+Request headers are never recorded, so cassettes hold no API keys.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+import httpx
+
+# Cassette file (JSON Lines, one interaction per line)
+CASSETTE_PATH = os.getenv("PLAIDLIBS_CASSETTE")
+
+# "record", "replay", or "auto" (replay if the file exists, otherwise record)
+CASSETTE_MODE = os.getenv("PLAIDLIBS_CASSETTE_MODE", "auto").lower()
+
+# Replay speed-up: 1 keeps recorded timing, 2 halves every delay, 0 skips delays
+CASSETTE_SPEED = float(os.getenv("PLAIDLIBS_CASSETTE_SPEED", "1"))
+
+
+# Object IDs, which differ between the recording and a replay that hands out threads in another order
+_OBJECT_ID = re.compile(r"\b(asst|thread|run|msg|step|chatcmpl)_[A-Za-z0-9]+")
+
+_resolved_mode: Optional[str] = None
+
+
+def cassette_mode() -> Optional[str]:
+    """
+    "record" or "replay" when a cassette is configured, else None.
+    
+    "auto" is resolved once per process, so a recording does not switch to
+    replay as soon as its file exists.
+    """
+    global _resolved_mode
+    if not CASSETTE_PATH:
+        return None
+    if _resolved_mode is None:
+        if CASSETTE_MODE in ("record", "replay"):
+            _resolved_mode = CASSETTE_MODE
+        else:
+            _resolved_mode = "replay" if os.path.exists(CASSETTE_PATH) else "record"
+    return _resolved_mode
+
+
+def is_replaying() -> bool:
+    """True when responses come from a cassette instead of a backend."""
+    return cassette_mode() == "replay"
+
+
+def _api_path(url: httpx.URL) -> str:
+    """Request path after the /v1 prefix, so cassettes survive base URL changes."""
+    path = url.path
+    return path.split("/v1/", 1)[1] if "/v1/" in path else path.lstrip("/")
+
+
+def _query(url: httpx.URL) -> str:
+    query = url.query
+    return query.decode("ascii") if isinstance(query, bytes) else query
+
+
+def _canonical_body(body: bytes) -> str:
+    """Request body with JSON keys sorted, so equal payloads match."""
+    if not body:
+        return ""
+    text = body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(json.loads(text), sort_keys=True)
+    except ValueError:
+        return text
+
+
+def _encode(data: bytes) -> list:
+    """[encoding, payload] for storing bytes in JSON."""
+    try:
+        return ["text", data.decode("utf-8")]
+    except UnicodeDecodeError:
+        return ["base64", base64.b64encode(data).decode("ascii")]
+
+
+def _decode(encoded: list) -> bytes:
+    encoding, payload = encoded
+    return payload.encode("utf-8") if encoding == "text" else base64.b64decode(payload)
+
+
+class Cassette:
+    """
+    Interactions loaded from, or appended to, one cassette file.
+    
+    Replayed requests are matched on method, path, query and body. Each
+    recorded response is used once, in recorded order. After that the last
+    one repeats, so extra polls of a run see its final state.
+    
+    A request with no exact match falls back to the next response recorded
+    for the same endpoint, ignoring object IDs and every body field except
+    "stream". This covers prompts built from random choices and pooled
+    threads handed out in a different order than when recording.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exact: dict = defaultdict(deque)
+        self._loose: dict = defaultdict(deque)
+        self._last: dict = {}
+        self._started = time.monotonic()
+    
+    def load(self) -> "Cassette":
+        """Read every interaction in the file for replay."""
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                exact, loose = self._keys(interaction["method"], interaction["path"],
+                                          interaction["query"], interaction["body"])
+                self._exact[exact].append(interaction)
+                self._loose[loose].append(interaction)
+        return self
+    
+    @staticmethod
+    def _keys(method: str, path: str, query: str, body: str) -> tuple:
+        """(exact, loose) match keys for a request."""
+        try:
+            stream = bool(json.loads(body).get("stream")) if body else False
+        except (ValueError, AttributeError):
+            stream = False
+        loose = (method, _OBJECT_ID.sub(r"\1_*", path), _OBJECT_ID.sub(r"\1_*", query), stream)
+        return (method, path, query, body), loose
+    
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._loose.values())
+    
+    def match(self, request: httpx.Request) -> Optional[dict]:
+        """Take the recorded interaction that answers request, or None."""
+        exact, loose = self._keys(request.method, _api_path(request.url), _query(request.url),
+                                  _canonical_body(request.content))
+        with self._lock:
+            for queue in (self._exact[exact], self._loose[loose]):
+                if queue:
+                    interaction = queue.popleft()
+                    self._remove(interaction)
+                    self._last[exact] = self._last[loose] = interaction
+                    return interaction
+            return self._last.get(exact) or self._last.get(loose)
+    
+    def _remove(self, interaction: dict):
+        """Drop a consumed interaction from whichever index still holds it. Caller holds the lock."""
+        exact, loose = self._keys(interaction["method"], interaction["path"],
+                                  interaction["query"], interaction["body"])
+        for queue in (self._exact[exact], self._loose[loose]):
+            try:
+                queue.remove(interaction)
+            except ValueError:
+                pass
+    
+    def append(self, interaction: dict):
+        """Write one finished interaction to the file."""
+        line = json.dumps(interaction) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+    
+    def elapsed(self) -> float:
+        """Seconds since this cassette was opened (recorded as each interaction's start)."""
+        return time.monotonic() - self._started
+
+
+class _Recording:
+    """Collects one response's chunks and their arrival times while the caller reads it."""
+    
+    def __init__(self, cassette: Cassette, request: httpx.Request, started: float):
+        self.cassette = cassette
+        self.started = started
+        self.chunks: list = []
+        self.saved = False
+        self.interaction = {
+            "method": request.method,
+            "path": _api_path(request.url),
+            "query": _query(request.url),
+            "body": _canonical_body(request.content),
+            "at": round(cassette.elapsed(), 4),
+        }
+    
+    def respond(self, response: httpx.Response):
+        self.interaction.update(
+            status=response.status_code,
+            headers=[[k, v] for k, v in response.headers.multi_items() if k.lower() != "content-length"],
+            latency=round(time.monotonic() - self.started, 4),
+        )
+    
+    def chunk(self, data: bytes):
+        self.chunks.append([round(time.monotonic() - self.started, 4), _encode(data)])
+    
+    def save(self):
+        if not self.saved:
+            self.saved = True
+            self.interaction["chunks"] = self.chunks
+            self.cassette.append(self.interaction)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream, recording: _Recording):
+        self.stream = stream
+        self.recording = recording
+    
+    def __iter__(self):
+        for data in self.stream:
+            self.recording.chunk(data)
+            yield data
+        self.recording.save()
+    
+    def close(self):
+        self.recording.save()
+        self.stream.close()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, recording: _Recording):
+        self.stream = stream
+        self.recording = recording
+    
+    async def __aiter__(self):
+        async for data in self.stream:
+            self.recording.chunk(data)
+            yield data
+        self.recording.save()
+    
+    async def aclose(self):
+        self.recording.save()
+        await self.stream.aclose()
+
+
+def _delays(interaction: dict, speed: float) -> list:
+    """(delay, bytes) for each recorded chunk, relative to the one before it."""
+    scale = 0.0 if speed <= 0 else 1.0 / speed
+    previous = interaction["latency"]
+    out = []
+    for offset, encoded in interaction["chunks"]:
+        out.append((max(offset - previous, 0.0) * scale, _decode(encoded)))
+        previous = offset
+    return out
+
+
+def _miss(request: httpx.Request) -> httpx.Response:
+    """404 for a request the cassette has no answer for (not retried by resilience.py)."""
+    message = f"No recorded response for {request.method} /{_api_path(request.url)} in cassette."
+    return httpx.Response(404, json={"error": {"message": message, "type": "cassette_miss",
+                                               "code": "cassette_miss", "param": None}})
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+    
+    def __iter__(self):
+        for delay, data in self.chunks:
+            if delay:
+                time.sleep(delay)
+            yield data
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+    
+    async def __aiter__(self):
+        for delay, data in self.chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield data
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Passes requests to another transport and appends each exchange to a cassette."""
+    
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        recording = _Recording(self.cassette, request, time.monotonic())
+        response = self.transport.handle_request(request)
+        recording.respond(response)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_RecordingStream(response.stream, recording),
+                              extensions=response.extensions)
+    
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of RecordingTransport."""
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        self.transport = transport
+        self.cassette = cassette
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        recording = _Recording(self.cassette, request, time.monotonic())
+        response = await self.transport.handle_async_request(request)
+        recording.respond(response)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncRecordingStream(response.stream, recording),
+                              extensions=response.extensions)
+    
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Answers requests from a cassette, with recorded timing scaled by speed."""
+    
+    def __init__(self, cassette: Cassette, speed: float = CASSETTE_SPEED):
+        self.cassette = cassette
+        self.speed = speed
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        interaction = self.cassette.match(request)
+        if interaction is None:
+            return _miss(request)
+        if self.speed > 0:
+            time.sleep(interaction["latency"] / self.speed)
+        return httpx.Response(interaction["status"], headers=interaction["headers"],
+                              stream=_ReplayStream(_delays(interaction, self.speed)))
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ReplayTransport."""
+    
+    def __init__(self, cassette: Cassette, speed: float = CASSETTE_SPEED):
+        self.cassette = cassette
+        self.speed = speed
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        interaction = self.cassette.match(request)
+        if interaction is None:
+            return _miss(request)
+        if self.speed > 0:
+            await asyncio.sleep(interaction["latency"] / self.speed)
+        return httpx.Response(interaction["status"], headers=interaction["headers"],
+                              stream=_AsyncReplayStream(_delays(interaction, self.speed)))
+
+
+_shared_cassette: Optional[Cassette] = None
+_shared_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the process-wide cassette configured by PLAIDLIBS_CASSETTE, if any."""
+    global _shared_cassette
+    mode = cassette_mode()
+    if mode is None:
+        return None
+    if _shared_cassette is None:
+        with _shared_cassette_lock:
+            if _shared_cassette is None:
+                cassette = Cassette(CASSETTE_PATH)
+                _shared_cassette = cassette.load() if mode == "replay" else cassette
+    return _shared_cassette
+
+
+def wrap_transport(transport: httpx.BaseTransport) -> httpx.BaseTransport:
+    """Record or replace transport according to PLAIDLIBS_CASSETTE (unchanged when unset)."""
+    cassette = get_cassette()
+    if cassette is None:
+        return transport
+    if is_replaying():
+        return ReplayTransport(cassette)
+    return RecordingTransport(transport, cassette)
+
+
+def wrap_async_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """Async counterpart of wrap_transport."""
+    cassette = get_cassette()
+    if cassette is None:
+        return transport
+    if is_replaying():
+        return AsyncReplayTransport(cassette)
+    return AsyncRecordingTransport(transport, cassette)
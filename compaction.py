@@ -0,0 +1,85 @@
+"""
+PlaidLibs™ Context Compaction Module
+Keeps a rolling summary of long-running stories so prompt size stays flat.
+"""
+
+from typing import Callable
+
+# Upper bound on the rolling summary length, in words
+SUMMARY_MAX_WORDS = 180
+
+SUMMARY_PROMPT = """
+You maintain the running memory of an ongoing story.
+
+**Current summary:**
+{summary}
+
+**New material to fold in:**
+{new_material}
+
+Rewrite the summary so it covers everything above in at most {max_words} words.
+Keep character names, relationships, unresolved threads, promises, items and
+places that later scenes may depend on. Drop prose style and minor detail.
+Output ONLY the updated summary.
+"""
+
+
+def new_summary() -> dict:
+    """An empty rolling summary covering no entries."""
+    return {"text": "", "covered": 0}
+
+
+def update_summary(summary: dict, entries: list, summarize: Callable[[str], str],
+                   keep_recent: int = 1) -> dict:
+    """
+    Fold entries that are no longer "recent" into the rolling summary.
+    
+    Only entries not yet covered are sent, so each entry is summarized once.
+    If summarizing fails the old summary is kept; build_context then simply
+    includes the uncovered entries verbatim.
+    
+    Args:
+        summary: The current summary (see new_summary)
+        entries: All story entries so far, oldest first
+        summarize: Function that runs a prompt and returns the completion text
+        keep_recent: Number of newest entries left out of the summary
+    
+    Returns:
+        The updated summary
+    """
+    end = max(len(entries) - keep_recent, 0)
+    if end <= summary["covered"]:
+        return summary
+    
+    prompt = SUMMARY_PROMPT.format(
+        summary=summary["text"] or "(nothing yet)",
+        new_material="\n\n".join(entries[summary["covered"]:end]),
+        max_words=SUMMARY_MAX_WORDS
+    )
+    try:
+        text = summarize(prompt).strip()
+    except Exception:
+        return summary
+    if not text:
+        return summary
+    return {"text": text, "covered": end}
+
+
+def build_context(summary: dict, entries: list) -> str:
+    """
+    Prompt context: the rolling summary followed by uncovered entries verbatim.
+    
+    Args:
+        summary: The current summary
+        entries: All story entries so far, oldest first
+    
+    Returns:
+        Context text for the next generation prompt
+    """
+    parts = []
+    if summary["text"]:
+        parts.append(f"Story so far (summary):\n{summary['text']}")
+    recent = entries[summary["covered"]:]
+    if recent:
+        parts.append("Most recent:\n" + "\n\n".join(recent))
+    return "\n\n".join(parts)
@@ -0,0 +1,660 @@
+"""
+PlaidLibs™ Fake OpenAI Module
+Deterministic, in-process stand-in for the OpenAI endpoints the app uses.
+
+Set PLAIDLIBS_FAKE_OPENAI=1 and build_openai_client() routes every request to
+this module instead of the network, so each mode runs offline for
+development, load tests and benchmarks. Covered endpoints: assistants,
+threads, messages, runs (polled and streamed), chat completions (plain and
+streamed) and image generation (placeholder PNGs).
+"""
+
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qs
+import httpx
+
+# Median request overhead and spread (lognormal) before the first byte, in ms
+FAKE_LATENCY_MS = float(os.getenv("PLAIDLIBS_FAKE_LATENCY_MS", "300"))
+FAKE_LATENCY_SIGMA = float(os.getenv("PLAIDLIBS_FAKE_LATENCY_SIGMA", "0.5"))
+
+# Median image generation time, in ms
+FAKE_IMAGE_LATENCY_MS = float(os.getenv("PLAIDLIBS_FAKE_IMAGE_LATENCY_MS", "2000"))
+
+# Generated tokens per second (paces streams and run completion); 0 means instant
+FAKE_TOKENS_PER_SEC = float(os.getenv("PLAIDLIBS_FAKE_TOKENS_PER_SEC", "60"))
+
+# Words in a generated reply
+FAKE_REPLY_WORDS = int(os.getenv("PLAIDLIBS_FAKE_REPLY_WORDS", "120"))
+
+# Fraction of requests answered with a transient error (429/500/503) or a failed run
+FAKE_ERROR_RATE = float(os.getenv("PLAIDLIBS_FAKE_ERROR_RATE", "0"))
+
+# Finished runs each thread keeps for retrieval and listing; older ones are evicted
+FAKE_RUNS_KEPT = int(os.getenv("PLAIDLIBS_FAKE_RUNS_KEPT", "20"))
+
+# Seed for latency and error draws; reply text depends only on the prompt
+FAKE_SEED = int(os.getenv("PLAIDLIBS_FAKE_SEED", "0"))
+
+FAKE_MODEL = "gpt-4-turbo-preview"
+
+_WORDS = (
+    "plaid", "tartan", "quip", "llama", "teacup", "moonlit", "wobbly", "saga", "gleaming",
+    "pickle", "cathedral", "whispered", "galloped", "velvet", "thunder", "marmalade", "brave",
+    "dizzy", "lantern", "crumpet", "sorcerer", "waffle", "bagpipe", "glimmering", "secret",
+    "meadow", "harbor", "rocket", "squirrel", "enormous", "tiny", "delightful", "mysterious",
+)
+
+_LIB_INPUTS = ["Adjective", "Plural Noun", "Verb (Past Tense)", "Place", "Emotion", "Animal", "Food", "Action"]
+
+_TRANSIENT_ERRORS = (
+    (429, "rate_limit_exceeded", "Rate limit reached (fake)."),
+    (500, "server_error", "The server had an error (fake)."),
+    (503, "server_error", "The engine is currently overloaded (fake)."),
+)
+
+
+def is_enabled() -> bool:
+    """True when PLAIDLIBS_FAKE_OPENAI asks for the fake backend."""
+    return os.getenv("PLAIDLIBS_FAKE_OPENAI", "").lower() in ("1", "true", "yes", "on")
+
+
+def _prompt_rng(text: str) -> random.Random:
+    """RNG seeded from text, so the same prompt always gets the same reply."""
+    return random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    """One capitalized sentence of vocabulary words."""
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _story(rng: random.Random, words: int) -> str:
+    """Paragraphs of sentences totalling about words words."""
+    sentences = [_sentence(rng, rng.randint(8, 16)) for _ in range(max(1, words // 12))]
+    paragraphs = [" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    return "\n\n".join(paragraphs)
+
+
+def _json_reply(prompt: str, rng: random.Random) -> Optional[str]:
+    """
+    Fill in the JSON skeleton a prompt asks for, if it asks for one.
+    
+    Keys whose example value is a list get a list; "inputs" lists get
+    Lib-Ate input names, and "template" keys get a story with a
+    [Placeholder] for each of them.
+    """
+    marker = prompt.find("JSON")
+    if marker < 0:
+        return None
+    start, end = prompt.find("{", marker), prompt.rfind("}")
+    if start < 0 or end < start:
+        return None
+    fields = re.findall(r'"(\w+)"\s*:\s*([\["])', prompt[start:end + 1])
+    if not fields:
+        return None
+    
+    reply = {}
+    for key, kind in fields:
+        if kind == "[":
+            reply[key] = list(_LIB_INPUTS) if "input" in key else [_sentence(rng) for _ in range(3)]
+        elif "template" in key:
+            reply[key] = " ".join(f"{_sentence(rng, 6)[:-1]} [{name}]." for name in _LIB_INPUTS)
+        else:
+            reply[key] = _sentence(rng)
+    return json.dumps(reply, indent=2)
+
+
+def fake_reply(prompt: str) -> str:
+    """Deterministic reply text for a prompt."""
+    rng = _prompt_rng(prompt)
+    return _json_reply(prompt, rng) or _story(rng, FAKE_REPLY_WORDS)
+
+
+def _chunks(text: str) -> list:
+    """Split text into streamed pieces of roughly one token each."""
+    return re.findall(r"\s*\S+", text) or [text]
+
+
+def _count_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token)."""
+    return max(1, len(text) // 4)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def placeholder_png(seed: str, size: int = 256) -> bytes:
+    """
+    A small plaid PNG whose colours are derived from seed.
+    
+    Args:
+        seed: Any text (the image prompt)
+        size: Width and height in pixels
+    
+    Returns:
+        PNG file bytes
+    """
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    base, stripe, accent = digest[0:3], digest[3:6], digest[6:9]
+    rows = []
+    for y in range(size):
+        row = bytearray([0])
+        for x in range(size):
+            if (x // 8) % 4 == 0 or (y // 8) % 4 == 0:
+                color = accent if (x // 8 + y // 8) % 2 else stripe
+            else:
+                color = base
+            row.extend(color)
+        rows.append(bytes(row))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + _png_chunk(b"IEND", b""))
+
+
+class FakeResponse:
+    """What the backend answers: a delay, then a body or a paced list of stream chunks."""
+    
+    def __init__(self, status: int = 200, body=None, delay: float = 0.0,
+                 chunks: Optional[list] = None, headers: Optional[dict] = None):
+        self.status = status
+        self.body = body
+        self.delay = delay
+        self.chunks = chunks
+        self.headers = headers or {}
+
+
+def _sse(event: Optional[str], data) -> bytes:
+    """Encode one server-sent event."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n".encode("utf-8")
+
+
+class FakeOpenAIBackend:
+    """
+    In-memory state and request handling shared by the sync and async transports.
+    
+    Runs that are polled complete once enough time has passed to "generate"
+    their reply at FAKE_TOKENS_PER_SEC; streamed runs pace their deltas the
+    same way.
+    
+    Each thread's state holds its runs and the one still generating, so no
+    request looks beyond its own thread however many a load test creates.
+    """
+    
+    def __init__(self, seed: int = FAKE_SEED):
+        self._lock = threading.RLock()
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.assistants: dict = {}
+        self.threads: dict = {}  # thread_id -> {"thread", "messages", "runs" (id -> run), "active" run or None}
+    
+    # -- helpers -------------------------------------------------------------
+    
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_fake{next(self._ids):08d}"
+    
+    def _latency(self, median_ms: float = FAKE_LATENCY_MS) -> float:
+        with self._lock:
+            return self._rng.lognormvariate(0.0, FAKE_LATENCY_SIGMA) * median_ms / 1000.0
+    
+    def _should_fail(self) -> bool:
+        if FAKE_ERROR_RATE <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < FAKE_ERROR_RATE
+    
+    def _transient_error(self) -> FakeResponse:
+        with self._lock:
+            status, code, message = self._rng.choice(_TRANSIENT_ERRORS)
+        body = {"error": {"message": message, "type": code, "code": code, "param": None}}
+        return FakeResponse(status, body, delay=self._latency(), headers={"retry-after-ms": "200"})
+    
+    def _generation_time(self, text: str) -> float:
+        if FAKE_TOKENS_PER_SEC <= 0:
+            return 0.0
+        return len(_chunks(text)) / FAKE_TOKENS_PER_SEC
+    
+    def _paced(self, pieces: list) -> list:
+        """Delays between stream pieces at FAKE_TOKENS_PER_SEC."""
+        gap = 1.0 / FAKE_TOKENS_PER_SEC if FAKE_TOKENS_PER_SEC > 0 else 0.0
+        return [(gap, piece) for piece in pieces]
+    
+    @staticmethod
+    def _not_found(what: str) -> FakeResponse:
+        return FakeResponse(404, {"error": {"message": f"No {what} found (fake).", "type": "invalid_request_error",
+                                            "code": None, "param": None}})
+    
+    @staticmethod
+    def _bad_request(message: str) -> FakeResponse:
+        return FakeResponse(400, {"error": {"message": message, "type": "invalid_request_error",
+                                            "code": None, "param": None}})
+    
+    @staticmethod
+    def _list(items: list, query: dict) -> dict:
+        """Cursor-paginate items (oldest first) the way the list endpoints do."""
+        order = query.get("order", "desc")
+        limit = int(query.get("limit", 20))
+        ordered = items if order == "asc" else list(reversed(items))
+        ids = [item["id"] for item in ordered]
+        if query.get("after") in ids:
+            ordered = ordered[ids.index(query["after"]) + 1:]
+        elif query.get("before") in ids:
+            ordered = ordered[:ids.index(query["before"])]
+        page = ordered[:limit]
+        return {
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(ordered) > limit,
+        }
+    
+    # -- routing -------------------------------------------------------------
+    
+    def handle(self, method: str, path: str, query: dict, payload: dict) -> FakeResponse:
+        """
+        Answer one API request.
+        
+        Args:
+            method: HTTP method
+            path: Path after the /v1 prefix, e.g. "/threads/thread_x/runs"
+            query: Query parameters
+            payload: Decoded JSON body ({} if none)
+        """
+        parts = [p for p in path.split("/") if p]
+        generating = method == "POST" and (
+            parts[:2] in (["chat", "completions"], ["images", "generations"])
+            or (len(parts) == 3 and parts[0] == "threads" and parts[2] == "runs")
+        )
+        if generating and self._should_fail():
+            return self._transient_error()
+        
+        if parts[:1] == ["assistants"]:
+            return self._assistants(method, parts[1:], query, payload)
+        if parts[:2] == ["chat", "completions"] and method == "POST":
+            return self._chat_completion(payload)
+        if parts[:2] == ["images", "generations"] and method == "POST":
+            return self._image(payload)
+        if parts[:1] == ["threads"]:
+            return self._threads(method, parts[1:], query, payload)
+        return self._not_found(f"route for {method} /{path.strip('/')}")
+    
+    # -- assistants ----------------------------------------------------------
+    
+    def _assistants(self, method: str, parts: list, query: dict, payload: dict) -> FakeResponse:
+        with self._lock:
+            if not parts and method == "POST":
+                assistant = {
+                    "id": self._id("asst"), "object": "assistant", "created_at": int(time.time()),
+                    "name": payload.get("name"), "description": None, "model": payload.get("model", FAKE_MODEL),
+                    "instructions": payload.get("instructions"), "tools": payload.get("tools", []),
+                    "metadata": payload.get("metadata", {}),
+                }
+                self.assistants[assistant["id"]] = assistant
+                return FakeResponse(200, assistant, delay=self._latency())
+            if not parts:
+                return FakeResponse(200, self._list(list(self.assistants.values()), query), delay=self._latency())
+            assistant = self.assistants.get(parts[0])
+            if assistant is None:
+                return self._not_found("assistant")
+            if method == "POST":
+                assistant.update({k: v for k, v in payload.items() if k in assistant})
+            return FakeResponse(200, assistant, delay=self._latency())
+    
+    # -- threads, messages, runs ---------------------------------------------
+    
+    def _message(self, thread_id: str, role: str, text: str, run_id: Optional[str] = None,
+                 status: str = "completed") -> dict:
+        return {
+            "id": self._id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": status,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}] if text else [],
+            "assistant_id": None, "run_id": run_id, "attachments": [], "metadata": {},
+        }
+    
+    def _threads(self, method: str, parts: list, query: dict, payload: dict) -> FakeResponse:
+        if not parts and method == "POST":
+            with self._lock:
+                thread = {"id": self._id("thread"), "object": "thread", "created_at": int(time.time()),
+                          "metadata": payload.get("metadata", {})}
+                self.threads[thread["id"]] = {"thread": thread, "messages": [], "runs": {}, "active": None}
+            return FakeResponse(200, thread, delay=self._latency())
+        
+        state = self.threads.get(parts[0]) if parts else None
+        if state is None:
+            return self._not_found("thread")
+        thread_id = parts[0]
+        
+        if parts[1:2] == ["messages"]:
+            if method == "POST":
+                content = payload.get("content", "")
+                if isinstance(content, list):
+                    content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+                with self._lock:
+                    active = self._active_run(thread_id)
+                    if active:
+                        return self._bad_request(
+                            f"Can't add messages to {thread_id} while a run {active['data']['id']} is active.")
+                    message = self._message(thread_id, payload.get("role", "user"), content)
+                    message["metadata"] = payload.get("metadata", {})
+                    state["messages"].append(message)
+                return FakeResponse(200, message, delay=self._latency())
+            with self._lock:
+                self._settle_runs(thread_id)
+                return FakeResponse(200, self._list(list(state["messages"]), query), delay=self._latency())
+        
+        if parts[1:2] == ["runs"]:
+            if len(parts) == 2 and method == "POST":
+                with self._lock:
+                    active = self._active_run(thread_id)
+                if active:
+                    return self._bad_request(f"Thread {thread_id} already has an active run {active['data']['id']}.")
+                return self._create_run(thread_id, state, payload)
+            if len(parts) == 2:
+                with self._lock:
+                    self._settle_runs(thread_id)
+                    runs = [run["data"] for run in state["runs"].values()]
+                    return FakeResponse(200, self._list(runs, query), delay=self._latency())
+            with self._lock:
+                run = state["runs"].get(parts[2]) if len(parts) > 2 else None
+                if run is None:
+                    return self._not_found("run")
+                if parts[3:4] == ["cancel"]:
+                    self._settle_runs(thread_id)
+                    if run["data"]["status"] not in ("queued", "in_progress"):
+                        return self._bad_request(f"Cannot cancel run with status '{run['data']['status']}'.")
+                    run["data"].update(status="cancelled", cancelled_at=int(time.time()))
+                    state["active"] = None
+                    if run.get("message"):
+                        run["message"]["status"] = "incomplete"
+                else:
+                    self._settle_runs(thread_id)
+                return FakeResponse(200, run["data"], delay=self._latency())
+        
+        return self._not_found("thread route")
+    
+    def _run_object(self, run_id: str, thread_id: str, payload: dict, status: str) -> dict:
+        assistant = self.assistants.get(payload.get("assistant_id"), {})
+        return {
+            "id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+            "assistant_id": payload.get("assistant_id"), "status": status,
+            "model": payload.get("model") or assistant.get("model", FAKE_MODEL),
+            "instructions": payload.get("instructions") or assistant.get("instructions") or "",
+            "tools": [], "metadata": {}, "required_action": None, "last_error": None,
+            "started_at": None, "completed_at": None, "cancelled_at": None, "failed_at": None,
+            "expires_at": None, "incomplete_details": None, "usage": None,
+            "temperature": 1.0, "top_p": 1.0, "max_prompt_tokens": None, "max_completion_tokens": None,
+            "truncation_strategy": {"type": "auto", "last_messages": None}, "response_format": "auto",
+            "tool_choice": "auto", "parallel_tool_calls": True,
+        }
+    
+    def _create_run(self, thread_id: str, state: dict, payload: dict) -> FakeResponse:
+        with self._lock:
+            run_id = self._id("run")
+            data = self._run_object(run_id, thread_id, payload, "queued")
+            last_user = next((m for m in reversed(state["messages"]) if m["role"] == "user"), None)
+            prompt = last_user["content"][0]["text"]["value"] if last_user and last_user["content"] else ""
+            reply = fake_reply(prompt)
+            history = sum(len(m["content"][0]["text"]["value"]) for m in state["messages"] if m["content"])
+            usage = {"prompt_tokens": _count_tokens(data["instructions"]) + history // 4,
+                     "completion_tokens": _count_tokens(reply)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            fail = self._rng.random() < FAKE_ERROR_RATE if FAKE_ERROR_RATE > 0 else False
+            run = {"data": data, "reply": reply, "usage": usage, "fail": fail, "settled": False,
+                   "ready_at": time.monotonic() + self._latency() + self._generation_time(reply)}
+            self._evict_runs(state)
+            state["runs"][run_id] = run
+            state["active"] = run
+        
+        if not payload.get("stream"):
+            return FakeResponse(200, data, delay=self._latency())
+        return self._stream_run(thread_id, state, run)
+    
+    def _finish_run(self, thread_id: str, run: dict, message: Optional[dict] = None) -> Optional[dict]:
+        """Mark a run completed (adding its reply to the thread) or failed. Caller holds the lock."""
+        data = run["data"]
+        run["settled"] = True
+        state = self.threads[thread_id]
+        if state["active"] is run:
+            state["active"] = None
+        now = int(time.time())
+        if run["fail"]:
+            data.update(status="failed", failed_at=now,
+                        last_error={"code": "server_error", "message": "Sorry, something went wrong (fake)."})
+            return None
+        if message is None:
+            message = self._message(thread_id, "assistant", run["reply"], run_id=data["id"])
+            self.threads[thread_id]["messages"].append(message)
+        data.update(status="completed", completed_at=now, usage=run["usage"])
+        return message
+    
+    @staticmethod
+    def _evict_runs(state: dict):
+        """Drop a thread's oldest finished runs beyond FAKE_RUNS_KEPT. Caller holds the lock."""
+        runs = state["runs"]
+        for run_id in list(runs)[:max(0, len(runs) - FAKE_RUNS_KEPT + 1)]:
+            if runs[run_id] is not state["active"]:
+                del runs[run_id]
+    
+    def _settle_runs(self, thread_id: str):
+        """Advance the thread's active run if its generation time has passed. Caller holds the lock."""
+        state = self.threads[thread_id]
+        run = state["active"]
+        if run is None:
+            return
+        data = run["data"]
+        if run["settled"] or data["status"] == "cancelled":
+            state["active"] = None
+        elif time.monotonic() >= run["ready_at"]:
+            message = run.get("message")
+            if message is not None:
+                message.update(status="completed",
+                               content=[{"type": "text", "text": {"value": run["reply"], "annotations": []}}])
+            self._finish_run(thread_id, run, message)
+        else:
+            data["status"] = "in_progress"
+            data["started_at"] = data["started_at"] or int(time.time())
+    
+    def _active_run(self, thread_id: str) -> Optional[dict]:
+        """The thread's run that is still generating, if any. Caller holds the lock."""
+        self._settle_runs(thread_id)
+        return self.threads[thread_id]["active"]
+    
+    def _stream_run(self, thread_id: str, state: dict, run: dict) -> FakeResponse:
+        """
+        Stream a run's events. The run stays active on the thread until its
+        last delta would have been sent, as a real run does (unless cancelled).
+        """
+        data = run["data"]
+        with self._lock:
+            run["settled"] = True
+            events = [(0.0, _sse("thread.run.created", dict(data)))]
+            data.update(status="in_progress", started_at=int(time.time()))
+            events.append((0.0, _sse("thread.run.in_progress", dict(data))))
+            if run["fail"]:
+                run["settled"] = False
+                self._finish_run(thread_id, run)
+                events.append((self._latency(), _sse("thread.run.failed", dict(data))))
+                events.append((0.0, _sse("done", "[DONE]")))
+                return FakeResponse(200, chunks=events, headers={"content-type": "text/event-stream"})
+            
+            message = self._message(thread_id, "assistant", "", run_id=data["id"], status="in_progress")
+            message["assistant_id"] = data["assistant_id"]
+            state["messages"].append(message)
+            events.append((0.0, _sse("thread.message.created", dict(message))))
+            
+            pieces = _chunks(run["reply"])
+            for i, (gap, piece) in enumerate(self._paced(pieces)):
+                delta = {"id": message["id"], "object": "thread.message.delta",
+                         "delta": {"content": [{"index": 0, "type": "text",
+                                                "text": {"value": piece, "annotations": []}}]}}
+                events.append((self._latency() if i == 0 else gap, _sse("thread.message.delta", delta)))
+            
+            # Settled by _settle_runs once the stream would have ended
+            run.update(settled=False, message=message,
+                       ready_at=time.monotonic() + sum(delay for delay, _ in events))
+            completed_message = dict(message, status="completed",
+                                     content=[{"type": "text", "text": {"value": run["reply"], "annotations": []}}])
+            completed_run = dict(data, status="completed", completed_at=int(time.time()), usage=run["usage"])
+            events.append((0.0, _sse("thread.message.completed", completed_message)))
+            events.append((0.0, _sse("thread.run.completed", completed_run)))
+            events.append((0.0, _sse("done", "[DONE]")))
+        return FakeResponse(200, chunks=events, headers={"content-type": "text/event-stream"})
+    
+    # -- chat completions ----------------------------------------------------
+    
+    def _chat_completion(self, payload: dict) -> FakeResponse:
+        messages = payload.get("messages", [])
+        prompt = messages[-1].get("content", "") if messages else ""
+        if isinstance(prompt, list):
+            prompt = " ".join(part.get("text", "") for part in prompt if isinstance(part, dict))
+        reply = fake_reply(prompt)
+        model = payload.get("model", FAKE_MODEL)
+        usage = {
+            "prompt_tokens": sum(_count_tokens(str(m.get("content", ""))) for m in messages),
+            "completion_tokens": _count_tokens(reply),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = self._id("chatcmpl")
+        created = int(time.time())
+        
+        if not payload.get("stream"):
+            body = {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop", "logprobs": None}],
+                "usage": usage,
+            }
+            return FakeResponse(200, body, delay=self._latency() + self._generation_time(reply))
+        
+        def chunk(delta: dict, finish_reason: Optional[str] = None, usage_block=None) -> bytes:
+            body = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [] if usage_block else [{"index": 0, "delta": delta,
+                                                        "finish_reason": finish_reason, "logprobs": None}]}
+            if usage_block:
+                body["usage"] = usage_block
+            return _sse(None, body)
+        
+        events = [(self._latency(), chunk({"role": "assistant", "content": ""}))]
+        events += [(gap, chunk({"content": piece})) for gap, piece in self._paced(_chunks(reply))]
+        events.append((0.0, chunk({}, "stop")))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            events.append((0.0, chunk({}, usage_block=usage)))
+        events.append((0.0, _sse(None, "[DONE]")))
+        return FakeResponse(200, chunks=events, headers={"content-type": "text/event-stream"})
+    
+    # -- images --------------------------------------------------------------
+    
+    def _image(self, payload: dict) -> FakeResponse:
+        prompt = payload.get("prompt", "")
+        png = placeholder_png(prompt)
+        encoded = base64.b64encode(png).decode("ascii")
+        item = {"revised_prompt": f"A plaid placeholder for: {prompt[:200]}"}
+        if payload.get("response_format") == "b64_json":
+            item["b64_json"] = encoded
+        else:
+            item["url"] = f"data:image/png;base64,{encoded}"
+        body = {"created": int(time.time()), "data": [item] * int(payload.get("n", 1))}
+        return FakeResponse(200, body, delay=self._latency(FAKE_IMAGE_LATENCY_MS))
+
+
+_shared_backend: Optional[FakeOpenAIBackend] = None
+_shared_backend_lock = threading.Lock()
+
+
+def get_fake_backend() -> FakeOpenAIBackend:
+    """Return the process-wide fake backend, creating it on first use."""
+    global _shared_backend
+    if _shared_backend is None:
+        with _shared_backend_lock:
+            if _shared_backend is None:
+                _shared_backend = FakeOpenAIBackend()
+    return _shared_backend
+
+
+def _route(backend: FakeOpenAIBackend, request: httpx.Request) -> FakeResponse:
+    """Decode an httpx request and pass it to the backend."""
+    path = request.url.path
+    if "/v1/" in path:
+        path = path.split("/v1/", 1)[1]
+    query = {k: v[-1] for k, v in parse_qs(request.url.query.decode("ascii") if isinstance(
+        request.url.query, bytes) else request.url.query).items()}
+    body = request.read()
+    payload = json.loads(body) if body else {}
+    return backend.handle(request.method, path, query, payload)
+
+
+def _headers(response: FakeResponse) -> dict:
+    headers = {"content-type": "application/json", "x-request-id": "req_fake"}
+    headers.update(response.headers)
+    return headers
+
+
+class _PacedStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+    
+    def __iter__(self):
+        for delay, data in self.chunks:
+            if delay:
+                time.sleep(delay)
+            yield data
+
+
+class _AsyncPacedStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+    
+    async def __aiter__(self):
+        for delay, data in self.chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield data
+
+
+class FakeOpenAITransport(httpx.BaseTransport):
+    """httpx transport answering OpenAI requests from the fake backend."""
+    
+    def __init__(self, backend: Optional[FakeOpenAIBackend] = None):
+        self.backend = backend or get_fake_backend()
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = _route(self.backend, request)
+        if response.delay:
+            time.sleep(response.delay)
+        if response.chunks is not None:
+            return httpx.Response(response.status, headers=_headers(response), stream=_PacedStream(response.chunks))
+        return httpx.Response(response.status, headers=_headers(response), json=response.body)
+
+
+class AsyncFakeOpenAITransport(httpx.AsyncBaseTransport):
+    """Async counterpart of FakeOpenAITransport."""
+    
+    def __init__(self, backend: Optional[FakeOpenAIBackend] = None):
+        self.backend = backend or get_fake_backend()
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        response = _route(self.backend, request)
+        if response.delay:
+            await asyncio.sleep(response.delay)
+        if response.chunks is not None:
+            return httpx.Response(response.status, headers=_headers(response),
+                                  stream=_AsyncPacedStream(response.chunks))
+        return httpx.Response(response.status, headers=_headers(response), json=response.body)
@@ -0,0 +1,244 @@
+"""
+PlaidLibs™ Fake Redis Module
+Minimal local stand-in for a Redis server, for developing and testing the
+Redis session backend without installing Redis.
+
+Speaks RESP over TCP and implements the commands session_store.py uses
+(GET, SET with EX/PX, DEL, EXPIRE, TTL, and WATCH/MULTI/EXEC transactions),
+plus PING, AUTH, SELECT, EXISTS, DBSIZE, FLUSHDB, UNWATCH and DISCARD. Data lives in memory and is lost when the server stops.
+
+Usage:
+    python fake_redis.py --port 6379
+    PLAIDLIBS_STATE_BACKEND=redis://127.0.0.1:6379/0 streamlit run app.py
+"""
+
+import argparse
+import itertools
+import socketserver
+import threading
+import time
+from typing import Optional
+
+
+def _encode(value) -> bytes:
+    """RESP encoding of a reply value (str is a simple string, bytes a bulk string)."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisData:
+    """Keys, values and expiry times per database, shared by every connection."""
+    
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self._dbs: dict = {}  # db -> {key: (value, expires at or None)}
+        self._changes: dict = {}  # (db, key) -> serial of its last write, for WATCH
+        self._serial = itertools.count(1)
+        self._lock = threading.RLock()
+    
+    def _live(self, db: int, key: bytes):
+        """The (value, expires) entry for key, dropping it if expired (caller holds the lock)."""
+        entries = self._dbs.setdefault(db, {})
+        entry = entries.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del entries[key]
+            return None
+        return entry
+    
+    def _touch(self, db: int, *keys):
+        for key in keys:
+            self._changes[(db, key)] = next(self._serial)
+    
+    def watch(self, db: int, key: bytes) -> int:
+        """A marker that changes whenever key is written."""
+        with self._lock:
+            return self._changes.get((db, key), 0)
+    
+    def transaction(self, db: int, watched: dict, commands: list) -> Optional[list]:
+        """Run queued commands atomically; None if a watched key was written since WATCH."""
+        with self._lock:
+            if any(self._changes.get(key, 0) != marker for key, marker in watched.items()):
+                return None
+            return [self.execute(db, name, args) for name, args in commands]
+    
+    def execute(self, db: int, name: str, args: list):
+        """Run one data command against db; returns the reply value."""
+        with self._lock:
+            entries = self._dbs.setdefault(db, {})
+            if name == "GET":
+                entry = self._live(db, args[0])
+                return entry[0] if entry else None
+            if name == "SET":
+                key, value, expires = args[0], args[1], None
+                options = [a.upper() for a in args[2:]]
+                for i, option in enumerate(options):
+                    if option == b"EX":
+                        expires = time.time() + int(args[3 + i])
+                    elif option == b"PX":
+                        expires = time.time() + int(args[3 + i]) / 1000
+                if b"NX" in options and self._live(db, key):
+                    return None
+                entries[key] = (value, expires)
+                self._touch(db, key)
+                return "OK"
+            if name == "DEL":
+                self._touch(db, *args)
+                return sum(1 for key in args if self._live(db, key) and entries.pop(key))
+            if name == "EXISTS":
+                return sum(1 for key in args if self._live(db, key))
+            if name == "EXPIRE":
+                entry = self._live(db, args[0])
+                if not entry:
+                    return 0
+                entries[args[0]] = (entry[0], time.time() + int(args[1]))
+                self._touch(db, args[0])
+                return 1
+            if name == "TTL":
+                entry = self._live(db, args[0])
+                if not entry:
+                    return -2
+                return -1 if entry[1] is None else int(entry[1] - time.time())
+            if name == "DBSIZE":
+                return sum(1 for key in list(entries) if self._live(db, key))
+            if name == "FLUSHDB":
+                self._touch(db, *entries)
+                entries.clear()
+                return "OK"
+        return ValueError(f"unknown command '{name.lower()}'")
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    """One client connection: reads commands and writes replies until it closes."""
+    
+    def _read_command(self) -> Optional[list]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline command, as sent by telnet or redis-cli pings
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+    
+    def handle(self):
+        data: FakeRedisData = self.server.data
+        db = 0
+        authed = data.password is None
+        watched = {}  # (db, key) -> marker at WATCH
+        queued = None  # commands queued since MULTI
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            if not command:
+                continue
+            name, args = command[0].decode().upper(), command[1:]
+            if name == "QUIT":
+                self.wfile.write(_encode("OK"))
+                return
+            if name == "PING":
+                reply = args[0] if args else "PONG"
+            elif name == "AUTH":
+                authed = args[-1].decode() == data.password
+                reply = "OK" if authed else ValueError("invalid password")
+            elif not authed:
+                self.wfile.write(b"-NOAUTH Authentication required.\r\n")
+                continue
+            elif name == "SELECT":
+                db = int(args[0])
+                reply = "OK"
+            elif name == "WATCH":
+                watched.update({(db, key): data.watch(db, key) for key in args})
+                reply = "OK"
+            elif name in ("UNWATCH", "DISCARD"):
+                watched, queued = {}, None
+                reply = "OK"
+            elif name == "MULTI":
+                queued = []
+                reply = "OK"
+            elif name == "EXEC":
+                if queued is None:
+                    reply = ValueError("EXEC without MULTI")
+                else:
+                    reply = data.transaction(db, watched, queued)
+                    watched, queued = {}, None
+                    if reply is None:
+                        self.wfile.write(b"*-1\r\n")  # aborted: a null array
+                        continue
+            elif queued is not None:
+                queued.append((name, args))
+                reply = "QUEUED"
+            else:
+                try:
+                    reply = data.execute(db, name, args)
+                except (IndexError, ValueError):
+                    reply = ValueError(f"wrong arguments for '{name.lower()}' command")
+            self.wfile.write(_encode(reply))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """A threaded RESP server over one FakeRedisData."""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, password: Optional[str] = None):
+        super().__init__((host, port), _RESPHandler)
+        self.data = FakeRedisData(password)
+    
+    @property
+    def url(self) -> str:
+        """redis:// URL for PLAIDLIBS_STATE_BACKEND."""
+        host, port = self.server_address[:2]
+        auth = f":{self.data.password}@" if self.data.password else ""
+        return f"redis://{auth}{host}:{port}/0"
+
+
+def start_fake_redis(host: str = "127.0.0.1", port: int = 0, password: Optional[str] = None) -> FakeRedisServer:
+    """
+    Start a fake Redis server on a daemon thread.
+    
+    Args:
+        host: Interface to bind
+        port: Port to listen on (0 picks a free one; see server.url)
+        password: Require AUTH with this password
+    
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = FakeRedisServer(host, port, password)
+    threading.Thread(target=server.serve_forever, name="plaidlibs-fake-redis", daemon=True).start()
+    return server
+
+
+def main():
+    """Run the fake server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local stand-in for a Redis server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    
+    server = FakeRedisServer(args.host, args.port, args.password)
+    print(f"🧵 Fake Redis listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
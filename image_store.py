@@ -0,0 +1,171 @@
+"""
+PlaidLibs™ Image Store Module
+Content-addressed, size-bounded on-disk cache for generated images.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+# Where generated images are written (shared by every session on this host)
+DEFAULT_IMAGE_DIR = os.getenv(
+    "PLAIDLIBS_IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plaidlibs_cache", "images")
+)
+
+# Total bytes kept on disk before least-recently-used images are evicted
+DEFAULT_MAX_BYTES = int(float(os.getenv("PLAIDLIBS_IMAGE_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def image_key(prompt: str, **params) -> str:
+    """
+    Hash a prompt and its generation parameters into a store key.
+    
+    Args:
+        prompt: The image generation prompt
+        **params: Model, size, style, quality, etc.
+    
+    Returns:
+        Hex digest identifying the image
+    """
+    payload = json.dumps({"prompt": " ".join(prompt.split()), **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageStore:
+    """
+    Stores image bytes on disk under their content key.
+    
+    Reads refresh a file's modification time, so eviction by oldest mtime
+    drops the least recently used images first. Writes are atomic, so
+    several processes can share one directory.
+    """
+    
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        os.makedirs(self.root, exist_ok=True)
+    
+    def _paths(self, key: str) -> tuple:
+        """Image and metadata paths for a key, fanned out by prefix."""
+        directory = os.path.join(self.root, key[:2])
+        return os.path.join(directory, f"{key}.png"), os.path.join(directory, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a stored image.
+        
+        Returns:
+            Dictionary with 'path' and any stored metadata, or None on a miss
+        """
+        image_path, meta_path = self._paths(key)
+        try:
+            os.utime(image_path)
+        except FileNotFoundError:
+            return None
+        
+        metadata = {}
+        try:
+            with open(meta_path, "r") as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        return {**metadata, "path": image_path}
+    
+    def put(self, key: str, data: bytes, metadata: Optional[dict] = None) -> dict:
+        """
+        Store image bytes (and optional metadata) under a key.
+        
+        Returns:
+            Dictionary with 'path' and the stored metadata
+        """
+        image_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        metadata = metadata or {}
+        try:
+            replaced = os.stat(image_path).st_size  # a re-put only changes the total by the difference
+        except FileNotFoundError:
+            replaced = 0
+        
+        _atomic_write(meta_path, json.dumps(metadata).encode("utf-8"))
+        _atomic_write(image_path, data)
+        
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        
+        return {**metadata, "path": image_path}
+    
+    def _entries(self) -> list:
+        """(mtime, size, image path) for every stored image."""
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def _scan_size(self) -> int:
+        """Total bytes of stored images."""
+        return sum(size for _, size, _ in self._entries())
+    
+    def _evict(self):
+        """
+        Delete least recently used images until under 90% of max_bytes.
+        
+        The running total is only this process's estimate (other processes
+        share the directory), so the real size is measured from disk first
+        and nothing is deleted if it is still within max_bytes.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            self._size = total
+            return
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            for victim in (path, path[:-len(".png")] + ".json"):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self._size = total
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write to a temporary file and rename it into place."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+_shared_store: Optional[ImageStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Return the process-wide image store, creating it on first use."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = ImageStore()
+    return _shared_store
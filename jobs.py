@@ -0,0 +1,321 @@
+"""
+PlaidLibs™ Jobs Module
+Runs long generations on a worker pool so script runs never wait on them.
+"""
+
+import collections
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Tuple
+from scheduler import MAX_INFLIGHT
+
+# Worker threads running jobs for every session in this process. Defaults to
+# the scheduler's in-flight limit, so jobs wait on the scheduler's fair queue
+# rather than on a worker; 32 if that limit is disabled.
+JOB_WORKERS = int(os.getenv("PLAIDLIBS_JOB_WORKERS", str(MAX_INFLIGHT or 32)))
+
+# Seconds a finished job is kept for its session to pick up
+JOB_TTL = float(os.getenv("PLAIDLIBS_JOB_TTL", "3600"))
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# What a queued job is waiting for (see JobManager.queue_position)
+WAITING_LANE = "lane"
+WAITING_WORKER = "worker"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function once the job has been cancelled."""
+
+
+class Job:
+    """
+    One generation request: its status, the text streamed so far, and its outcome.
+    
+    The job function receives the Job and reports progress through write(),
+    stream(), set_step() and add_image(). Once the job is cancelled these
+    raise JobCancelled, which stops the function at its next chunk.
+    """
+    
+    def __init__(self, owner: str, label: str, fn: Callable[["Job"], object], lane: Optional[str] = None):
+        self.id = f"job_{uuid.uuid4().hex}"
+        self.owner = owner
+        self.label = label
+        self.lane = lane
+        self.status = QUEUED
+        self.step = ""
+        self.text = ""
+        self.images: list = []  # one per expected image: None while drawing, its URL, or "" if it failed
+        self.image_caption = "Image"
+        self.result = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._fn = fn
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        # Run in a copy of the submitting context so metrics keep the caller's mode and stage
+        self._context = contextvars.copy_context()
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        """Ask the job to stop; a queued job never starts."""
+        self._cancelled.set()
+    
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.id)
+    
+    def set_step(self, step: str):
+        """Describe what the job is doing now (shown next to its progress)."""
+        self.check()
+        with self._lock:
+            self.step = step
+    
+    def write(self, chunk: str):
+        """Append streamed text."""
+        self.check()
+        with self._lock:
+            self.text += chunk
+    
+    def expect_images(self, count: int, caption: str = "Image"):
+        """Announce count images, shown as placeholders until each is added."""
+        self.check()
+        with self._lock:
+            self.images = [None] * count
+            self.image_caption = caption
+    
+    def add_image(self, index: int, url: Optional[str]):
+        """Record a finished image (None if it could not be drawn)."""
+        self.check()
+        with self._lock:
+            self.images[index] = url or ""
+    
+    def stream(self, chunks: Iterable[str]) -> str:
+        """
+        Append every chunk as it arrives; returns the full text.
+        
+        chunks is closed before this returns or raises, so a generator that
+        cleans up when closed early (such as a stream cancelling its run) has
+        done so before the next job in the lane starts.
+        """
+        with self._lock:
+            self.text = ""
+        chunks = iter(chunks)
+        try:
+            for chunk in chunks:
+                self.write(chunk)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+        return self.text
+    
+    def snapshot(self) -> dict:
+        """Consistent copy of the job's public fields."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "owner": self.owner,
+                "label": self.label,
+                "status": self.status,
+                "step": self.step,
+                "text": self.text,
+                "images": list(self.images),
+                "image_caption": self.image_caption,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished_at": self.finished_at,
+            }
+    
+    def _run(self):
+        """Execute the job function and record its outcome (worker thread)."""
+        with self._lock:
+            if self._cancelled.is_set():
+                self.status = CANCELLED
+                self.finished_at = time.time()
+                return
+            self.status = RUNNING
+            self.started = time.time()
+        try:
+            result = self._context.run(self._fn, self)
+        except JobCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as e:
+            status, result, error = FAILED, None, str(e) or type(e).__name__
+        else:
+            status, error = (CANCELLED if self._cancelled.is_set() else DONE), None
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.status = status
+            self.finished_at = time.time()
+
+
+class JobManager:
+    """
+    Runs jobs on a shared worker pool and keeps them until they are picked up.
+    
+    Jobs given the same lane run one at a time, in submission order. Use a
+    lane for jobs that must not overlap, such as runs on one Assistants
+    thread; jobs without a lane start as soon as a worker is free.
+    
+    Finished jobs are forgotten TTL seconds after they end, swept by a daemon
+    thread so a process that stops taking new jobs still frees them.
+    """
+    
+    # Seconds between sweeps of expired jobs
+    PRUNE_INTERVAL = 60
+    
+    def __init__(self, workers: int = JOB_WORKERS, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="plaidlibs-job")
+        self._jobs: dict = {}
+        self._lanes: dict = {}
+        self._ready = collections.OrderedDict()  # job ID -> job handed to the pool, not yet started
+        self._lock = threading.Lock()
+        threading.Thread(target=self._prune_periodically, name="plaidlibs-job-pruner", daemon=True).start()
+    
+    def submit(self, owner: str, label: str, fn: Callable[[Job], object], lane: Optional[str] = None) -> Job:
+        """
+        Queue a job.
+        
+        Args:
+            owner: Session the job belongs to
+            label: Short description shown in the UI
+            fn: Called with the Job on a worker thread; its return value becomes job.result
+            lane: Jobs sharing a lane run one at a time, in order
+        
+        Returns:
+            The queued Job
+        """
+        job = Job(owner, label, fn, lane)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            if lane is not None:
+                waiting = self._lanes.setdefault(lane, collections.deque())
+                waiting.append(job)
+                if len(waiting) > 1:
+                    return job
+        self._start(job)
+        return job
+    
+    def _start(self, job: Job):
+        with self._lock:
+            self._ready[job.id] = job
+        self._executor.submit(self._execute, job)
+    
+    def _execute(self, job: Job):
+        with self._lock:
+            self._ready.pop(job.id, None)
+        try:
+            job._run()
+        finally:
+            if job.lane is not None:
+                self._advance(job.lane)
+    
+    def _advance(self, lane: str):
+        """Start the next job waiting in lane."""
+        with self._lock:
+            waiting = self._lanes.get(lane)
+            if waiting:
+                waiting.popleft()
+            if not waiting:
+                self._lanes.pop(lane, None)
+                return
+            next_job = waiting[0]
+        self._start(next_job)
+    
+    def _prune(self):
+        """Forget finished jobs older than the TTL (caller holds the lock)."""
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+    
+    def _prune_periodically(self):
+        """Daemon loop sweeping expired jobs between submissions."""
+        while True:
+            time.sleep(min(self.PRUNE_INTERVAL, max(1.0, self.ttl)))
+            with self._lock:
+                self._prune()
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this ID, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def for_owner(self, owner: str) -> list:
+        """Every job kept for a session, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.owner == owner]
+    
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job; returns False if it is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+    
+    def queue_position(self, job: Job) -> Optional[Tuple[str, int]]:
+        """
+        What a queued job is waiting for, and how many jobs are ahead of it.
+        
+        Returns:
+            (WAITING_LANE, earlier jobs in its lane still to finish),
+            (WAITING_WORKER, jobs ahead of it for a free worker),
+            or None once it has started
+        """
+        with self._lock:
+            if job.status != QUEUED:
+                return None
+            waiting = self._lanes.get(job.lane) if job.lane is not None else None
+            if waiting and waiting[0] is not job and job in waiting:
+                return WAITING_LANE, waiting.index(job)
+            if job.id in self._ready:
+                return WAITING_WORKER, list(self._ready).index(job.id)
+            return None
+    
+    def lane_busy(self, lane: str) -> bool:
+        """Whether any job is queued or running in lane."""
+        with self._lock:
+            return bool(self._lanes.get(lane))
+    
+    def pending(self) -> int:
+        """Jobs queued or running across all sessions."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
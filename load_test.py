@@ -0,0 +1,674 @@
+"""
+PlaidLibs™ Load Test
+Drives concurrent simulated users through full journeys against a running app.py.
+
+The load test starts `streamlit run app.py` in its own process against the
+local fake backend (fake_openai.py), the same way the app is served in
+production. Each virtual user is a simulated browser tab: it opens the
+app's websocket (/_stcore/stream) and speaks Streamlit's own protocol,
+sending widget interactions as BackMsgs and reading the page back from the
+ForwardMsgs, including fragment reruns and auto-reruns. It also fetches
+each image the page shows. Users loop through the journeys:
+
+    lib_ate    style, genre, absurdity (template), every input, YES (reveal + image)
+    storyline  premise, then every episode
+    plaidplay  setting (opening scene + image), then several choices
+    images     PlaidPic scenes and a PlaidMagGen comic (image bursts)
+
+Every step is timed per stage, including any background job it starts. The
+user keeps running the page's progress fragments, as a browser does, until
+the job's result has landed. The report shows throughput, p50/p95/p99 and
+errors per stage, and the CPU and memory of the server process alone; the
+simulated browsers run in this process and are not counted. Pass several
+--users values to step up the load and see where latency turns.
+
+Usage:
+    python load_test.py --users 5 10 20 --duration 120
+
+The fake backend's latency, token rate and error rate come from the
+PLAIDLIBS_FAKE_* variables; the account limits come from PLAIDLIBS_RPM,
+PLAIDLIBS_TPM and PLAIDLIBS_IPM, as in production. All of them are passed
+on to the server.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Optional
+
+from config import WORKFLOW_MODES
+
+try:
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    from websockets.sync.client import connect
+except ImportError as e:
+    raise SystemExit(f'load_test.py needs streamlit and websockets ({e}); pip install "websockets>=11"')
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Seconds one step may take before it counts as a failure
+STEP_TIMEOUT = 300
+
+# Seconds to wait for the server to answer its health check
+SERVER_START_TIMEOUT = 60
+
+PERCENTILES = (0.50, 0.95, 0.99)
+
+# Text of the Lib-Ate setup summary, shown once every input is in, and a bound on the inputs asked for
+LIB_ATE_REVIEW = "to reveal the story"
+MAX_LIB_ATE_INPUTS = 40
+
+# Widget value fields that differ between Streamlit releases
+CHAT_VALUE_FIELD = "chat_input_value" if "chat_input_value" in WidgetState.DESCRIPTOR.fields_by_name else "string_trigger_value"
+
+
+class JourneyError(Exception):
+    """A journey step raised, or the app showed an exception."""
+
+
+class LevelStopped(Exception):
+    """The load level ended while a journey was in progress."""
+
+
+class Stats:
+    """Thread-safe step timings and failures, by stage."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: dict = defaultdict(list)
+        self.errors: dict = defaultdict(int)
+        self.first_error: dict = {}
+        self.journeys: dict = defaultdict(int)
+    
+    def record(self, stage: str, seconds: float, error: Optional[BaseException] = None):
+        with self._lock:
+            self.timings[stage].append(seconds)
+            if error is not None:
+                self.errors[stage] += 1
+                self.first_error.setdefault(stage, f"{type(error).__name__}: {error}")
+    
+    def finish_journey(self, journey: str):
+        with self._lock:
+            self.journeys[journey] += 1
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of values (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+def free_port() -> int:
+    """A TCP port nothing is listening on right now."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    """
+    Start `streamlit run app.py` on port and wait until it is healthy.
+    
+    The server gets this process's environment, with the fake backend
+    switched on unless PLAIDLIBS_FAKE_OPENAI says otherwise. Its output goes
+    to a log file, named if the server fails to start.
+    
+    Raises:
+        SystemExit: If the server exits or stays unhealthy for SERVER_START_TIMEOUT seconds
+    """
+    env = {**os.environ, "PLAIDLIBS_FAKE_OPENAI": os.getenv("PLAIDLIBS_FAKE_OPENAI", "1")}
+    log = tempfile.NamedTemporaryFile(prefix="plaidlibs-load-server-", suffix=".log", delete=False)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true", "--server.port", str(port),
+         "--server.address", "127.0.0.1", "--browser.gatherUsageStats", "false"],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"streamlit exited with code {server.returncode}; see {log.name}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.read().strip() == b"ok":
+                    return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(server)
+    raise SystemExit(f"streamlit did not become healthy within {SERVER_START_TIMEOUT}s; see {log.name}")
+
+
+def stop_server(server: subprocess.Popen):
+    """Stop the server, killing it if it does not exit promptly."""
+    server.terminate()
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def _process_cpu_seconds(pid: int) -> Optional[float]:
+    """CPU time (user + system) used so far by process pid, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _process_rss_kb(pid: int) -> Optional[float]:
+    """Resident set size of process pid in KB, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples the server process's CPU use (% of one core) and RSS once per interval.
+    
+    Only the server's PID is read, so the simulated browsers in this process
+    are not counted. rss_baseline_kb (taken at start, after the warm-up
+    session) lets the report show growth under load. Needs /proc; elsewhere
+    no samples are taken and the report says so.
+    """
+    
+    def __init__(self, pid: int, interval: float = 1.0):
+        super().__init__(name="plaidlibs-load-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu: list = []
+        self.rss_kb: list = []
+        self.rss_baseline_kb = _process_rss_kb(pid)
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        last_cpu, last_wall = _process_cpu_seconds(self.pid), time.monotonic()
+        if last_cpu is None:
+            return
+        while not self._stop_event.wait(self.interval):
+            cpu, rss, wall = _process_cpu_seconds(self.pid), _process_rss_kb(self.pid), time.monotonic()
+            if cpu is None or rss is None:
+                return  # the server has exited
+            self.cpu.append(100.0 * (cpu - last_cpu) / max(wall - last_wall, 1e-9))
+            self.rss_kb.append(rss)
+            last_cpu, last_wall = cpu, wall
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# =============================================================================
+# SIMULATED BROWSER
+# =============================================================================
+
+class Browser:
+    """
+    One browser tab on the app, speaking Streamlit's websocket protocol.
+    
+    Keeps the page's current elements (by delta path), widget values and
+    URL query string the way the frontend does, so each rerun carries the
+    same client state a real tab would send. Widget IDs end with the
+    widget's key, so keyed widgets are found by key and the rest by label.
+    """
+    
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._exit_stack = contextlib.ExitStack()
+        self.ws = self._exit_stack.enter_context(connect(
+            f"{base_url.replace('http', 'ws', 1)}/_stcore/stream",
+            subprotocols=["streamlit"], max_size=None, open_timeout=STEP_TIMEOUT
+        ))
+        self.query_string = ""
+        self.page_script_hash = ""
+        self.elements: dict = {}  # delta path -> (Element, fragment_id)
+        self.widgets: dict = {}  # widget id -> WidgetState holding its value
+        self.auto_reruns: dict = {}  # fragment id -> seconds between reruns
+        self.fetched: set = set()
+    
+    def close(self):
+        self._exit_stack.close()
+    
+    # -- protocol ------------------------------------------------------------
+    
+    def run(self, fragment_id: str = "", triggers: tuple = (), auto: bool = False) -> bool:
+        """
+        Rerun the page (or one fragment) and read messages until the run finishes.
+        
+        Args:
+            fragment_id: Fragment to rerun, as the frontend does for widgets inside one
+            triggers: One-shot WidgetStates (button clicks, chat messages) for this run
+            auto: Whether this is a fragment's timed auto-rerun
+        
+        Returns:
+            Whether a full run of the page took place (a fragment may call st.rerun())
+        """
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = auto
+        state.widget_states.widgets.extend(list(self.widgets.values()) + list(triggers))
+        self.ws.send(msg.SerializeToString())
+        return self._read_run()
+    
+    def _read_run(self) -> bool:
+        """Apply ForwardMsgs until a run ends other than by starting another one."""
+        deadline = time.monotonic() + STEP_TIMEOUT
+        full_run, seen, fragments = False, set(), ()
+        while True:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise JourneyError(f"No reply from the server within {STEP_TIMEOUT}s")
+            msg = ForwardMsg()
+            msg.ParseFromString(self.ws.recv(timeout=timeout))
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = msg.new_session.page_script_hash
+                seen, fragments = set(), tuple(msg.new_session.fragment_ids_this_run)
+                if not fragments:
+                    full_run = True
+                    self.auto_reruns.clear()
+            elif kind == "delta":
+                path = tuple(msg.metadata.delta_path)
+                delta = msg.delta
+                if delta.WhichOneof("type") in ("new_element", "add_block"):
+                    element = delta.new_element if delta.HasField("new_element") else None
+                    self.elements[path] = (element, delta.fragment_id)
+                    seen.add(path)
+            elif kind == "page_info_changed":
+                self.query_string = msg.page_info_changed.query_string
+            elif kind == "auto_rerun":
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "script_finished":
+                status = msg.script_finished
+                if status == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise JourneyError("app.py failed to compile")
+                self._drop_stale(seen, fragments)
+                self._fetch_media()
+                return full_run
+    
+    def _drop_stale(self, seen: set, fragments: tuple):
+        """Forget elements the finished run did not redraw, and values of widgets now gone."""
+        self.elements = {
+            path: entry for path, entry in self.elements.items()
+            if path in seen or (fragments and entry[1] not in fragments)
+        }
+        live = {self._widget_id(element) for element, _ in self.elements.values()}
+        self.widgets = {wid: state for wid, state in self.widgets.items() if wid in live}
+    
+    def _fetch_media(self):
+        """Load the images on the page that this tab has not loaded yet."""
+        for element, _ in self.elements.values():
+            if element is None or element.WhichOneof("type") != "imgs":
+                continue
+            for image in element.imgs.imgs:
+                if image.url.startswith("/") and image.url not in self.fetched:
+                    with urllib.request.urlopen(self.base_url + image.url, timeout=STEP_TIMEOUT) as response:
+                        response.read()
+                    self.fetched.add(image.url)
+    
+    @staticmethod
+    def _widget_id(element) -> Optional[str]:
+        if element is None:
+            return None
+        return getattr(getattr(element, element.WhichOneof("type")), "id", None)
+    
+    # -- page ----------------------------------------------------------------
+    
+    def find(self, kind: str, key: str = None, label: str = None):
+        """The first element of kind (an Element field name) with key, or whose label starts with label."""
+        for element, fragment_id in self.elements.values():
+            if element is None or element.WhichOneof("type") != kind:
+                continue
+            widget = getattr(element, kind)
+            if key is not None and widget.id.endswith(f"-{key}"):
+                return widget, fragment_id
+            if label is not None and widget.label.startswith(label):
+                return widget, fragment_id
+        raise JourneyError(f"No {kind} with {'key ' + repr(key) if key else 'label ' + repr(label)}")
+    
+    def has_button(self, key_prefix: str = None, label: str = None) -> bool:
+        """Whether a button whose key starts with key_prefix, or whose label starts with label, is on the page."""
+        return any(
+            element is not None and element.WhichOneof("type") == "button" and (
+                (key_prefix is not None and f"-{key_prefix}" in element.button.id)
+                or (label is not None and element.button.label.startswith(label))
+            )
+            for element, _ in self.elements.values()
+        )
+    
+    def page_contains(self, text: str) -> bool:
+        """Whether any markdown on the page contains text."""
+        return any(
+            element is not None and element.WhichOneof("type") == "markdown" and text in element.markdown.body
+            for element, _ in self.elements.values()
+        )
+    
+    def check(self):
+        """Raise JourneyError if the page shows an exception or a failed job."""
+        for element, _ in self.elements.values():
+            kind = element.WhichOneof("type") if element is not None else None
+            if kind == "exception":
+                raise JourneyError(element.exception.message)
+            if kind == "alert" and element.alert.body.startswith("Oops!") and self.has_button("retry_"):
+                raise JourneyError(element.alert.body)
+    
+    def click(self, label: str = None, key: str = None):
+        """Click a button, rerunning its fragment (or the page)."""
+        button, fragment_id = self.find("button", key=key, label=label)
+        self.run(fragment_id, triggers=(WidgetState(id=button.id, trigger_value=True),))
+    
+    def type(self, text: str, key: str = None, label: str = None, kind: str = "text_area"):
+        """Enter text in a text box without rerunning, like typing before pressing a button."""
+        widget, _ = self.find(kind, key=key, label=label)
+        self.widgets[widget.id] = WidgetState(id=widget.id, string_value=text)
+    
+    def chat(self, key: str, text: str):
+        """Send a chat message."""
+        widget, fragment_id = self.find("chat_input", key=key)
+        trigger = WidgetState(id=widget.id)
+        getattr(trigger, CHAT_VALUE_FIELD).data = text
+        self.run(fragment_id, triggers=(trigger,))
+    
+    def select(self, key: str, option: str):
+        """Pick the option of a select box whose text contains option."""
+        widget, fragment_id = self.find("selectbox", key=key)
+        index = next((i for i, text in enumerate(widget.options) if option in text), None)
+        if index is None:
+            raise JourneyError(f"No option {option!r} in select box {key!r}")
+        state = WidgetState(id=widget.id)
+        if "raw_value" in type(widget).DESCRIPTOR.fields_by_name:
+            state.string_value = widget.options[index]
+        else:
+            state.int_value = index
+        self.widgets[widget.id] = state
+        self.run(fragment_id)
+    
+    def wait_for_jobs(self):
+        """Run the page's auto-rerun fragments, as the browser does, while a job's progress is shown."""
+        deadline = time.monotonic() + STEP_TIMEOUT
+        while self.has_button("cancel_"):
+            self.check()
+            if time.monotonic() > deadline:
+                raise JourneyError(f"Jobs still running after {STEP_TIMEOUT}s")
+            time.sleep(min(self.auto_reruns.values(), default=1.0))
+            for fragment_id in list(self.auto_reruns):
+                if self.run(fragment_id, auto=True):
+                    break  # a finished job reran the whole page, which registers its fragments anew
+        self.check()
+
+
+# =============================================================================
+# VIRTUAL USERS
+# =============================================================================
+
+class VirtualUser:
+    """One user opening browser tabs and working through journeys until told to stop."""
+    
+    def __init__(self, index: int, base_url: str, journeys: list, stats: Stats, stop: threading.Event,
+                 think_time: float):
+        self.index = index
+        self.base_url = base_url
+        self.journeys = journeys
+        self.stats = stats
+        self.stop = stop
+        self.think_time = think_time
+        self.browser = None
+    
+    def step(self, stage: str, action):
+        """Run one interaction, timing it under stage until its background jobs have landed."""
+        if self.stop.is_set():
+            raise LevelStopped
+        started = time.monotonic()
+        try:
+            action()
+            self.browser.wait_for_jobs()
+        except Exception as e:
+            self.stats.record(stage, time.monotonic() - started, error=e)
+            raise
+        self.stats.record(stage, time.monotonic() - started)
+        if self.think_time:
+            time.sleep(self.think_time)
+    
+    def open(self, journey: str, mode: str):
+        """Open a fresh tab and switch it to mode, timed as journey/open."""
+        if self.browser is not None:
+            self.browser.close()
+        self.browser = Browser(self.base_url)
+        
+        def load():
+            self.browser.run()
+            self.browser.select("mode_selector", WORKFLOW_MODES[mode]["name"])
+        
+        self.step(f"{journey}/open", load)
+    
+    # -- journeys ------------------------------------------------------------
+    
+    def lib_ate(self):
+        self.open("lib_ate", "lib_ate")
+        self.step("lib_ate/style", lambda: self.browser.chat("lib_ate_chat", "1"))
+        self.step("lib_ate/genre", lambda: self.browser.chat("lib_ate_chat", "1"))
+        self.step("lib_ate/absurdity", lambda: self.browser.chat("lib_ate_chat", "2"))
+        # One word per template input, until the setup summary asks for YES
+        for _ in range(MAX_LIB_ATE_INPUTS):
+            if self.browser.page_contains(LIB_ATE_REVIEW):
+                break
+            self.step("lib_ate/input", lambda: self.browser.chat("lib_ate_chat", "llama"))
+        if not self.browser.page_contains(LIB_ATE_REVIEW):
+            raise JourneyError(f"Lib-Ate asked for more than {MAX_LIB_ATE_INPUTS} inputs")
+        self.step("lib_ate/reveal", lambda: self.browser.chat("lib_ate_chat", "YES"))
+    
+    def storyline(self):
+        self.open("storyline", "storyline")
+        
+        def begin():
+            self.browser.type(
+                "A plaid-wearing llama must recover the stolen recipe for the world's last marmalade.",
+                key="storyline_premise_input"
+            )
+            self.browser.click("🎬 Begin Story")
+        
+        self.step("storyline/episode", begin)
+        while self.browser.has_button(label="📖 Generate Episode"):
+            self.step("storyline/episode", lambda: self.browser.click("📖 Generate Episode"))
+    
+    def plaidplay(self, choices: int = 4):
+        self.open("plaidplay", "plaid_play")
+        self.step("plaidplay/scene", lambda: self.browser.click("🏰 Fantasy Kingdom"))
+        for turn in range(choices):
+            def choose(turn=turn):
+                self.browser.type(str(turn % 3 + 1), key="plaidplay_choice_input", kind="text_input")
+                self.browser.click("▶ Make Choice")
+            self.step("plaidplay/scene", choose)
+    
+    def images(self):
+        self.open("plaidpic", "plaid_pic")
+        
+        def scenes():
+            self.browser.type(
+                "The tartan knight rode a giant teacup across a sea of custard to rescue a bagpipe.",
+                key="plaidpic_story_input"
+            )
+            self.browser.click("Comic/Cartoon")
+            self.browser.click("🎨 Generate Visual Prompts")
+        
+        self.step("plaidpic/burst", scenes)
+        
+        self.open("maggen", "plaid_mag_gen")
+        
+        def comic():
+            self.browser.type("A superhero whose only power is making perfect toast.", label="Comic Concept")
+            self.browser.click("📰 Generate Comic")
+        
+        self.step("maggen/burst", comic)
+    
+    def run(self):
+        """Loop over the journeys, starting at this user's offset, until stopped."""
+        offset = self.index % len(self.journeys)
+        try:
+            for journey in itertools.islice(itertools.cycle(self.journeys), offset, None):
+                if self.stop.is_set():
+                    return
+                try:
+                    getattr(self, journey)()
+                except LevelStopped:
+                    return
+                except Exception:
+                    continue  # already counted against its stage; start the next journey
+                self.stats.finish_journey(journey)
+        finally:
+            if self.browser is not None:
+                self.browser.close()
+
+
+JOURNEYS = ("lib_ate", "storyline", "plaidplay", "images")
+
+
+def _avg_max(samples: list) -> dict:
+    """Average and maximum of samples, rounded (zeros when empty)."""
+    return {"avg": round(sum(samples) / len(samples), 1) if samples else 0.0,
+            "max": round(max(samples, default=0.0), 1)}
+
+
+def run_level(base_url: str, pid: int, users: int, duration: float, journeys: list, ramp: float,
+              think_time: float) -> dict:
+    """
+    Run users virtual users against the server for duration seconds.
+    
+    Returns:
+        Summary with throughput, per-stage latency percentiles and the server's resource use
+    """
+    stats = Stats()
+    stop = threading.Event()
+    sampler = ResourceSampler(pid)
+    sampler.start()
+    
+    threads = []
+    started = time.monotonic()
+    for index in range(users):
+        user = VirtualUser(index, base_url, journeys, stats, stop, think_time)
+        thread = threading.Thread(target=user.run, name=f"plaidlibs-user-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+        if ramp and users > 1:
+            time.sleep(ramp / users)
+    
+    time.sleep(max(0.0, duration - (time.monotonic() - started)))
+    stop.set()
+    for thread in threads:
+        thread.join(STEP_TIMEOUT)
+    elapsed = time.monotonic() - started
+    sampler.stop()
+    
+    stages = {}
+    for stage, timings in sorted(stats.timings.items()):
+        stages[stage] = {
+            "count": len(timings),
+            "errors": stats.errors.get(stage, 0),
+            **{f"p{int(q * 100)}": round(percentile(timings, q), 3) for q in PERCENTILES},
+        }
+    steps = sum(len(t) for t in stats.timings.values())
+    baseline_kb = sampler.rss_baseline_kb or 0.0
+    return {
+        "users": users,
+        "seconds": round(elapsed, 1),
+        "journeys": dict(stats.journeys),
+        "journeys_per_min": round(60.0 * sum(stats.journeys.values()) / elapsed, 2),
+        "steps_per_sec": round(steps / elapsed, 2),
+        "errors": sum(stats.errors.values()),
+        "first_errors": dict(stats.first_error),
+        "stages": stages,
+        "sampled": bool(sampler.cpu),
+        "cpu_percent": _avg_max(sampler.cpu),
+        "rss_mb": {**_avg_max([kb / 1024 for kb in sampler.rss_kb]),
+                   "growth": round(max(sampler.rss_kb, default=baseline_kb) / 1024 - baseline_kb / 1024, 1)},
+    }
+
+
+def print_level(summary: dict):
+    """Print one load level's report."""
+    print(f"\n👥 {summary['users']} user(s), {summary['seconds']}s")
+    print(f"   {summary['journeys_per_min']} journeys/min, {summary['steps_per_sec']} steps/s, "
+          f"{summary['errors']} error(s)")
+    if summary["sampled"]:
+        cpu, rss = summary["cpu_percent"], summary["rss_mb"]
+        print(f"   Server CPU avg {cpu['avg']}% max {cpu['max']}% (of one core)")
+        print(f"   Server RSS avg {rss['avg']} MB max {rss['max']} MB (+{rss['growth']} MB under load)")
+    else:
+        print("   Server CPU and memory not sampled (needs /proc)")
+    print(f"   {'stage':<20} {'count':>6} {'err':>4} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for stage, row in summary["stages"].items():
+        print(f"   {stage:<20} {row['count']:>6} {row['errors']:>4} "
+              f"{row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f}")
+    for stage, message in summary["first_errors"].items():
+        print(f"   ❌ {stage}: {message[:200]}")
+
+
+def main():
+    """Start the server, run each requested load level and print (and optionally save) the reports."""
+    parser = argparse.ArgumentParser(description="Load-test app.py with simulated users")
+    parser.add_argument("--users", nargs="+", type=int, default=[5], help="concurrent users per level")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per level")
+    parser.add_argument("--journeys", nargs="+", choices=JOURNEYS, default=list(JOURNEYS))
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause after each step, in seconds")
+    parser.add_argument("--port", type=int, help="port for the server (default: any free port)")
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args()
+    
+    print("\n🧵 PlaidLibs™ Load Test")
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(port)
+    try:
+        # Warm-up: the first session imports the app's modules and fills its caches
+        browser = Browser(base_url)
+        browser.run()
+        browser.close()
+        print(f"   Server PID {server.pid} on {base_url}")
+        
+        reports = []
+        for users in args.users:
+            summary = run_level(base_url, server.pid, users, args.duration, args.journeys, args.ramp,
+                                args.think_time)
+            print_level(summary)
+            reports.append(summary)
+    finally:
+        stop_server(server)
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n✅ Reports written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
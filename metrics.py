@@ -0,0 +1,336 @@
+"""
+PlaidLibs™ Metrics Module
+Latency, token usage and cost counters, exported in Prometheus text format.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+# Serve /metrics on this port when set
+METRICS_PORT = os.getenv("PLAIDLIBS_METRICS_PORT")
+
+# Rewrite this file with the current metrics every METRICS_INTERVAL seconds when set
+METRICS_FILE = os.getenv("PLAIDLIBS_METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("PLAIDLIBS_METRICS_INTERVAL", "15"))
+
+# Latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+# Bucket bounds for session store operations, which take milliseconds rather than seconds
+STORE_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Estimated USD per 1M tokens: (prompt, completion). Cached prompt tokens bill at half the prompt rate.
+TOKEN_PRICES = {
+    "gpt-4-turbo-preview": (10.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+# Estimated USD per image: (model, quality, size)
+IMAGE_PRICES = {
+    ("dall-e-3", "standard", "1024x1024"): 0.04,
+    ("dall-e-3", "standard", "1792x1024"): 0.08,
+    ("dall-e-3", "standard", "1024x1792"): 0.08,
+    ("dall-e-3", "hd", "1024x1024"): 0.08,
+    ("dall-e-3", "hd", "1792x1024"): 0.12,
+    ("dall-e-3", "hd", "1024x1792"): 0.12,
+}
+
+# Workflow labels for calls made from the current script run (or task/thread it was copied into)
+_mode: contextvars.ContextVar = contextvars.ContextVar("plaidlibs_mode", default="none")
+_stage: contextvars.ContextVar = contextvars.ContextVar("plaidlibs_stage", default="none")
+
+
+def set_labels(mode: Optional[str] = None, stage: Optional[str] = None):
+    """Label every call made from this context with a workflow mode and stage."""
+    if mode is not None:
+        _mode.set(mode)
+    if stage is not None:
+        _stage.set(stage)
+
+
+def current_labels() -> dict:
+    """The mode and stage labels of the current context."""
+    return {"mode": _mode.get(), "stage": _stage.get()}
+
+
+def _price_for(model: str) -> Optional[tuple]:
+    """Token prices for a model, matching dated snapshots by prefix."""
+    if model in TOKEN_PRICES:
+        return TOKEN_PRICES[model]
+    for name in sorted(TOKEN_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            return TOKEN_PRICES[name]
+    return None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimated USD cost of one call's token usage (0 for unknown models)."""
+    prices = _price_for(model or "")
+    if not prices:
+        return 0.0
+    prompt_price, completion_price = prices
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * prompt_price + cached_tokens * prompt_price / 2
+            + completion_tokens * completion_price) / 1_000_000
+
+
+def _format_labels(labels: tuple) -> str:
+    """Render sorted (name, value) pairs as a Prometheus label set."""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    """Monotonic counter with one value per label set."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: dict = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels):
+        """Add amount to the series for these labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def samples(self) -> list:
+        """(name suffix, labels, value) for every series."""
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one set of buckets per label set."""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: dict = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        """Record one observation."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def samples(self) -> list:
+        """(name suffix, labels, value) for every bucket, sum and count."""
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series["counts"]):
+                    out.append(("_bucket", key + (("le", repr(bound)),), count))
+                out.append(("_bucket", key + (("le", "+Inf"),), series["count"]))
+                out.append(("_sum", key, series["sum"]))
+                out.append(("_count", key, series["count"]))
+        return out
+
+
+API_CALLS = Counter("plaidlibs_api_calls_total", "OpenAI-backed calls by type, mode, stage and outcome")
+API_LATENCY = Histogram("plaidlibs_api_latency_seconds", "Wall time of OpenAI-backed calls")
+FIRST_TOKEN_LATENCY = Histogram("plaidlibs_first_token_seconds", "Time until the first streamed chunk")
+TOKENS = Counter("plaidlibs_tokens_total", "Tokens used, by kind (prompt, completion, cached)")
+IMAGES = Counter("plaidlibs_images_total", "Images served, by whether they came from the local store")
+COST = Counter("plaidlibs_estimated_cost_usd_total", "Estimated spend from list prices")
+STORE_OPS = Counter("plaidlibs_session_store_ops_total", "Session store reads and writes by operation and outcome")
+STORE_LATENCY = Histogram("plaidlibs_session_store_latency_seconds", "Wall time of session store reads and writes",
+                          buckets=STORE_LATENCY_BUCKETS)
+
+ALL_METRICS = (API_CALLS, API_LATENCY, FIRST_TOKEN_LATENCY, TOKENS, IMAGES, COST, STORE_OPS, STORE_LATENCY)
+
+
+class CallRecord:
+    """Labels and timing of one call; see track()."""
+    
+    def __init__(self, call: str):
+        self.labels = {"call": call, **current_labels()}
+        self.started = time.monotonic()
+        self.outcome = "ok"
+        self._first_token = False
+    
+    def first_token(self):
+        """Mark the first streamed chunk (only the first call counts)."""
+        if not self._first_token:
+            self._first_token = True
+            FIRST_TOKEN_LATENCY.observe(time.monotonic() - self.started, **self.labels)
+    
+    def finish(self):
+        """Record the call's latency and outcome."""
+        API_LATENCY.observe(time.monotonic() - self.started, **self.labels)
+        API_CALLS.inc(outcome=self.outcome, **self.labels)
+
+
+@contextmanager
+def track(call: str) -> Iterator[CallRecord]:
+    """
+    Time a call and count it under the mode and stage current at its start.
+    
+    Set record.outcome inside the block for results that are not exceptions
+    (e.g. "timeout" or "failed"); exceptions are counted as "error".
+    """
+    record = CallRecord(call)
+    try:
+        yield record
+    except GeneratorExit:
+        record.outcome = "abandoned"
+        raise
+    except BaseException:
+        record.outcome = "error"
+        raise
+    finally:
+        record.finish()
+
+
+@contextmanager
+def track_store(op: str) -> Iterator[None]:
+    """
+    Time a session store operation ("save" or "load") and count it by outcome.
+    
+    Kept apart from track(), so snapshot traffic does not show up as OpenAI calls.
+    """
+    started = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        STORE_LATENCY.observe(time.monotonic() - started, op=op)
+        STORE_OPS.inc(op=op, outcome=outcome)
+
+
+def record_usage(call: str, model: str, usage) -> float:
+    """
+    Count one response's token usage and estimated cost.
+    
+    Args:
+        call: Call type label
+        model: Model that served the call
+        usage: The API's usage object (run.usage or completion.usage); None is ignored
+    
+    Returns:
+        Estimated cost in USD
+    """
+    if usage is None:
+        return 0.0
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    
+    labels = {"call": call, "model": model or "unknown", **current_labels()}
+    TOKENS.inc(prompt, kind="prompt", **labels)
+    TOKENS.inc(completion, kind="completion", **labels)
+    TOKENS.inc(cached, kind="cached", **labels)
+    cost = estimate_cost(model, prompt, completion, cached)
+    COST.inc(cost, **labels)
+    return cost
+
+
+def record_image(model: str, size: str, quality: str, cached: bool):
+    """Count one image, and its estimated cost when it was generated rather than cached."""
+    labels = {"call": "generate_image", "model": model, **current_labels()}
+    IMAGES.inc(size=size, quality=quality, cached=str(cached).lower(), **labels)
+    if not cached:
+        COST.inc(IMAGE_PRICES.get((model, quality, size), 0.0), **labels)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """Write the current metrics to path, atomically replacing any previous file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves render_prometheus() at /metrics."""
+    
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="plaidlibs-metrics", daemon=True).start()
+    return server
+
+
+def _write_periodically(path: str, interval: float):
+    """Daemon loop behind PLAIDLIBS_METRICS_FILE."""
+    while True:
+        time.sleep(interval)
+        try:
+            write_prometheus(path)
+        except OSError:
+            pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Start the endpoint and/or file exporter configured by environment (once per process)."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT), os.getenv("PLAIDLIBS_METRICS_HOST", "127.0.0.1"))
+    if METRICS_FILE:
+        threading.Thread(
+            target=_write_periodically, args=(METRICS_FILE, METRICS_INTERVAL),
+            name="plaidlibs-metrics-file", daemon=True
+        ).start()
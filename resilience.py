@@ -0,0 +1,425 @@
+"""
+PlaidLibs™ Resilience Module
+Retries with backoff, and hedged requests, for transient OpenAI failures.
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional, TypeVar
+import httpx
+import openai
+
+T = TypeVar("T")
+
+# Attempts per call, including the first (1 disables retries)
+MAX_ATTEMPTS = int(os.getenv("PLAIDLIBS_MAX_ATTEMPTS", "4"))
+
+# Exponential backoff bounds, in seconds (full jitter is applied)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+
+# Send a duplicate of a short interactive prompt once it runs past its p95 latency
+HEDGING_ENABLED = os.getenv("PLAIDLIBS_HEDGE", "1") != "0"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+
+HTTP_RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+RUN_RETRYABLE_CODES = {"rate_limit_exceeded", "server_error"}
+
+# Hedges (never the primary attempt, which runs on the caller's thread) run here;
+# a hedge that comes due while all workers are busy is skipped
+HEDGE_WORKERS = int(os.getenv("PLAIDLIBS_HEDGE_WORKERS", "8"))
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="plaidlibs-hedge")
+
+
+class RunFailedError(Exception):
+    """An assistant run ended 'failed'; carries the run so callers can report it."""
+    
+    def __init__(self, run):
+        self.run = run
+        self.code = run.last_error.code if run.last_error else None
+        super().__init__(run.last_error.message if run.last_error else "Unknown error")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an error is transient and the call is worth repeating.
+    
+    Rate limits (but not exhausted quota), server errors, timeouts, dropped
+    connections and runs that failed with a rate-limit or server error are
+    retryable. Bad requests, auth errors and content refusals are not.
+    """
+    if isinstance(error, RunFailedError):
+        return error.code in RUN_RETRYABLE_CODES
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False
+        return error.status_code in HTTP_RETRYABLE_STATUSES
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Server-requested delay from Retry-After / retry-after-ms headers, in seconds."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                when = email.utils.parsedate_to_datetime(value)
+                return max(when.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """
+    Seconds to wait before retry number attempt (0-based).
+    
+    Honors a server-sent Retry-After (capped at BACKOFF_MAX); otherwise uses
+    exponential backoff with full jitter so clients do not retry in lockstep.
+    """
+    requested = retry_after(error) if error is not None else None
+    if requested is not None:
+        return min(requested, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def call_with_retry(fn: Callable[[], T], attempts: int = MAX_ATTEMPTS) -> T:
+    """
+    Call fn, retrying transient failures with backoff.
+    
+    Args:
+        fn: Zero-argument callable making one attempt
+        attempts: Maximum attempts, including the first
+    
+    Returns:
+        The first successful result; the last error is raised if all fail
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, e))
+
+
+async def async_call_with_retry(fn: Callable, attempts: int = MAX_ATTEMPTS):
+    """Async variant of call_with_retry; fn returns an awaitable."""
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, e))
+
+
+def retry_stream(open_stream: Callable[[], Iterator[T]], attempts: int = MAX_ATTEMPTS) -> Iterator[T]:
+    """
+    Iterate a stream, reopening it on transient failures before its first item.
+    
+    Once anything has been yielded the caller has shown it, so later
+    failures are raised rather than replayed.
+    
+    Args:
+        open_stream: Zero-argument callable returning a fresh iterator
+        attempts: Maximum attempts, including the first
+    
+    Yields:
+        Items of the first stream that gets going
+    """
+    for attempt in range(attempts):
+        emitted = False
+        stream = None
+        try:
+            stream = open_stream()
+            for item in stream:
+                emitted = True
+                yield item
+            return
+        except Exception as e:
+            if emitted or attempt == attempts - 1 or not is_retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, e))
+        finally:
+            # Close now rather than at garbage collection, so the stream's cleanup runs before we return
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+
+async def async_retry_stream(open_stream: Callable[[], AsyncIterator],
+                             attempts: int = MAX_ATTEMPTS) -> AsyncIterator:
+    """Async variant of retry_stream; open_stream returns an async iterator."""
+    for attempt in range(attempts):
+        emitted = False
+        stream = None
+        try:
+            stream = open_stream()
+            async for item in stream:
+                emitted = True
+                yield item
+            return
+        except Exception as e:
+            if emitted or attempt == attempts - 1 or not is_retryable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, e))
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose:
+                await aclose()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call durations."""
+    
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        """Add one duration."""
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th quantile of the window, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+_trackers: dict = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    """Return the process-wide tracker for one kind of call."""
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+class HedgeCancelled(Exception):
+    """Raised inside an attempt of a hedged call once the other attempt has won."""
+
+
+class HedgeAttempt:
+    """
+    One attempt of a hedged call, handed to the attempt function.
+    
+    The attempt calls sent() once it has been admitted and is about to make
+    its request. Latency is timed from there, so time spent queued for
+    admission is not counted, and the hedge's clock starts there too. A
+    streaming attempt calls check() between chunks; both raise
+    HedgeCancelled once the other attempt has won, so the loser stops.
+    """
+    
+    def __init__(self, on_sent: Optional[Callable[[], None]] = None):
+        self.cancelled = threading.Event()
+        self.sent_at: Optional[float] = None
+        self._on_sent = on_sent
+    
+    def sent(self):
+        """Mark the request as about to go out; raises HedgeCancelled if it is no longer needed."""
+        self.check()
+        self.sent_at = time.monotonic()
+        if self._on_sent:
+            self._on_sent()
+    
+    def check(self):
+        """Raise HedgeCancelled if the other attempt has won."""
+        if self.cancelled.is_set():
+            raise HedgeCancelled()
+    
+    def elapsed(self) -> Optional[float]:
+        """Seconds since sent(), or None if the attempt never got that far."""
+        return time.monotonic() - self.sent_at if self.sent_at is not None else None
+
+
+class _Deadlines:
+    """One daemon thread calling functions at their deadlines, so a pending hedge costs no thread."""
+    
+    def __init__(self):
+        self._heap: list = []
+        self._cond = threading.Condition()
+        self._order = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+    
+    def call_later(self, delay: float, fn: Callable[[], None]):
+        """Call fn on the deadline thread after delay seconds."""
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._order), fn))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="plaidlibs-hedge-timer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, fn = heapq.heappop(self._heap)
+            try:
+                fn()
+            except Exception:
+                pass  # a hedge that could not be sent leaves the primary to finish alone
+
+
+_deadlines = _Deadlines()
+_hedges_in_flight = 0
+_hedges_lock = threading.Lock()
+
+
+def _record(tracker: LatencyTracker, attempt: HedgeAttempt):
+    """Record a successful attempt's latency, measured from when it was sent."""
+    elapsed = attempt.elapsed()
+    if elapsed is not None:
+        tracker.record(elapsed)
+
+
+def _run_hedge(fn: Callable[[HedgeAttempt], T], hedge: HedgeAttempt, tracker: LatencyTracker,
+               primary: HedgeAttempt, outcome: Future):
+    """Run the hedge on a pool thread; if it succeeds, hand over its result and cancel the primary."""
+    global _hedges_in_flight
+    try:
+        result = fn(hedge)
+    except BaseException as e:
+        outcome.set_exception(e)
+    else:
+        _record(tracker, hedge)
+        outcome.set_result(result)
+        primary.cancelled.set()
+    finally:
+        with _hedges_lock:
+            _hedges_in_flight -= 1
+
+
+def hedged_call(fn: Callable[[HedgeAttempt], T], tracker: LatencyTracker,
+                can_hedge: Callable[[], bool] = lambda: True) -> T:
+    """
+    Call fn on this thread, sending a duplicate if it runs past the tracker's p95 latency.
+    
+    The duplicate (the hedge) runs on the hedge pool, and is skipped when
+    the pool is busy or can_hedge() says no (for example while interactive
+    calls are queued for admission, where another request would only add to
+    the queue). Whichever attempt succeeds first wins and the other is
+    cancelled: a hedge still waiting for admission is never sent, and a
+    streaming attempt stops at its next chunk. Until the tracker has enough
+    samples this is a plain call.
+    
+    Args:
+        fn: Side-effect-free callable making one attempt; it receives the
+            HedgeAttempt and calls its sent() once admitted
+        tracker: Latency history for this kind of call
+        can_hedge: Checked when the hedge is due
+    
+    Returns:
+        The first successful result; if every attempt fails, the primary's error
+    """
+    delay = tracker.percentile(HEDGE_PERCENTILE)
+    lock = threading.Lock()
+    hedge, outcome = HedgeAttempt(), Future()
+    launched = primary_done = False
+    context = contextvars.copy_context()
+    
+    def launch():
+        nonlocal launched
+        global _hedges_in_flight
+        with lock:
+            if primary_done or not can_hedge():
+                return
+            with _hedges_lock:
+                if _hedges_in_flight >= HEDGE_WORKERS:
+                    return
+                _hedges_in_flight += 1
+            launched = True
+        _hedge_executor.submit(context.run, _run_hedge, fn, hedge, tracker, primary, outcome)
+    
+    primary = HedgeAttempt(on_sent=None if delay is None else lambda: _deadlines.call_later(delay, launch))
+    try:
+        result = fn(primary)
+    except HedgeCancelled:
+        return outcome.result()  # the hedge won
+    except Exception:
+        with lock:
+            primary_done = True
+        if launched and outcome.exception() is None:
+            return outcome.result()
+        raise
+    
+    with lock:
+        primary_done = True
+    _record(tracker, primary)
+    hedge.cancelled.set()
+    return result
+
+
+async def async_hedged_call(fn: Callable, tracker: LatencyTracker, can_hedge: Callable[[], bool] = lambda: True):
+    """
+    Async variant of hedged_call; fn returns an awaitable and the losing attempt is cancelled outright.
+    
+    Both attempts run as tasks on this loop, so no pool is involved.
+    """
+    delay = tracker.percentile(HEDGE_PERCENTILE)
+    sent = asyncio.Event()
+    primary_attempt = HedgeAttempt(on_sent=sent.set)
+    
+    async def timed(attempt: HedgeAttempt):
+        result = await fn(attempt)
+        _record(tracker, attempt)
+        return result
+    
+    primary = asyncio.ensure_future(timed(primary_attempt))
+    if delay is None:
+        return await primary
+    
+    pending = {primary}
+    try:
+        # The hedge's clock starts once the primary has been admitted and sent
+        sent_waiter = asyncio.ensure_future(sent.wait())
+        pending.add(sent_waiter)
+        await asyncio.wait({primary, sent_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        pending.discard(sent_waiter)
+        sent_waiter.cancel()
+        if not primary.done():
+            await asyncio.wait({primary}, timeout=delay)
+        if primary.done() or not can_hedge():
+            return await primary
+        
+        pending.add(asyncio.ensure_future(timed(HedgeAttempt())))
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,352 @@
+"""
+PlaidLibs™ Scheduler Module
+Process-wide rate limiting and prioritisation of OpenAI calls.
+"""
+
+import asyncio
+import bisect
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Iterator, AsyncIterator, Optional
+
+# Account limits shared by every session in this process (0 disables a limit)
+REQUESTS_PER_MINUTE = float(os.getenv("PLAIDLIBS_RPM", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("PLAIDLIBS_TPM", "150000"))
+IMAGES_PER_MINUTE = float(os.getenv("PLAIDLIBS_IPM", "5"))
+
+# Calls admitted at once across all sessions (0 disables the cap)
+MAX_INFLIGHT = int(os.getenv("PLAIDLIBS_MAX_INFLIGHT", "16"))
+
+# Session key for calls made outside any Streamlit session
+DEFAULT_SESSION = "default"
+
+# Completion tokens assumed for a request until its real usage is known
+DEFAULT_COMPLETION_TOKENS = 1000
+
+# Priorities, most urgent first
+INTERACTIVE = 0
+IMAGE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", IMAGE: "image", BACKGROUND: "background"}
+
+
+def estimate_tokens(text: str, completion: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Rough token cost of a prompt plus its expected completion (~4 chars per token)."""
+    return len(text) // 4 + completion
+
+
+class TokenBucket:
+    """
+    Refills continuously at a per-minute rate up to one minute's worth.
+    
+    Not thread-safe on its own; the Scheduler guards every bucket with its lock.
+    """
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (requests larger than capacity wait for a full bucket)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def take(self, amount: float, now: float):
+        """Remove amount from the bucket."""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+    
+    def adjust(self, delta: float):
+        """Give back (positive) or charge extra (negative) once real usage is known."""
+        self.level = min(self.capacity, self.level + delta)
+
+
+class Ticket:
+    """One queued or admitted call, with what it needs from each bucket."""
+    
+    def __init__(self, priority: int, needs: dict, seq: int, session: str = DEFAULT_SESSION,
+                 start: float = 0.0, finish: float = 0.0):
+        self.priority = priority
+        self.needs = needs
+        self.seq = seq
+        self.session = session
+        self.start = start
+        self.finish = finish
+        self.granted = False
+        self.released = False
+        self.enqueued_at = time.monotonic()
+        self.tokens_used: Optional[int] = None
+        # Called under the scheduler's lock when the ticket is granted (wakes async waiters)
+        self.on_grant: Optional[Callable[[], None]] = None
+    
+    @property
+    def waited(self) -> float:
+        """Seconds spent in the queue so far."""
+        return time.monotonic() - self.enqueued_at
+
+
+class Scheduler:
+    """
+    Admits OpenAI calls against shared request, token and image budgets.
+    
+    Waiting calls are granted in priority order (INTERACTIVE, then IMAGE, then
+    BACKGROUND). A call may overtake an earlier one only if it needs none of
+    the buckets the earlier call is waiting on, so text replies are not held
+    up behind an image burst that is waiting for image budget.
+    
+    Within a priority, calls are ordered by weighted fair queuing across
+    sessions: each call gets a virtual finish tag that grows with its
+    session's recent usage, so one session's burst of image or regenerate
+    calls is interleaved with other sessions' calls instead of running first.
+    """
+    
+    def __init__(self, requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE,
+                 images_per_minute: float = IMAGES_PER_MINUTE,
+                 max_inflight: int = MAX_INFLIGHT):
+        limits = {"requests": requests_per_minute, "tokens": tokens_per_minute, "images": images_per_minute}
+        self.buckets = {name: TokenBucket(rate) for name, rate in limits.items() if rate > 0}
+        self.max_inflight = max_inflight
+        self._cond = threading.Condition()
+        self._waiting: list = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._virtual_time = 0.0
+        self._finish_tags: dict = {}
+        self._weights: dict = {}
+    
+    def set_weight(self, session: str, weight: float):
+        """Give a session a larger (or smaller) share of admissions than the default 1."""
+        with self._cond:
+            self._weights[session] = weight
+    
+    def _tags(self, session: str, cost: float) -> tuple:
+        """Virtual (start, finish) tags a new call from session would get. Caller holds the lock."""
+        start = max(self._virtual_time, self._finish_tags.get(session, 0.0))
+        return start, start + cost / self._weights.get(session, 1.0)
+    
+    def acquire(self, priority: int = INTERACTIVE, tokens: int = 0, images: int = 0,
+                session: str = DEFAULT_SESSION) -> Ticket:
+        """
+        Block until the call may be sent.
+        
+        Args:
+            priority: INTERACTIVE, IMAGE or BACKGROUND
+            tokens: Estimated tokens the call will use (see estimate_tokens)
+            images: Images the call will generate
+            session: Key the call is queued fairly under (the Streamlit session ID)
+        
+        Returns:
+            The admitted ticket; pass it to release() when the call finishes
+        """
+        with self._cond:
+            ticket = self._enqueue(priority, tokens, images, session)
+            while True:
+                delay = self._dispatch()
+                if ticket.granted:
+                    return ticket
+                self._cond.wait(min(delay, 1.0) if delay else 1.0)
+    
+    def _enqueue(self, priority: int, tokens: int, images: int, session: str) -> Ticket:
+        """Queue a new ticket under its fair-queuing tags. Caller holds the lock."""
+        needs = {"requests": 1, "tokens": tokens, "images": images}
+        start, finish = self._tags(session, max(1, images))
+        self._finish_tags[session] = finish
+        ticket = Ticket(priority, needs, next(self._seq), session, start, finish)
+        bisect.insort(self._waiting, (ticket.priority, ticket.finish, ticket.seq, ticket))
+        return ticket
+    
+    def release(self, ticket: Ticket):
+        """Settle a finished call, correcting the token bucket if real usage was recorded."""
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._inflight -= 1
+            bucket = self.buckets.get("tokens")
+            if bucket and ticket.tokens_used is not None:
+                bucket.adjust(ticket.needs["tokens"] - ticket.tokens_used)
+            # Grant here too, as async waiters have no thread of their own blocked on the lock
+            self._dispatch()
+            self._cond.notify_all()
+    
+    def _dispatch(self) -> Optional[float]:
+        """
+        Grant every waiting ticket that can go now. Caller holds the lock.
+        
+        Returns:
+            Seconds until the next blocked ticket could be granted, or None
+        """
+        now = time.monotonic()
+        blocked = set()
+        next_delay = None
+        remaining = []
+        for entry in self._waiting:
+            ticket = entry[-1]
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                remaining.append(entry)
+                continue
+            needed = [name for name, amount in ticket.needs.items() if amount and name in self.buckets]
+            waits = {name: self.buckets[name].time_until(ticket.needs[name], now) for name in needed}
+            short = [name for name, wait in waits.items() if wait > 0]
+            if not short and not blocked.intersection(needed):
+                for name in needed:
+                    self.buckets[name].take(ticket.needs[name], now)
+                ticket.granted = True
+                self._inflight += 1
+                self._virtual_time = max(self._virtual_time, ticket.start)
+                if ticket.on_grant:
+                    try:
+                        ticket.on_grant()
+                    except RuntimeError:
+                        # The waiter's event loop has closed; nobody will use or release this admission
+                        ticket.released = True
+                        self._inflight -= 1
+                continue
+            remaining.append(entry)
+            blocked.update(short)
+            if short:
+                delay = max(waits[name] for name in short)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+        
+        if len(remaining) != len(self._waiting):
+            self._waiting = remaining
+            # Sessions whose tags the virtual clock has passed start fresh anyway
+            for session in [s for s, tag in self._finish_tags.items() if tag <= self._virtual_time]:
+                del self._finish_tags[session]
+            self._cond.notify_all()
+        return next_delay
+    
+    def charge(self, requests: int = 1):
+        """
+        Count calls made under an admission already held against the request budget.
+        
+        For follow-up calls of an admitted call, such as a run's status polls:
+        they must not wait for an in-flight slot their own call is holding, so
+        this never blocks. The bucket may go into debt, which holds back later
+        admissions instead.
+        """
+        with self._cond:
+            bucket = self.buckets.get("requests")
+            if bucket:
+                bucket.take(requests, time.monotonic())
+    
+    @contextmanager
+    def request(self, priority: int = INTERACTIVE, tokens: int = 0, images: int = 0,
+                session: str = DEFAULT_SESSION) -> Iterator[Ticket]:
+        """
+        Hold an admission (and an in-flight slot) for the duration of a block.
+        
+        Set ticket.tokens_used inside the block when the response reports usage.
+        """
+        ticket = self.acquire(priority, tokens=tokens, images=images, session=session)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    @asynccontextmanager
+    async def async_request(self, priority: int = INTERACTIVE, tokens: int = 0, images: int = 0,
+                            session: str = DEFAULT_SESSION) -> AsyncIterator[Ticket]:
+        """
+        Async variant of request(); waits on the event loop without a thread.
+        
+        The ticket's future is resolved from whichever thread grants it. While
+        the ticket waits on a bucket refill, the waiter dispatches again when
+        the refill is due, as acquire() does.
+        """
+        ticket = await self._async_acquire(priority, tokens, images, session)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+    
+    async def _async_acquire(self, priority: int, tokens: int, images: int, session: str) -> Ticket:
+        """Wait for admission on the running event loop; see async_request."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        
+        def wake():
+            if not granted.done():
+                granted.set_result(None)
+        
+        with self._cond:
+            ticket = self._enqueue(priority, tokens, images, session)
+            ticket.on_grant = lambda: loop.call_soon_threadsafe(wake)
+            delay = self._dispatch()
+        try:
+            while not ticket.granted:
+                try:
+                    await asyncio.wait_for(asyncio.shield(granted), timeout=min(delay, 1.0) if delay else 1.0)
+                except asyncio.TimeoutError:
+                    with self._cond:
+                        delay = self._dispatch()
+        except asyncio.CancelledError:
+            # Leave the queue, or hand back an admission granted meanwhile
+            with self._cond:
+                was_granted = ticket.granted
+                if not was_granted:
+                    self._waiting = [entry for entry in self._waiting if entry[-1] is not ticket]
+                    self._cond.notify_all()
+            if was_granted:
+                self.release(ticket)
+            raise
+        return ticket
+    
+    def queue_depth(self, priority: Optional[int] = None, session: Optional[str] = None) -> int:
+        """Number of calls waiting, optionally only those of one priority or session."""
+        with self._cond:
+            return sum(
+                1 for entry in self._waiting
+                if (priority is None or entry[0] == priority)
+                and (session is None or entry[-1].session == session)
+            )
+    
+    def estimate_wait(self, priority: int = INTERACTIVE, tokens: int = 0, images: int = 0,
+                      session: str = DEFAULT_SESSION) -> float:
+        """
+        Rough seconds a new call from session would wait for admission.
+        
+        Counts the queued calls that would be granted before it: higher
+        priorities, and same-priority calls with an earlier finish tag.
+        """
+        with self._cond:
+            now = time.monotonic()
+            _, finish = self._tags(session, max(1, images))
+            demand = {"requests": 1, "tokens": tokens, "images": images}
+            for entry in self._waiting:
+                if entry[0] < priority or (entry[0] == priority and entry[1] <= finish):
+                    for name, amount in entry[-1].needs.items():
+                        demand[name] += amount
+            wait = 0.0
+            for name, bucket in self.buckets.items():
+                bucket._refill(now)
+                if demand[name] > bucket.level:
+                    wait = max(wait, (demand[name] - bucket.level) / bucket.rate)
+            return wait
+
+
+_shared_scheduler: Optional[Scheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        with _shared_scheduler_lock:
+            if _shared_scheduler is None:
+                _shared_scheduler = Scheduler()
+    return _shared_scheduler
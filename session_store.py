@@ -0,0 +1,444 @@
+"""
+PlaidLibs™ Session Store Module
+Snapshots of session state, keyed by a token in the page URL, so a refreshed
+or reconnected browser tab resumes where it left off.
+
+Snapshots are JSON compressed with zlib and kept in a pluggable backend,
+chosen by PLAIDLIBS_STATE_BACKEND:
+
+    memory                       this process only (default)
+    sqlite                       .plaidlibs_cache/sessions.db, shared by every
+                                 process on one host
+    sqlite:///path/sessions.db   another file (sqlite:////abs/path for an
+                                 absolute path)
+    redis://[:password@]host:port/db
+                                 a Redis server (or anything speaking its
+                                 protocol) shared by every replica
+
+With a shared backend any replica can resume any tab.
+
+Every snapshot carries a version that each save bumps. A save only goes
+through if the stored version is still the one the tab last loaded or wrote,
+so two tabs opened on the same link cannot silently overwrite each other.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlparse
+from metrics import track_store
+
+# Where snapshots are kept (see module docstring)
+STATE_BACKEND = os.getenv("PLAIDLIBS_STATE_BACKEND", "memory")
+
+# Seconds a snapshot is kept after its session was last saved
+SESSION_TTL = float(os.getenv("PLAIDLIBS_SESSION_TTL", "86400"))
+
+# Snapshots kept by the memory backend before the least recently saved are dropped
+MAX_SESSIONS = int(os.getenv("PLAIDLIBS_MAX_SESSIONS", "1000"))
+
+# Seconds to wait on a Redis server before a call fails
+REDIS_TIMEOUT = float(os.getenv("PLAIDLIBS_REDIS_TIMEOUT", "2"))
+
+# Default SQLite file for a bare "sqlite" backend setting
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plaidlibs_cache", "sessions.db")
+
+# Prefix of every key the Redis backend writes
+REDIS_KEY_PREFIX = "plaidlibs:session:"
+
+
+class SessionStoreError(Exception):
+    """A backend could not be reached or returned an error."""
+
+
+class SessionConflictError(SessionStoreError):
+    """Another session saved under the token since this one last loaded or saved it."""
+
+
+def new_token() -> str:
+    """A fresh, unguessable session token."""
+    return secrets.token_urlsafe(16)
+
+
+def _to_json(state: dict) -> bytes:
+    """Canonical JSON for a snapshot; equal states always give equal bytes."""
+    return json.dumps(state, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
+def _digest(raw: bytes) -> bytes:
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def encode_snapshot(state: dict) -> bytes:
+    """Serialize a snapshot compactly (JSON, zlib-compressed)."""
+    return zlib.compress(_to_json(state), 6)
+
+
+def decode_snapshot(data: bytes) -> dict:
+    """Inverse of encode_snapshot."""
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+class MemoryBackend:
+    """Encoded snapshots in this process's memory."""
+    
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._entries = collections.OrderedDict()  # token -> (expires at, version, data)
+        self._lock = threading.Lock()
+    
+    def put(self, token: str, data: bytes, ttl: float, expected: int) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry and entry[0] >= now and entry[1] != expected:
+                return False
+            self._entries.pop(token, None)
+            self._entries[token] = (now + ttl, expected + 1, data)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        return True
+    
+    def get(self, token: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[token]
+                return None
+            return entry[1], entry[2]
+    
+    def delete(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+class SQLiteBackend:
+    """
+    Encoded snapshots in a SQLite file, shared by every process on the host.
+    
+    Each thread keeps its own connection; the database runs in WAL mode so
+    readers never wait on a writer.
+    """
+    
+    # Seconds between sweeps of expired snapshots
+    PRUNE_INTERVAL = 300
+    
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._last_prune = 0.0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(token TEXT PRIMARY KEY, expires REAL NOT NULL, data BLOB NOT NULL, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "version" not in columns:  # a file written before snapshots were versioned
+                conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def put(self, token: str, data: bytes, ttl: float, expected: int) -> bool:
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                written = conn.execute(
+                    "INSERT INTO sessions (token, expires, data, version) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (token) DO UPDATE SET "
+                    "expires = excluded.expires, data = excluded.data, version = excluded.version "
+                    "WHERE sessions.version = ? OR sessions.expires < ?",
+                    (token, now + ttl, data, expected + 1, expected, now)
+                ).rowcount
+                if now - self._last_prune > self.PRUNE_INTERVAL:
+                    self._last_prune = now
+                    conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+        except sqlite3.Error as e:
+            raise SessionStoreError(f"SQLite: {e}") from e
+        return written == 1
+    
+    def get(self, token: str) -> Optional[Tuple[int, bytes]]:
+        try:
+            row = self._connection().execute(
+                "SELECT version, data FROM sessions WHERE token = ? AND expires >= ?", (token, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            raise SessionStoreError(f"SQLite: {e}") from e
+        return (row[0], bytes(row[1])) if row else None
+    
+    def delete(self, token: str):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        except sqlite3.Error as e:
+            raise SessionStoreError(f"SQLite: {e}") from e
+
+
+class RedisBackend:
+    """
+    Encoded snapshots in Redis, spoken to directly over RESP (no client library).
+    
+    Each thread keeps its own connection and reconnects once if the server
+    dropped it. Snapshots expire through Redis's own key TTL. A value is the
+    snapshot's version, a colon, then the encoded snapshot; saves check the
+    version under WATCH and write in MULTI/EXEC.
+    """
+    
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = REDIS_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._send(*(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)))
+        if self.db:
+            self._send("SELECT", str(self.db))
+    
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+    
+    def _send(self, *args):
+        """Send one command on this thread's connection and read its reply."""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+    
+    def _read_reply(self):
+        reader = self._local.reader
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise SessionStoreError(f"Redis: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            if len(data) != size + 2:
+                raise ConnectionError("connection closed")
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read_reply() for _ in range(size)]
+        raise SessionStoreError(f"Redis: unexpected reply {line!r}")
+    
+    def _call(self, send):
+        """
+        Run send() against this thread's connection, reconnecting once if it was lost.
+        
+        Raises:
+            SessionStoreError: The server is unreachable or replied with an error
+        """
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return send()
+            except (OSError, ConnectionError, ValueError) as e:
+                self._close()
+                if attempt:
+                    raise SessionStoreError(f"Redis {self.host}:{self.port}: {e}") from e
+            except SessionStoreError:
+                self._close()
+                raise
+    
+    def command(self, *args):
+        """
+        Run one Redis command, reconnecting once if the connection was lost.
+        
+        Raises:
+            SessionStoreError: The server is unreachable or replied with an error
+        """
+        return self._call(lambda: self._send(*args))
+    
+    @staticmethod
+    def _split(value: bytes) -> Tuple[int, bytes]:
+        version, sep, data = value.partition(b":")
+        if sep and version.isdigit():
+            return int(version), data
+        return 0, value  # written before snapshots were versioned
+    
+    def put(self, token: str, data: bytes, ttl: float, expected: int) -> bool:
+        key = REDIS_KEY_PREFIX + token
+        
+        def swap():
+            self._send("WATCH", key)
+            current = self._send("GET", key)
+            if current is not None and self._split(current)[0] != expected:
+                self._send("UNWATCH")
+                return False
+            self._send("MULTI")
+            self._send("SET", key, b"%d:%s" % (expected + 1, data), "EX", max(1, int(ttl)))
+            return self._send("EXEC") is not None  # None: the key changed after WATCH
+        
+        return self._call(swap)
+    
+    def get(self, token: str) -> Optional[Tuple[int, bytes]]:
+        value = self.command("GET", REDIS_KEY_PREFIX + token)
+        return self._split(value) if value is not None else None
+    
+    def delete(self, token: str):
+        self.command("DEL", REDIS_KEY_PREFIX + token)
+
+
+def create_backend(spec: str = STATE_BACKEND):
+    """
+    Build the backend named by a PLAIDLIBS_STATE_BACKEND value.
+    
+    Raises:
+        ValueError: Unknown backend
+    """
+    if spec in ("", "memory"):
+        return MemoryBackend()
+    if spec == "sqlite":
+        return SQLiteBackend()
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):])
+    if spec.startswith(("redis://", "rediss://")):
+        if spec.startswith("rediss://"):
+            raise ValueError("TLS Redis (rediss://) is not supported; use a local TLS proxy")
+        return RedisBackend(spec)
+    raise ValueError(f"Unknown PLAIDLIBS_STATE_BACKEND: {spec!r}")
+
+
+# =============================================================================
+# STORE
+# =============================================================================
+class SessionStore:
+    """
+    Saves and loads session snapshots through a backend.
+    
+    Saving a snapshot identical to the one this process last wrote or read
+    for the token is skipped until half its TTL has passed, so reruns that
+    change nothing cost a JSON dump and a hash, but no compression or write.
+    
+    Callers hold on to the version load() and save() return and pass it to
+    their next save, which fails if anyone else saved in between.
+    """
+    
+    def __init__(self, backend=None, ttl: float = SESSION_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self._written = collections.OrderedDict()  # token -> (digest, version, written at)
+        self._lock = threading.Lock()
+    
+    def _remember(self, token: str, digest: bytes, version: int, written_at: float):
+        with self._lock:
+            self._written.pop(token, None)
+            self._written[token] = (digest, version, written_at)
+            while len(self._written) > MAX_SESSIONS:
+                self._written.popitem(last=False)
+    
+    def save(self, token: str, state: dict, version: int = 0) -> int:
+        """
+        Store the snapshot for token.
+        
+        Args:
+            token: Session token (see new_token)
+            state: JSON-serializable session state
+            version: Version this session last loaded or saved (0 for a new token)
+        
+        Returns:
+            The version now stored, which the session's next save passes back
+        
+        Raises:
+            SessionConflictError: Another session saved under token since version
+            SessionStoreError: The backend failed
+            TypeError: state holds a value JSON cannot encode
+        """
+        raw = _to_json(state)
+        digest = _digest(raw)
+        now = time.time()
+        with self._lock:
+            previous = self._written.get(token)
+        if previous and previous[:2] == (digest, version) and now - previous[2] < self.ttl / 2:
+            return version
+        with track_store("save"):
+            written = self.backend.put(token, zlib.compress(raw, 6), self.ttl, version)
+        if not written:
+            raise SessionConflictError(f"session {token} was saved by another tab")
+        self._remember(token, digest, version + 1, now)
+        return version + 1
+    
+    def load(self, token: str) -> Optional[Tuple[dict, int]]:
+        """
+        The snapshot saved for token and its version, or None if unknown or expired.
+        
+        Raises:
+            SessionStoreError: The backend failed
+        """
+        with track_store("load"):
+            entry = self.backend.get(token)
+        if entry is None:
+            return None
+        version, data = entry
+        raw = zlib.decompress(data)
+        # Its age is unknown, so the first save after a load always writes (refreshing the TTL)
+        self._remember(token, _digest(raw), version, 0.0)
+        return json.loads(raw.decode("utf-8")), version
+    
+    def delete(self, token: str):
+        """Forget the snapshot for token."""
+        self.backend.delete(token)
+        with self._lock:
+            self._written.pop(token, None)
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, on the backend PLAIDLIBS_STATE_BACKEND names."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(create_backend())
+        return _store
@@ -0,0 +1,127 @@
+"""
+PlaidLibs™ Single-Flight Module
+Coalesces identical in-flight requests into one upstream call.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(kind: str, prompt: str, **params) -> str:
+    """
+    Hash a request into a single-flight key.
+    
+    Whitespace in the prompt is normalized, so prompts that differ only in
+    spacing or line breaks share a key.
+    
+    Args:
+        kind: Request type, e.g. "complete"
+        prompt: The prompt text
+        **params: Everything else that changes the response (model, persona, ...)
+    
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps({"kind": kind, "prompt": " ".join(prompt.split()), **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers share its outcome.
+    
+    The first caller for a key (the leader) runs the call in its own thread.
+    Callers arriving while it is in flight block until it finishes and get
+    the same result, or the same exception. Nothing is cached afterwards.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+    
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn for key, or join the call already in flight for key.
+        
+        Args:
+            key: Request key (see request_key)
+            fn: Zero-argument callable making the upstream call
+        
+        Returns:
+            The shared result
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+    
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop counterpart of SingleFlight.
+    
+    The shared call runs as a task, so a caller that is cancelled stops
+    waiting without cancelling the call for everyone else.
+    """
+    
+    def __init__(self):
+        self._calls: dict = {}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn() for key, or join the call already in flight for key."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.get(key) is done and self._calls.pop(key))
+        return await asyncio.shield(task)
+    
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        return len(self._calls)
+
+
+_shared_flight = SingleFlight()
+_async_flights: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group."""
+    return _shared_flight
+
+
+def get_async_single_flight() -> AsyncSingleFlight:
+    """Return the single-flight group for the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_flights:
+        _async_flights[loop] = AsyncSingleFlight()
+    return _async_flights[loop]